@@ -0,0 +1,216 @@
+"""
+Runtime autotuner for interpreter threads, XNNPACK and OpenCV threads.
+
+By default the TFLite interpreter and OpenCV each size their own thread pool
+to the machine, so a request's denoising and its invoke compete for the
+same cores, more so when several sessions run at once. This benchmarks the
+served request (preprocess_image -> features -> invoke, after a warm-up
+invocation) on this host for every combination of
+
+  - interpreter num_threads
+  - the default XNNPACK delegate on / off
+  - cv2.setNumThreads
+
+and saves the best to .tea_cache/runtime_profile.json (RUNTIME_PROFILE_PATH).
+tea_core.configure_runtime() applies it on later starts; the app runs a
+quick tune on its first start (TEA_AUTOTUNE=latency|throughput|off).
+
+Objectives:
+  latency    : median ms of one request at a time
+  throughput : images / s with POOL_SIZE requests in flight, one interpreter each
+
+Usage:
+  python autotune.py                             # latency, full grid
+  python autotune.py --objective throughput --image leaf.jpg
+  python autotune.py --show
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import threading
+import time
+
+import cv2
+
+import tea_core as core
+
+# OpenCV's own default, captured before anything changes it
+CV2_DEFAULT_THREADS = cv2.getNumThreads()
+
+UNITS = {"latency": "ms", "throughput": "img/s"}
+
+# Keep the runtime defaults unless a combination beats them by more than
+# this; smaller differences are run-to-run noise.
+MIN_GAIN = 0.05
+
+
+def _thread_counts(cpu, quick):
+    counts = {1, cpu} if quick else {1, 2, 4, cpu // 2, cpu}
+    return sorted(n for n in counts if 1 <= n <= cpu)
+
+
+def xnnpack_switchable():
+    """True when the runtime can build an interpreter without the default XNNPACK delegate."""
+    _, interpreter_cls = core.tflite_runtime()
+    return hasattr(sys.modules[interpreter_cls.__module__], "OpResolverType")
+
+
+def candidates(quick=False):
+    """(num_threads, xnnpack, cv2_threads) combinations; the runtime defaults come first."""
+    cpu = os.cpu_count() or 1
+    combos = [(None, True, CV2_DEFAULT_THREADS)]
+    xnnpack = (True, False) if xnnpack_switchable() else (True,)
+    for threads, xnn, cv_threads in itertools.product(_thread_counts(cpu, quick), xnnpack,
+                                                      _thread_counts(cpu, quick)):
+        if (threads, xnn, cv_threads) not in combos:
+            combos.append((threads, xnn, cv_threads))
+    return combos
+
+
+def _request(img, interp, profile):
+    pre = core.preprocess_image(core.ImageContext(img), profile)
+    return core.predict_disease(pre, interp, profile)
+
+
+def measure(img, objective, num_threads, xnnpack, cv2_threads, profile=core.DEFAULT_PROFILE,
+            budget_s=3.0, min_runs=3):
+    """Score of one combination: median ms (latency) or images / s (throughput)."""
+    cv2.setNumThreads(cv2_threads)
+    workers = 1 if objective == "latency" else core.POOL_SIZE
+    interps = [core.build_interpreter(1, num_threads, xnnpack) for _ in range(workers)]
+    warm = core.preprocess_image(core.ImageContext(img), profile)
+    for interp in interps:
+        core.predict_disease(warm, interp, profile)
+
+    if objective == "latency":
+        times = []
+        t_end = time.perf_counter() + budget_s
+        while len(times) < min_runs or time.perf_counter() < t_end:
+            t0 = time.perf_counter()
+            _request(img, interps[0], profile)
+            times.append((time.perf_counter() - t0) * 1e3)
+        return statistics.median(times)
+
+    done = [0] * workers
+    t_end = time.perf_counter() + budget_s
+
+    def worker(k):
+        while done[k] < min_runs or time.perf_counter() < t_end:
+            _request(img, interps[k], profile)
+            done[k] += 1
+
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(k,)) for k in range(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sum(done) / (time.perf_counter() - t0)
+
+
+def tune(objective="latency", quick=False, image=None, profile=core.DEFAULT_PROFILE, log=None):
+    """Benchmark every candidate and return the runtime profile dict (not saved)."""
+    if objective not in UNITS:
+        raise ValueError(f"objective must be one of {sorted(UNITS)}, got {objective!r}")
+    if image is None:
+        from bench_stages import synthetic_leaf
+        img = synthetic_leaf(480, 360) if quick else synthetic_leaf(1280, 960)
+    else:
+        img = core.load_image_rgb(image)
+    budget_s, min_runs = (1.0, 3) if quick else (3.0, 5)
+
+    results = []
+    try:
+        for threads, xnn, cv_threads in candidates(quick):
+            score = measure(img, objective, threads, xnn, cv_threads, profile, budget_s, min_runs)
+            results.append({"num_threads": threads, "xnnpack": xnn, "cv2_threads": cv_threads,
+                             "score": round(score, 2)})
+            if log:
+                log(results[-1])
+    finally:
+        cv2.setNumThreads(CV2_DEFAULT_THREADS)
+
+    pick = min if objective == "latency" else max
+    best = pick(results, key=lambda r: r["score"])
+    defaults = results[0]["score"]
+    speedup = defaults / best["score"] if objective == "latency" else best["score"] / defaults
+    if speedup < 1 + MIN_GAIN:
+        best, speedup = results[0], 1.0
+    return {
+        "objective": objective,
+        "num_threads": best["num_threads"],
+        "xnnpack": best["xnnpack"],
+        "cv2_threads": best["cv2_threads"],
+        "score": best["score"],
+        "unit": UNITS[objective],
+        "defaults_score": defaults,
+        "speedup": round(speedup, 3),
+        "cpu_count": os.cpu_count(),
+        "runtime": core.tflite_runtime()[0],
+        "model_fingerprint": core.model_fingerprint(),
+        "model_variant": core.MODEL_VARIANT,
+        "host": platform.node(),
+        "image": str(image) if image else f"synthetic {img.shape[1]}x{img.shape[0]}",
+        "profile": profile,
+        "quick": quick,
+        "tuned_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+
+
+def save_profile(prof, path=core.RUNTIME_PROFILE_PATH):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(prof, indent=2))
+    os.replace(tmp, path)
+
+
+def describe(prof):
+    threads = prof["num_threads"] or "default"
+    return (f"{prof['objective']}: {threads} interpreter thread(s), XNNPACK "
+            f"{'on' if prof['xnnpack'] else 'off'}, {prof['cv2_threads']} OpenCV thread(s) -> "
+            f"{prof['score']:g} {prof['unit']} ({prof['speedup']:.2f}x vs defaults)")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Tune interpreter / XNNPACK / OpenCV threads on this host")
+    ap.add_argument("--objective", default="latency", choices=sorted(UNITS))
+    ap.add_argument("--image", default=None, help="leaf photo to tune on (default: synthetic 1280x960)")
+    ap.add_argument("--profile", default=core.DEFAULT_PROFILE, choices=list(core.PROFILES))
+    ap.add_argument("--quick", action="store_true", help="smaller grid and image (what the app runs)")
+    ap.add_argument("--dry-run", action="store_true", help="do not save the result")
+    ap.add_argument("--show", action="store_true", help="print the saved profile and exit")
+    args = ap.parse_args(argv)
+
+    if args.show:
+        prof = core.runtime_profile()
+        if prof is None:
+            print(f"No valid profile at {core.RUNTIME_PROFILE_PATH}")
+            return 1
+        print(describe(prof))
+        return 0
+
+    _, status = core.load_tflite_model()
+    if status != "tflite":
+        raise SystemExit(f"Model unavailable ({status})")
+
+    def log(r):
+        threads = r["num_threads"] or "default"
+        print(f"   threads {threads!s:<8}xnnpack {'on ' if r['xnnpack'] else 'off'}  "
+              f"cv2 {r['cv2_threads']:<4}{r['score']:>10.2f} {UNITS[args.objective]}", file=sys.stderr)
+
+    prof = tune(args.objective, args.quick, args.image, args.profile, log=log)
+    print(describe(prof))
+    if not args.dry_run:
+        save_profile(prof)
+        print(f"Saved to {core.RUNTIME_PROFILE_PATH}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,335 @@
+"""
+Tea Doctor - headless batch inference over image directories.
+
+Runs the same pipeline as the Streamlit home page
+(decode -> preprocess_image -> colour/texture features -> TFLite -> refinement)
+without the UI, as a producer/consumer pipeline across processes:
+
+  feature workers  : decode + preprocess + feature extraction (CPU bound)
+  inference worker : batched interpreter invoke + post-hoc refinement
+  main process     : enumerates inputs and streams results to CSV / JSONL
+
+Feature workers write the three model inputs straight into a ring of
+shared-memory slots; only small (slot, path) tuples travel over queues, so
+the ~4 MB of tensors per image are never pickled.
+
+Usage:
+  python batch_infer.py photos/ -o results.csv
+  python batch_infer.py photos/ -o results.jsonl --workers 8
+"""
+
+import argparse
+import csv
+import json
+import os
+import queue
+import sys
+import time
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from pathlib import Path
+
+import numpy as np
+
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tif", ".tiff"}
+
+# Wait this long for a result before checking whether workers are still alive
+RESULT_POLL_S = 1.0
+
+
+# ============================================================================
+# SHARED-MEMORY FRAME RING
+# ============================================================================
+
+class FrameRing:
+    """
+    Fixed number of slots, each holding one image's three model inputs
+    (rgb uint8 [224,224,3], color float32 [224,224,8], texture float32 [224,224,11])
+    inside a single SharedMemory block.
+    """
+
+    def __init__(self, n_slots, img_size, color_ch, texture_ch, name=None):
+        self.n_slots = n_slots
+        self.shapes = {
+            "rgb": ((n_slots, img_size, img_size, 3), np.uint8),
+            "color": ((n_slots, img_size, img_size, color_ch), np.float32),
+            "texture": ((n_slots, img_size, img_size, texture_ch), np.float32),
+        }
+        sizes = {k: int(np.prod(s)) * np.dtype(d).itemsize for k, (s, d) in self.shapes.items()}
+        total = sum(sizes.values())
+
+        self._owner = name is None
+        if self._owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=total)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+
+        offset = 0
+        for key, (shape, dtype) in self.shapes.items():
+            setattr(self, key, np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=offset))
+            offset += sizes[key]
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def spec(self):
+        """Arguments needed to attach to this ring from another process."""
+        shape = self.shapes["color"][0]
+        return (self.n_slots, shape[1], shape[3], self.shapes["texture"][0][3], self.name)
+
+    @classmethod
+    def attach(cls, spec):
+        n_slots, img_size, color_ch, texture_ch, name = spec
+        return cls(n_slots, img_size, color_ch, texture_ch, name=name)
+
+    def close(self):
+        # Drop the numpy views first, otherwise SharedMemory.close() refuses
+        for key in self.shapes:
+            setattr(self, key, None)
+        self.shm.close()
+        if self._owner:
+            self.shm.unlink()
+
+
+# ============================================================================
+# WORKERS
+# ============================================================================
+
+def _feature_worker(ring_spec, path_q, free_q, ready_q, result_q, profile):
+    """Decode, preprocess and extract features into a free ring slot."""
+    import cv2
+    cv2.setNumThreads(1)  # one process per core scales better than nested threads
+    import tea_core as core
+
+    ring = FrameRing.attach(ring_spec)
+    try:
+        while True:
+            item = path_q.get()
+            if item is None:
+                break
+            path = item
+            try:
+                image = core.load_image_rgb(path)
+                ctx = core.as_context(core.preprocess_image(image, profile)).resized(core.IMG_SIZE)
+            except Exception as e:
+                result_q.put({"path": path, "error": f"{type(e).__name__}: {e}"})
+                continue
+            slot = free_q.get()
+            try:
+                # Extractors write straight into the shared slot: no per-image copies
+                ring.rgb[slot] = ctx.rgb
+                core.extract_color_features(ctx, out=ring.color[slot])
+                core.extract_texture_features(ctx, profile, out=ring.texture[slot])
+            except Exception as e:
+                free_q.put(slot)
+                result_q.put({"path": path, "error": f"{type(e).__name__}: {e}"})
+                continue
+            ready_q.put((slot, path))
+    finally:
+        ring.close()
+
+
+def _inference_worker(ring_spec, ready_q, free_q, result_q, use_refinement, batch_size):
+    """Invoke the interpreter on batches of filled slots and hand the slots back."""
+    import tea_core as core
+
+    interpreter, model_type = core.load_tflite_model()
+    if interpreter is None:
+        result_q.put({"fatal": f"model unavailable ({model_type})"})
+        return
+    temperature, thresholds = core.load_refinement_config()
+
+    ring = FrameRing.attach(ring_spec)
+    try:
+        stop = False
+        while not stop:
+            # Block for the first frame, then take whatever else is ready
+            items = [ready_q.get()]
+            while items[-1] is not None and len(items) < batch_size:
+                try:
+                    items.append(ready_q.get_nowait())
+                except queue.Empty:
+                    break
+            if items[-1] is None:
+                stop = True
+                items.pop()
+            if not items:
+                continue
+
+            slots = [slot for slot, _ in items]
+            try:
+                raw = core.predict_inputs_batch(ring.rgb[slots], ring.color[slots], ring.texture[slots])
+            except Exception as e:
+                for _, path in items:
+                    result_q.put({"path": path, "error": f"{type(e).__name__}: {e}"})
+                continue
+            finally:
+                for slot in slots:
+                    free_q.put(slot)
+            probs = core.apply_refinement(raw, temperature, thresholds) if use_refinement else raw
+            for (_, path), row in zip(items, probs):
+                idx = int(np.argmax(row))
+                result_q.put({
+                    "path": path,
+                    "prediction": core.CLASS_NAMES[idx],
+                    "confidence": round(float(row[idx] * 100), 2),
+                    "probabilities": {c: round(float(p), 6) for c, p in zip(core.CLASS_NAMES, row)},
+                })
+    finally:
+        ring.close()
+
+
+# ============================================================================
+# RESULT WRITERS
+# ============================================================================
+
+class _CsvWriter:
+    def __init__(self, fh, class_names):
+        self.class_names = class_names
+        self.writer = csv.writer(fh)
+        self.writer.writerow(["path", "prediction", "confidence", "error"] + class_names)
+
+    def write(self, row):
+        probs = row.get("probabilities", {})
+        self.writer.writerow(
+            [row["path"], row.get("prediction", ""), row.get("confidence", ""), row.get("error", "")]
+            + [probs.get(c, "") for c in self.class_names]
+        )
+
+
+class _JsonlWriter:
+    def __init__(self, fh, class_names):
+        self.fh = fh
+
+    def write(self, row):
+        self.fh.write(json.dumps(row) + "\n")
+
+
+# ============================================================================
+# DRIVER
+# ============================================================================
+
+def iter_images(inputs):
+    """Yield image paths from files and (recursively) directories, sorted."""
+    for src in inputs:
+        src = Path(src)
+        if src.is_dir():
+            for p in sorted(src.rglob("*")):
+                if p.is_file() and p.suffix.lower() in IMAGE_EXTS:
+                    yield str(p)
+        elif src.is_file():
+            yield str(src)
+
+
+def run_batch(inputs, output, workers=None, infer_workers=1, use_refinement=True,
+              ring_slots=None, batch_size=8, profile="full", fmt=None, progress=None):
+    """
+    Classify every image under `inputs` and stream rows to `output`.
+
+    Rows are written as they finish (not in input order). `fmt` is "csv" or
+    "jsonl" and defaults from the output suffix. Up to `batch_size` ready
+    frames are classified per interpreter invoke; `profile` selects the
+    preprocessing fidelity profile. Returns a stats dict with
+    images, errors, seconds and images_per_sec.
+    """
+    import tea_core as core
+
+    core.get_profile(profile)  # fail fast on a typo, before spawning workers
+    paths = list(iter_images(inputs))
+    output = Path(output)
+    fmt = fmt or ("jsonl" if output.suffix.lower() in (".jsonl", ".json") else "csv")
+    workers = workers or max(1, (os.cpu_count() or 2) - infer_workers)
+    ring_slots = ring_slots or max(2 * (workers + infer_workers), 2 * batch_size)
+
+    ctx = mp.get_context("spawn")
+    ring = FrameRing(ring_slots, core.IMG_SIZE, core.COLOR_CHANNELS, core.TEXTURE_CHANNELS)
+    path_q, free_q, ready_q, result_q = ctx.Queue(), ctx.Queue(), ctx.Queue(), ctx.Queue()
+    for slot in range(ring_slots):
+        free_q.put(slot)
+    for p in paths:
+        path_q.put(p)
+    for _ in range(workers):
+        path_q.put(None)
+
+    procs = [ctx.Process(target=_feature_worker,
+                         args=(ring.spec(), path_q, free_q, ready_q, result_q, profile),
+                         daemon=True) for _ in range(workers)]
+    procs += [ctx.Process(target=_inference_worker,
+                          args=(ring.spec(), ready_q, free_q, result_q, use_refinement, batch_size),
+                          daemon=True) for _ in range(infer_workers)]
+
+    done = errors = 0
+    t0 = time.perf_counter()
+    try:
+        for proc in procs:
+            proc.start()
+        with open(output, "w", newline="" if fmt == "csv" else None, encoding="utf-8") as fh:
+            writer = (_CsvWriter if fmt == "csv" else _JsonlWriter)(fh, core.CLASS_NAMES)
+            while done < len(paths):
+                try:
+                    row = result_q.get(timeout=RESULT_POLL_S)
+                except queue.Empty:
+                    crashed = [proc.exitcode for proc in procs[:workers] if proc.exitcode not in (None, 0)]
+                    if crashed:
+                        # Its image (and ring slot) are lost: the run would never finish
+                        raise RuntimeError(f"feature worker exited unexpectedly (exit code {crashed[0]})")
+                    if not any(proc.is_alive() for proc in procs[workers:]):
+                        raise RuntimeError("inference worker exited unexpectedly")
+                    continue
+                if "fatal" in row:
+                    raise RuntimeError(row["fatal"])
+                writer.write(row)
+                fh.flush()
+                done += 1
+                errors += "error" in row
+                if progress:
+                    progress(done, len(paths), time.perf_counter() - t0)
+    finally:
+        for _ in range(infer_workers):
+            ready_q.put(None)
+        for proc in procs:
+            proc.join(timeout=5)
+            if proc.is_alive():
+                proc.terminate()
+        ring.close()
+
+    elapsed = time.perf_counter() - t0
+    return {
+        "images": done,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "images_per_sec": round(done / elapsed, 2) if elapsed > 0 else 0.0,
+        "workers": workers,
+        "infer_workers": infer_workers,
+        "profile": profile,
+    }
+
+
+def _print_progress(done, total, elapsed):
+    rate = done / elapsed if elapsed > 0 else 0.0
+    print(f"\r{done}/{total}  {rate:.1f} img/s", end="", file=sys.stderr, flush=True)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Headless Tea Doctor batch inference")
+    ap.add_argument("inputs", nargs="+", help="image files and/or directories")
+    ap.add_argument("-o", "--output", required=True, help="results file (.csv or .jsonl)")
+    ap.add_argument("--workers", type=int, default=None, help="feature-extraction processes")
+    ap.add_argument("--infer-workers", type=int, default=1, help="interpreter processes")
+    ap.add_argument("--batch-size", type=int, default=8, help="max frames per interpreter invoke")
+    ap.add_argument("--ring-slots", type=int, default=None, help="shared-memory slots")
+    ap.add_argument("--profile", default="full", help="fidelity profile: full, fast, ultra-fast")
+    ap.add_argument("--no-refinement", action="store_true", help="report raw model probabilities")
+    args = ap.parse_args(argv)
+
+    stats = run_batch(args.inputs, args.output, workers=args.workers,
+                      infer_workers=args.infer_workers, ring_slots=args.ring_slots,
+                      batch_size=args.batch_size, profile=args.profile,
+                      use_refinement=not args.no_refinement, progress=_print_progress)
+    print(file=sys.stderr)
+    print(json.dumps(stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""
+Parity check + timing of the ImageContext pipeline.
+
+Compares tea_core's gates, preprocessing and feature extractors, which
+share colour spaces / grayscale / CLAHE through one ImageContext per
+image, against the reference below: the functions as they were before the
+refactor, each converting its input from scratch. Checked on every test
+image:
+
+  assess_image_quality, check_if_leaf     same score / issues / verdict
+  preprocess_image (profile "full")       bit-identical uint8 output
+  extract_color_features                  bit-identical [H,W,8]
+  extract_texture_features                bit-identical [H,W,11]
+  prepare_inputs                          the served path (preprocess,
+                                          resize to 224, both extractors)
+
+The reference LBP is skimage's local_binary_pattern when scikit-image is
+installed, else tea_core.uniform_lbp (bench_lbp.py checks the two agree).
+Exits non-zero on any difference.
+
+Usage:
+  python bench_context.py [--repeat 3]
+"""
+
+import argparse
+import sys
+import timeit
+
+import cv2
+import numpy as np
+
+import tea_core as core
+from bench_stages import synthetic_leaf
+
+try:
+    from skimage.feature import local_binary_pattern
+except ImportError:
+    local_binary_pattern = None
+
+
+# ============================================================================
+# PRE-REFACTOR REFERENCE  (one colour conversion per call, as before)
+# ============================================================================
+
+def ref_lbp(image):
+    if local_binary_pattern is None:
+        return core.uniform_lbp(image)
+    return local_binary_pattern(image, P=core.LBP_POINTS, R=core.LBP_RADIUS, method="uniform")
+
+
+def ref_assess_image_quality(img):
+    gray = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
+    brightness = float(np.mean(gray))
+    lap_var = float(cv2.Laplacian(gray, cv2.CV_64F).var())
+    contrast = float(gray.std())
+
+    issues = []
+    if brightness < 15:
+        issues.append("Very dark")
+    elif brightness > 240:
+        issues.append("Very bright")
+    if lap_var < 10:
+        issues.append("Extremely blurry")
+    if contrast < 5:
+        issues.append("No contrast")
+
+    score = 100
+    if lap_var < 10:
+        score -= 30
+    if brightness < 15 or brightness > 240:
+        score -= 20
+    if contrast < 5:
+        score -= 20
+    score = max(0, score)
+    acceptable = score >= 35 and lap_var >= 8 and brightness > 10 and contrast > 3
+    return score, issues, acceptable
+
+
+def ref_check_if_leaf(img):
+    try:
+        hsv = cv2.cvtColor(img, cv2.COLOR_RGB2HSV)
+        h, w = hsv.shape[:2]
+        total = h * w
+
+        white_mask = cv2.inRange(hsv, (0, 0, 200), (180, 60, 255))
+        fg_mask = cv2.bitwise_not(white_mask)
+        fg_px = max(int(np.sum(fg_mask > 0)), 1)
+        if fg_px < total * 0.03:
+            return False
+
+        green = cv2.inRange(hsv, (20, 25, 20), (95, 255, 255))
+        yellow = cv2.inRange(hsv, (10, 25, 30), (45, 255, 255))
+        red1 = cv2.inRange(hsv, (0, 20, 30), (15, 255, 255))
+        red2 = cv2.inRange(hsv, (160, 20, 30), (180, 255, 255))
+        plant = green | yellow | red1 | red2
+        plant_ratio = np.sum(cv2.bitwise_and(plant, fg_mask) > 0) / fg_px * 100
+
+        gray = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
+        edges = cv2.Canny(cv2.GaussianBlur(gray, (5, 5), 0), 30, 120)
+        edge_ratio = np.sum(cv2.bitwise_and(edges, fg_mask) > 0) / fg_px * 100
+        lap_var = float(np.var(cv2.Laplacian(gray, cv2.CV_64F)[fg_mask > 0]))
+
+        skin = cv2.inRange(hsv, (0, 10, 60), (25, 200, 255))
+        skin_ratio = np.sum(cv2.bitwise_and(skin, fg_mask) > 0) / fg_px * 100
+
+        color_ok = plant_ratio >= 12
+        struct_ok = edge_ratio >= 2.0 and lap_var >= 10.0
+        face_like = skin_ratio >= 25 and edge_ratio < 2 and lap_var < 10
+        return bool((color_ok or struct_ok) and not face_like)
+    except Exception:
+        return True
+
+
+def ref_preprocess_image(img):
+    img = cv2.fastNlMeansDenoisingColored(img, None, h=7, hColor=7,
+                                          templateWindowSize=7, searchWindowSize=21)
+    lab = cv2.cvtColor(img, cv2.COLOR_RGB2LAB)
+    l_ch, a_ch, b_ch = cv2.split(lab)
+    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+    lab = cv2.merge([clahe.apply(l_ch), a_ch, b_ch])
+    return cv2.cvtColor(lab, cv2.COLOR_LAB2RGB)
+
+
+def ref_color_features(img_float):
+    img_u8 = np.clip(img_float * 255, 0, 255).astype(np.uint8)
+    hsv = cv2.cvtColor(img_u8, cv2.COLOR_RGB2HSV).astype(np.float32)
+    lab = cv2.cvtColor(img_u8, cv2.COLOR_RGB2LAB).astype(np.float32)
+
+    H = hsv[:, :, 0] / 180.0
+    S = hsv[:, :, 1] / 255.0
+    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+    L_clahe = clahe.apply(lab[:, :, 0].astype(np.uint8)).astype(np.float32) / 255.0
+    a_star = lab[:, :, 1] / 255.0
+    b_star = lab[:, :, 2] / 255.0
+
+    R, G, B = img_float[:, :, 0], img_float[:, :, 1], img_float[:, :, 2]
+    ExG = np.clip(2 * G - R - B, -1, 1)
+    ab_ratio = np.where(np.abs(b_star) > 0.01, np.clip(a_star / (b_star + 1e-8), -2, 2) / 4 + 0.5, 0.5)
+    rg_ratio = np.where(G > 0.01, np.clip(R / (G + 1e-8), 0, 4) / 4, 0.5)
+
+    return np.stack([H, S, L_clahe, a_star, b_star, ExG, ab_ratio, rg_ratio], axis=-1).astype(np.float32)
+
+
+def ref_texture_features(img_float):
+    img_u8 = np.clip(img_float * 255, 0, 255).astype(np.uint8)
+    gray = cv2.cvtColor(img_u8, cv2.COLOR_RGB2GRAY)
+    gray_f = gray.astype(np.float32) / 255.0
+
+    canny = cv2.Canny(gray, 50, 150).astype(np.float32) / 255.0
+
+    gabor_out = []
+    for theta in [0, np.pi / 4]:
+        kern = cv2.getGaborKernel((21, 21), sigma=4.0, theta=theta, lambd=10.0, gamma=0.5, psi=0)
+        resp = cv2.filter2D(gray, cv2.CV_32F, kern)
+        gabor_out.append(np.clip(np.abs(resp) / (np.abs(resp).max() + 1e-8), 0, 1))
+
+    mu = cv2.blur(gray_f, (7, 7))
+    sq = cv2.blur(gray_f ** 2, (7, 7))
+    local_std = np.sqrt(np.clip(sq - mu ** 2, 0, None))
+    local_std = local_std / (local_std.max() + 1e-8)
+
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
+    morph_grad = cv2.morphologyEx(gray, cv2.MORPH_GRADIENT, kernel).astype(np.float32) / 255.0
+
+    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+    clahe_gray = clahe.apply(gray).astype(np.float32) / 255.0
+
+    hsv = cv2.cvtColor(img_u8, cv2.COLOR_RGB2HSV)
+    brown_mask = cv2.inRange(hsv, (8, 60, 40), (30, 255, 200))
+    lesion = cv2.blur(brown_mask.astype(np.float32) / 255.0, (15, 15))
+
+    lbp_gray = ref_lbp(gray).astype(np.float32) / (core.LBP_POINTS + 2)
+    lab = cv2.cvtColor(img_u8, cv2.COLOR_RGB2LAB)
+    lbp_a = ref_lbp(lab[:, :, 1]).astype(np.float32) / (core.LBP_POINTS + 2)
+
+    sx = cv2.Sobel(gray, cv2.CV_32F, 1, 0, ksize=3)
+    sy = cv2.Sobel(gray, cv2.CV_32F, 0, 1, ksize=3)
+    edge_mag = np.sqrt(sx ** 2 + sy ** 2)
+    edge_mag = edge_mag / (edge_mag.max() + 1e-8)
+    hue_edge = edge_mag * (hsv[:, :, 1].astype(np.float32) / 255.0)
+    hue_edge = hue_edge / (hue_edge.max() + 1e-8)
+
+    return np.stack([gray_f, canny, gabor_out[0], gabor_out[1], local_std, morph_grad,
+                     clahe_gray, lesion, lbp_gray, lbp_a, hue_edge], axis=-1).astype(np.float32)
+
+
+def ref_prepare_inputs(img):
+    img_224 = cv2.resize(img, (core.IMG_SIZE, core.IMG_SIZE))
+    img_f = img_224.astype(np.float32) / 255.0
+    return img_224, ref_color_features(img_f), ref_texture_features(img_f)
+
+
+# ============================================================================
+# CHECK
+# ============================================================================
+
+def _test_images():
+    rng = np.random.default_rng(0)
+    return {
+        "leaf 640x480": synthetic_leaf(640, 480),
+        "leaf 224x224": synthetic_leaf(224, 224, seed=1),
+        "leaf 131x97": synthetic_leaf(131, 97, seed=2),
+        "noise 400x300": rng.integers(0, 256, (300, 400, 3), dtype=np.uint8),
+        "black 224x224": np.zeros((224, 224, 3), np.uint8),
+        "white 200x150": np.full((150, 200, 3), 255, np.uint8),
+    }
+
+
+def _same(a, b):
+    if isinstance(a, tuple):
+        return len(a) == len(b) and all(_same(x, y) for x, y in zip(a, b))
+    if isinstance(a, np.ndarray):
+        return a.dtype == b.dtype and np.array_equal(a, b)
+    return a == b
+
+
+def check(rgb):
+    """{stage: identical?} for one RGB uint8 image."""
+    ctx = core.ImageContext(rgb)
+    pre_ref = ref_preprocess_image(rgb)
+    pre = core.preprocess_image(ctx, "full")
+    img_f = rgb.astype(np.float32) / 255.0
+    return {
+        "quality": _same(ref_assess_image_quality(rgb), core.assess_image_quality(ctx)),
+        "leaf": _same(ref_check_if_leaf(rgb), bool(core.check_if_leaf(ctx))),
+        "preprocess": _same(pre_ref, pre),
+        "color": _same(ref_color_features(img_f), core.extract_color_features(img_f)),
+        "texture": _same(ref_texture_features(img_f), core.extract_texture_features(img_f, "full")),
+        "served": _same(ref_prepare_inputs(pre_ref), core.prepare_inputs(core.ImageContext(pre), "full")),
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--repeat", type=int, default=3, help="timing repeats (0 = parity only)")
+    args = ap.parse_args(argv)
+
+    if local_binary_pattern is None:
+        print("scikit-image not installed - reference LBP is tea_core.uniform_lbp")
+    images = _test_images()
+    ok = True
+    for name, rgb in images.items():
+        result = check(rgb)
+        bad = [stage for stage, same in result.items() if not same]
+        ok &= not bad
+        print(f"{name:<15} {'identical' if not bad else 'MISMATCH: ' + ', '.join(bad)}")
+
+    if args.repeat > 0:
+        rgb = images["leaf 640x480"]
+
+        def reference():
+            ref_assess_image_quality(rgb)
+            ref_check_if_leaf(rgb)
+            ref_prepare_inputs(ref_preprocess_image(rgb))
+
+        def context():
+            ctx = core.ImageContext(rgb)
+            core.assess_image_quality(ctx)
+            core.check_if_leaf(ctx)
+            core.prepare_inputs(core.ImageContext(core.preprocess_image(ctx, "full")), "full")
+
+        print("\ngates + preprocess + features, 640x480:")
+        for name, fn in (("reference", reference), ("context", context)):
+            fn()
+            ms = min(timeit.repeat(fn, number=1, repeat=args.repeat)) * 1e3
+            print(f"  {name:<10}{ms:>10.1f} ms")
+
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+"""
+Allocation + latency benchmark and equality check for the feature extractors.
+
+Compares tea_core.extract_color_features / extract_texture_features, which
+keep their intermediates in a per-thread FeatureWorkspace and write through
+OpenCV dst= / NumPy out=, against the allocating reference below (the
+extractors as they were before the workspace: every step returns a new
+array). Both run on the same ImageContext (colour spaces / CLAHE computed
+once, outside the timing) into preallocated outputs, the way
+ModelBinding.write_image fills the interpreter's input tensors, so only
+the extractors themselves are measured.
+
+Reported per 224x224 image:
+  ms        best-of-3 mean latency
+  peak MiB  transient memory while extracting (tracemalloc, after warm-up);
+            the reference allocates one or more temporaries per step, the
+            workspace path reuses its buffers
+Exits non-zero if any output differs from the reference.
+
+Usage:
+  python bench_features.py [--repeat 50] [--profile fast]
+"""
+
+import argparse
+import sys
+import timeit
+import tracemalloc
+
+import cv2
+import numpy as np
+
+import tea_core as core
+from bench_stages import synthetic_leaf
+
+
+# ============================================================================
+# ALLOCATING REFERENCE  (pre-workspace extractors, same arithmetic)
+# ============================================================================
+
+def ref_uniform_lbp(image, P=core.LBP_POINTS, R=core.LBP_RADIUS):
+    img = np.asarray(image, dtype=np.float64)
+    rows, cols = img.shape
+    pad = int(np.ceil(R))
+    padded = np.pad(img, pad)
+
+    def shifted(dr, dc):
+        return padded[pad + dr:pad + dr + rows, pad + dc:pad + dc + cols]
+
+    r_idx = np.arange(rows, dtype=np.float64)[:, None]
+    c_idx = np.arange(cols, dtype=np.float64)[None, :]
+    code = np.zeros((rows, cols), dtype=np.uint16 if P > 8 else np.uint8)
+    for i in range(P):
+        rp = round(-R * np.sin(2 * np.pi * i / P), 5)
+        cp = round(R * np.cos(2 * np.pi * i / P), 5)
+        if rp == int(rp) and cp == int(cp):
+            texture = shifted(int(rp), int(cp))
+        else:
+            r, c = r_idx + rp, c_idx + cp
+            r0, c0 = np.floor(r), np.floor(c)
+            dr, dc = r - r0, c - c0
+            minr, maxr = int(np.floor(rp)), int(np.ceil(rp))
+            minc, maxc = int(np.floor(cp)), int(np.ceil(cp))
+            top = (1 - dc) * shifted(minr, minc) + dc * shifted(minr, maxc)
+            bottom = (1 - dc) * shifted(maxr, minc) + dc * shifted(maxr, maxc)
+            texture = (1 - dr) * top + dr * bottom
+        code |= ((texture - img >= 0).astype(code.dtype) << i)
+    return core._uniform_lbp_lut(P)[code].astype(np.float64)
+
+
+def ref_color_features(ctx, out):
+    img_float, hsv, lab = ctx.float, ctx.hsv, ctx.lab
+    H = hsv[:, :, 0].astype(np.float32) / 180.0
+    S = hsv[:, :, 1].astype(np.float32) / 255.0
+    L_clahe = ctx.clahe_l.astype(np.float32) / 255.0
+    a_star = lab[:, :, 1].astype(np.float32) / 255.0
+    b_star = lab[:, :, 2].astype(np.float32) / 255.0
+    R, G, B = img_float[:, :, 0], img_float[:, :, 1], img_float[:, :, 2]
+    ExG = np.clip(2 * G - R - B, -1, 1)
+    ab_ratio = np.where(np.abs(b_star) > 0.01, np.clip(a_star / (b_star + 1e-8), -2, 2) / 4 + 0.5, 0.5)
+    rg_ratio = np.where(G > 0.01, np.clip(R / (G + 1e-8), 0, 4) / 4, 0.5)
+    for i, ch in enumerate([H, S, L_clahe, a_star, b_star, ExG, ab_ratio, rg_ratio]):
+        out[..., i] = ch
+    return out
+
+
+def _ref_gabor(ctx, kern):
+    resp = cv2.filter2D(ctx.gray, cv2.CV_32F, kern)
+    return np.clip(np.abs(resp) / (np.abs(resp).max() + 1e-8), 0, 1)
+
+
+def _ref_local_std(ctx):
+    gray_f = ctx.gray_float
+    mu = cv2.blur(gray_f, (7, 7))
+    sq = cv2.blur(gray_f ** 2, (7, 7))
+    local_std = np.sqrt(np.clip(sq - mu ** 2, 0, None))
+    return local_std / (local_std.max() + 1e-8)
+
+
+def _ref_hue_edge(ctx):
+    sx = cv2.Sobel(ctx.gray, cv2.CV_32F, 1, 0, ksize=3)
+    sy = cv2.Sobel(ctx.gray, cv2.CV_32F, 0, 1, ksize=3)
+    edge_mag = np.sqrt(sx ** 2 + sy ** 2)
+    edge_mag = edge_mag / (edge_mag.max() + 1e-8)
+    hue_edge = edge_mag * (ctx.hsv[:, :, 1].astype(np.float32) / 255.0)
+    return hue_edge / (hue_edge.max() + 1e-8)
+
+
+def ref_texture_features(ctx, cfg, out):
+    ksize = cfg["gabor_ksize"]
+    kernels = [cv2.getGaborKernel((ksize, ksize), sigma=4.0, theta=theta, lambd=10.0, gamma=0.5, psi=0)
+               for theta in [0, np.pi / 4]]
+    channels = [
+        lambda: ctx.gray_float,
+        lambda: cv2.Canny(ctx.gray, 50, 150).astype(np.float32) / 255.0,
+        lambda: _ref_gabor(ctx, kernels[0]),
+        lambda: _ref_gabor(ctx, kernels[1]),
+        lambda: _ref_local_std(ctx),
+        lambda: cv2.morphologyEx(ctx.gray, cv2.MORPH_GRADIENT, cv2.getStructuringElement(
+            cv2.MORPH_ELLIPSE, (5, 5))).astype(np.float32) / 255.0,
+        lambda: ctx.clahe_gray.astype(np.float32) / 255.0,
+        lambda: cv2.blur(cv2.inRange(ctx.hsv, (8, 60, 40), (30, 255, 200)).astype(np.float32) / 255.0,
+                         (15, 15)),
+        lambda: ref_uniform_lbp(ctx.gray).astype(np.float32) / (core.LBP_POINTS + 2),
+        lambda: ref_uniform_lbp(ctx.lab[:, :, 1]).astype(np.float32) / (core.LBP_POINTS + 2),
+        lambda: _ref_hue_edge(ctx),
+    ]
+    for i, channel in enumerate(channels):
+        out[..., i] = channel()
+    return out
+
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def _test_images(size):
+    rng = np.random.default_rng(0)
+    return {
+        "leaf": cv2.resize(synthetic_leaf(1280, 960), (size, size), interpolation=cv2.INTER_AREA),
+        "leaf-small": synthetic_leaf(size, size, seed=1),
+        "noise": rng.integers(0, 256, (size, size, 3), dtype=np.uint8),
+        "black": np.zeros((size, size, 3), np.uint8),
+    }
+
+
+def _warm_context(rgb):
+    ctx = core.ImageContext(rgb)
+    for attr in ("float", "hsv", "lab", "gray", "gray_float", "clahe_gray", "clahe_l"):
+        getattr(ctx, attr)
+    return ctx
+
+
+def _peak_mib(fn):
+    """Transient memory of one call, after a warm-up call."""
+    fn()
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        fn()
+        return (tracemalloc.get_traced_memory()[1] - base) / 2 ** 20
+    finally:
+        tracemalloc.stop()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--size", type=int, default=core.IMG_SIZE)
+    ap.add_argument("--profile", default=core.DEFAULT_PROFILE, choices=list(core.PROFILES))
+    ap.add_argument("--repeat", type=int, default=50)
+    args = ap.parse_args(argv)
+
+    cfg = core.get_profile(args.profile)
+    shape = (args.size, args.size)
+    color = [np.empty(shape + (core.COLOR_CHANNELS,), np.float32) for _ in range(2)]
+    texture = [np.empty(shape + (core.TEXTURE_CHANNELS,), np.float32) for _ in range(2)]
+
+    ok = True
+    for name, rgb in _test_images(args.size).items():
+        ctx = _warm_context(rgb)
+        ref_color_features(ctx, color[0])
+        core.extract_color_features(ctx, out=color[1])
+        ref_texture_features(ctx, cfg, texture[0])
+        core.extract_texture_features(ctx, args.profile, out=texture[1])
+        same = np.array_equal(color[0], color[1]) and np.array_equal(texture[0], texture[1])
+        ok &= same
+        print(f"{name:<11} {'identical' if same else 'MISMATCH'}")
+
+    ctx = _warm_context(_test_images(args.size)["leaf"])
+    runs = {
+        "reference": lambda: (ref_color_features(ctx, color[0]), ref_texture_features(ctx, cfg, texture[0])),
+        "workspace": lambda: (core.extract_color_features(ctx, out=color[1]),
+                              core.extract_texture_features(ctx, args.profile, out=texture[1])),
+    }
+    print(f"\n{'':<11}{'ms / image':>12}{'peak MiB':>11}")
+    timings = {}
+    for name, fn in runs.items():
+        peak = _peak_mib(fn)
+        timings[name] = min(timeit.repeat(fn, number=args.repeat, repeat=3)) / args.repeat * 1e3
+        print(f"{name:<11}{timings[name]:>12.3f}{peak:>11.2f}")
+    print(f"\nspeed-up {timings['reference'] / timings['workspace']:.2f}x, "
+          f"workspace holds {core.get_workspace(shape).nbytes() / 2 ** 20:.2f} MiB per thread")
+
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
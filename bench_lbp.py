@@ -0,0 +1,72 @@
+"""
+Benchmark + equality check for the built-in uniform LBP.
+
+Compares tea_core.uniform_lbp against
+skimage.feature.local_binary_pattern(P=8, R=1, method="uniform") on
+224x224 uint8 inputs (the size used by extract_texture_features).
+Exits non-zero if the outputs differ. Timing of skimage is skipped when it
+is not installed.
+
+Usage:
+  python bench_lbp.py [--repeat 200]
+"""
+
+import argparse
+import sys
+import timeit
+
+import numpy as np
+
+import tea_core as core
+
+
+def _test_images(rng, size):
+    """Random, posterised, flat and smooth-gradient images."""
+    rand = rng.integers(0, 256, (size, size), dtype=np.uint8)
+    yy, xx = np.mgrid[0:size, 0:size]
+    return {
+        "random": rand,
+        "posterised": (rand // 64 * 64).astype(np.uint8),
+        "flat": np.full((size, size), 128, dtype=np.uint8),
+        "gradient": ((xx + yy) * 255 // (2 * size - 2)).astype(np.uint8),
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--size", type=int, default=core.IMG_SIZE)
+    ap.add_argument("--repeat", type=int, default=200)
+    args = ap.parse_args(argv)
+
+    try:
+        from skimage.feature import local_binary_pattern
+    except ImportError:
+        local_binary_pattern = None
+        print("scikit-image not installed - equality check and reference timing skipped")
+
+    rng = np.random.default_rng(0)
+    images = _test_images(rng, args.size)
+
+    ok = True
+    if local_binary_pattern is not None:
+        for name, img in images.items():
+            ref = local_binary_pattern(img, P=core.LBP_POINTS, R=core.LBP_RADIUS, method="uniform")
+            ours = core.uniform_lbp(img)
+            same = ref.dtype == ours.dtype and np.array_equal(ref, ours)
+            ok &= same
+            print(f"{name:<11} {'identical' if same else 'MISMATCH'}")
+
+    img = images["random"]
+    ours_ms = min(timeit.repeat(lambda: core.uniform_lbp(img), number=args.repeat, repeat=3)) / args.repeat * 1e3
+    print(f"uniform_lbp           {ours_ms:7.3f} ms / image")
+    if local_binary_pattern is not None:
+        ref_ms = min(timeit.repeat(
+            lambda: local_binary_pattern(img, P=core.LBP_POINTS, R=core.LBP_RADIUS, method="uniform"),
+            number=args.repeat, repeat=3)) / args.repeat * 1e3
+        print(f"local_binary_pattern  {ref_ms:7.3f} ms / image  ({ref_ms / ours_ms:.2f}x)")
+
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,279 @@
+"""
+Per-stage micro-benchmark suite with regression baselines.
+
+Times every stage of the served pipeline on synthetic leaf-like images at
+several input sizes (224x224 up to 48 MP):
+
+  decode, assess_image_quality, check_if_leaf, gates@thumbnail (both gates
+  on the GATE_SIDE copy the app uses), preprocess_image,
+  extract_color_features, texture:<channel> (each of the 11 channels),
+  extract_texture_features, invoke, apply_refinement,
+  generate_heatmap (edge / texture proxy), occlusion_heatmap (model
+  attention, no latency budget), overlay_heatmap
+
+Results (median / min ms per stage and size) are written as JSON and can be
+compared against a stored baseline; stages that got slower than the
+tolerance are reported and the exit code is 1. When the .tflite model (or
+the TFLite runtime) is missing, a stub interpreter with the same three
+inputs stands in so every other stage is still measured.
+
+Usage:
+  python bench_stages.py --sizes 224x224 1280x960 4000x3000 -o bench.json
+  python bench_stages.py --save-baseline bench_baseline.json
+  python bench_stages.py --baseline bench_baseline.json --tolerance 0.25
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+from PIL import Image
+
+import tea_core as core
+
+DEFAULT_SIZES = ["224x224", "1280x960", "4000x3000", "8000x6000"]
+
+
+# ============================================================================
+# STUB MODEL
+# ============================================================================
+
+class StubInterpreter:
+    """
+    Minimal stand-in for tf.lite.Interpreter with the tri-branch signature
+    (rgb [N,224,224,3], color [N,224,224,8], texture [N,224,224,11] -> [N,7]).
+    invoke() pools the inputs and applies a fixed random projection.
+    """
+
+    def __init__(self, batch_size=1, seed=0):
+        s = core.IMG_SIZE
+        self._inputs = [
+            {"name": "rgb_input", "index": 0, "shape": np.array([batch_size, s, s, 3]),
+             "dtype": np.float32, "quantization": (0.0, 0)},
+            {"name": "color_input", "index": 1, "shape": np.array([batch_size, s, s, core.COLOR_CHANNELS]),
+             "dtype": np.float32, "quantization": (0.0, 0)},
+            {"name": "texture_input", "index": 2, "shape": np.array([batch_size, s, s, core.TEXTURE_CHANNELS]),
+             "dtype": np.float32, "quantization": (0.0, 0)},
+        ]
+        self._outputs = [{"name": "probs", "index": 3, "shape": np.array([batch_size, len(core.CLASS_NAMES)]),
+                          "dtype": np.float32, "quantization": (0.0, 0)}]
+        n_feat = 3 + core.COLOR_CHANNELS + core.TEXTURE_CHANNELS
+        self._proj = np.random.default_rng(seed).normal(size=(n_feat, len(core.CLASS_NAMES))).astype(np.float32)
+        self._tensors = {}
+
+    def allocate_tensors(self):
+        for det in self._inputs + self._outputs:
+            self._tensors[det["index"]] = np.zeros(tuple(det["shape"]), dtype=det["dtype"])
+
+    def get_input_details(self):
+        return [dict(d) for d in self._inputs]
+
+    def get_output_details(self):
+        return [dict(d) for d in self._outputs]
+
+    def set_tensor(self, index, value):
+        self._tensors[index][...] = value
+
+    def get_tensor(self, index):
+        return self._tensors[index].copy()
+
+    def tensor(self, index):
+        return lambda: self._tensors[index]
+
+    def invoke(self):
+        pooled = np.concatenate([self._tensors[i].mean(axis=(1, 2)) for i in range(3)], axis=1)
+        logits = (pooled / 255.0 if pooled.max() > 1 else pooled) @ self._proj
+        e = np.exp(logits - logits.max(axis=1, keepdims=True))
+        self._tensors[3][...] = e / e.sum(axis=1, keepdims=True)
+
+
+# ============================================================================
+# SYNTHETIC INPUTS
+# ============================================================================
+
+def synthetic_leaf(width, height, seed=0):
+    """Green elliptical leaf with veins and brown lesions on a pale background."""
+    rng = np.random.default_rng(seed)
+    img = np.full((height, width, 3), (232, 228, 220), dtype=np.uint8)
+    cx, cy = width // 2, height // 2
+    ax, ay = int(width * 0.42), int(height * 0.3)
+    cv2.ellipse(img, (cx, cy), (ax, ay), 15, 0, 360, (58, 132, 48), -1)
+    thick = max(1, min(width, height) // 150)
+    cv2.line(img, (cx - ax, cy), (cx + ax, cy), (96, 160, 80), thick)
+    for k in range(-4, 5):
+        x = cx + k * ax // 5
+        cv2.line(img, (x, cy), (x + ax // 6, cy - ay // 2), (90, 150, 75), thick)
+        cv2.line(img, (x, cy), (x + ax // 6, cy + ay // 2), (90, 150, 75), thick)
+    for _ in range(25):
+        x = int(rng.integers(cx - ax // 2, cx + ax // 2))
+        y = int(rng.integers(cy - ay // 2, cy + ay // 2))
+        r = int(rng.integers(2, max(3, min(width, height) // 25)))
+        cv2.circle(img, (x, y), r, (120, 78, 36), -1)
+    noise = rng.normal(0, 6, img.shape)
+    return np.clip(img + noise, 0, 255).astype(np.uint8)
+
+
+def _encode_jpeg(img):
+    buf = io.BytesIO()
+    Image.fromarray(img).save(buf, format="JPEG", quality=92)
+    return buf.getvalue()
+
+
+# ============================================================================
+# TIMING
+# ============================================================================
+
+def _time(fn, repeats):
+    fn()  # warm-up (lazy imports, kernel caches, allocator)
+    samples = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1e3)
+    return {"median_ms": round(statistics.median(samples), 3),
+            "min_ms": round(min(samples), 3), "repeats": repeats}
+
+
+def bench_size(width, height, interpreter, profile, base_repeats):
+    """Time every stage for one input size; returns {stage: timing}."""
+    pixels = width * height
+    repeats = max(1, round(base_repeats * min(1.0, 1.2e6 / pixels)))
+    img = synthetic_leaf(width, height)
+    jpeg = _encode_jpeg(img)
+    temperature, thresholds = core.load_refinement_config()
+
+    out = {}
+    out["decode"] = _time(lambda: core.load_image_rgb(io.BytesIO(jpeg)), repeats)
+    # Fresh contexts each call so memoisation does not hide the cost
+    out["assess_image_quality"] = _time(lambda: core.assess_image_quality(img), repeats)
+    out["check_if_leaf"] = _time(lambda: core.check_if_leaf(img), repeats)
+
+    def gates():
+        ctx = core.ImageContext(core.make_thumbnail(img, core.GATE_SIDE))
+        return core.assess_image_quality(ctx), core.check_if_leaf(ctx)
+    out["gates@thumbnail"] = _time(gates, repeats)
+    out["preprocess_image"] = _time(lambda: core.preprocess_image(img, profile), repeats)
+
+    pre = core.preprocess_image(img, profile)
+    small = cv2.resize(pre, (core.IMG_SIZE, core.IMG_SIZE))
+    img_f = small.astype(np.float32) / 255.0
+    model_repeats = max(base_repeats, 5)
+    out["extract_color_features"] = _time(lambda: core.extract_color_features(img_f), model_repeats)
+    cfg = core.get_profile(profile)
+    ws = core.get_workspace(small.shape)
+    channel = np.empty(small.shape[:2], dtype=np.float32)
+    for name, fn in core.TEXTURE_CHANNEL_FUNCS:
+        out[f"texture:{name}"] = _time(lambda fn=fn: fn(core.ImageContext(small), cfg, ws, channel),
+                                       model_repeats)
+    out["extract_texture_features"] = _time(lambda: core.extract_texture_features(img_f, profile), model_repeats)
+
+    rgb, color, texture = core.prepare_inputs(pre, profile)
+    out["invoke"] = _time(lambda: core.run_inference(interpreter, rgb, color, texture), model_repeats)
+    raw = core.run_inference(interpreter, rgb, color, texture)
+    out["apply_refinement"] = _time(lambda: core.apply_refinement(raw, temperature, thresholds), model_repeats)
+
+    out["generate_heatmap"] = _time(lambda: core.generate_heatmap(pre, "proxy"), repeats)
+    binding = core.get_binding(interpreter)
+
+    def predict(imgs):
+        step = binding.batch_size
+        return np.concatenate([binding.run_images(imgs[i:i + step], profile)
+                               for i in range(0, len(imgs), step)])
+
+    # No latency budget, so the levels run do not depend on the host's speed
+    out["occlusion_heatmap"] = _time(lambda: core.occlusion_heatmap(pre, profile, budget_ms=float("inf"),
+                                                                    predict=predict), model_repeats)
+    hm, _ = core.generate_heatmap(pre, "proxy")
+    out["overlay_heatmap"] = _time(lambda: core.overlay_heatmap(pre, hm), repeats)
+    return out
+
+
+def compare(results, baseline, tolerance, min_delta_ms):
+    """List of (size, stage, base_ms, now_ms, ratio) that regressed."""
+    regressions = []
+    for size, stages in results["results"].items():
+        for stage, timing in stages.items():
+            ref = baseline.get("results", {}).get(size, {}).get(stage)
+            if not ref:
+                continue
+            base_ms, now_ms = ref["median_ms"], timing["median_ms"]
+            if now_ms > base_ms * (1 + tolerance) and now_ms - base_ms > min_delta_ms:
+                regressions.append((size, stage, base_ms, now_ms, now_ms / max(base_ms, 1e-9)))
+    return regressions
+
+
+def _parse_size(text):
+    w, h = text.lower().split("x")
+    return int(w), int(h)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Per-stage pipeline micro-benchmarks")
+    ap.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES, help="WxH input sizes")
+    ap.add_argument("--profile", default=core.DEFAULT_PROFILE, choices=list(core.PROFILES))
+    ap.add_argument("--repeat", type=int, default=5, help="repeats at <=1.2 MP (fewer above)")
+    ap.add_argument("--stub", action="store_true", help="always use the stub model")
+    ap.add_argument("-o", "--output", default="bench_results.json")
+    ap.add_argument("--baseline", default=None, help="baseline JSON to compare against")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown fraction")
+    ap.add_argument("--min-delta-ms", type=float, default=1.0, help="ignore slowdowns below this")
+    ap.add_argument("--save-baseline", default=None, help="also write the results here")
+    args = ap.parse_args(argv)
+
+    interpreter, model = None, "stub"
+    if not args.stub:
+        interpreter, model_type = core.load_tflite_model()
+        model = "tflite" if interpreter is not None else f"stub ({model_type})"
+    if interpreter is None:
+        interpreter = StubInterpreter()
+        interpreter.allocate_tensors()
+
+    results = {
+        "meta": {
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "host": platform.node(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "opencv": cv2.__version__,
+            "model": model,
+            "profile": args.profile,
+            "feature_version": core.FEATURE_VERSION,
+        },
+        "results": {},
+    }
+    for size in args.sizes:
+        w, h = _parse_size(size)
+        print(f"-- {size} ({w * h / 1e6:.1f} MP)", file=sys.stderr)
+        stages = bench_size(w, h, interpreter, args.profile, args.repeat)
+        results["results"][size] = stages
+        for stage, t in stages.items():
+            print(f"   {stage:<26}{t['median_ms']:>10.2f} ms", file=sys.stderr)
+
+    Path(args.output).write_text(json.dumps(results, indent=2))
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(results, indent=2))
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        regressions = compare(results, baseline, args.tolerance, args.min_delta_ms)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) vs {args.baseline}:")
+            for size, stage, base_ms, now_ms, ratio in regressions:
+                print(f"  {size:<11}{stage:<26}{base_ms:>9.2f} -> {now_ms:>9.2f} ms  ({ratio:.2f}x)")
+            return 1
+        print(f"\nNo regressions vs {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
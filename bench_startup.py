@@ -0,0 +1,187 @@
+"""
+Cold-start benchmark with regression baselines.
+
+Each stage runs in a fresh Python process (median of --repeat runs), so
+every import is paid again the way a new Streamlit server, serve.py worker
+or batch_infer.py process pays it:
+
+  import tea_core      inference core alone
+  tflite runtime       tea_core.tflite_runtime() - the interpreter package
+  load model           load_tflite_model() incl. allocate_tensors
+  first prediction     import -> model -> one 224x224 leaf classified
+  import app           the Streamlit UI module (tea_doctor_TFLITE_fixed)
+
+The `-X importtime` trace of `import tea_core` is parsed for the slowest
+imports, and tea_core must not pull in any of HEAVY_MODULES (streamlit,
+matplotlib, a TFLite runtime, ...) - those load lazily or only in the UI.
+Results are written as JSON; against a --baseline, stages slower than the
+tolerance, or a heavy module showing up, give exit code 1.
+
+Usage:
+  python bench_startup.py -o startup.json
+  python bench_startup.py --save-baseline startup_baseline.json
+  python bench_startup.py --baseline startup_baseline.json --tolerance 0.25
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+
+# Must not be imported by `import tea_core`
+HEAVY_MODULES = ("streamlit", "matplotlib", "tensorflow", "tflite_runtime", "ai_edge_litert",
+                 "scipy", "pandas", "torch")
+
+# Child programs; each prints one JSON line {"ms": ..., ...}
+_PRELUDE = "import json, sys, time\nt0 = time.perf_counter()\n"
+
+STAGES = {
+    "import tea_core": _PRELUDE + (
+        "import tea_core\n"
+        "ms = (time.perf_counter() - t0) * 1e3\n"
+        "heavy = [m for m in HEAVY if m in sys.modules]\n"
+        "print(json.dumps({'ms': ms, 'heavy': heavy}))\n"),
+    "tflite runtime": (
+        "import json, time\n"
+        "import tea_core\n"
+        "t0 = time.perf_counter()\n"
+        "name, _ = tea_core.tflite_runtime()\n"
+        "print(json.dumps({'ms': (time.perf_counter() - t0) * 1e3, 'runtime': name}))\n"),
+    "load model": _PRELUDE + (
+        "import tea_core\n"
+        "interp, status = tea_core.load_tflite_model()\n"
+        "print(json.dumps({'ms': (time.perf_counter() - t0) * 1e3, 'status': status}))\n"),
+    "first prediction": _PRELUDE + (
+        "import numpy as np\n"
+        "import tea_core\n"
+        "interp, status = tea_core.load_tflite_model()\n"
+        "if interp is not None:\n"
+        "    img = np.zeros((224, 224, 3), np.uint8)\n"
+        "    img[..., 1] = 140\n"
+        "    ctx = tea_core.ImageContext(tea_core.preprocess_image(tea_core.ImageContext(img)))\n"
+        "    tea_core.predict_disease(ctx, interp)\n"
+        "print(json.dumps({'ms': (time.perf_counter() - t0) * 1e3, 'status': status}))\n"),
+    "import app": _PRELUDE + (
+        "import tea_doctor_TFLITE_fixed\n"
+        "print(json.dumps({'ms': (time.perf_counter() - t0) * 1e3}))\n"),
+}
+
+
+def _run(code, extra_args=()):
+    """Run `code` in a fresh interpreter -> (parsed last stdout line, stderr)."""
+    code = f"HEAVY = {HEAVY_MODULES!r}\n" + code
+    proc = subprocess.run([sys.executable, *extra_args, "-c", code], cwd=SCRIPT_DIR,
+                          capture_output=True, text=True, env=os.environ.copy())
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed")
+    return json.loads(proc.stdout.strip().splitlines()[-1]), proc.stderr
+
+
+def bench_stage(name, repeats):
+    runs, info = [], {}
+    for _ in range(repeats):
+        out, _ = _run(STAGES[name])
+        runs.append(out.pop("ms"))
+        info = out
+    return {"median_ms": round(statistics.median(runs), 1), "min_ms": round(min(runs), 1),
+            "runs": len(runs), **info}
+
+
+def top_imports(n=15):
+    """Slowest imports under `import tea_core` from -X importtime: (module, self_ms, cumulative_ms)."""
+    _, trace = _run(STAGES["import tea_core"], ("-X", "importtime"))
+    rows = []
+    for line in trace.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cum_us, module = line[len("import time:"):].split("|")
+        # Nested imports are indented two spaces per level; keep tea_core and
+        # the packages it imports directly
+        depth = (len(module) - len(module.lstrip()) - 1) // 2
+        if self_us.strip().isdigit() and depth <= 1:
+            rows.append((module.strip(), int(self_us) / 1e3, int(cum_us) / 1e3))
+    return sorted(rows, key=lambda r: -r[2])[:n]
+
+
+def compare(results, baseline, tolerance, min_delta_ms):
+    """List of (stage, base_ms, now_ms, ratio) that regressed."""
+    regressions = []
+    for stage, timing in results["results"].items():
+        ref = baseline.get("results", {}).get(stage)
+        if not ref or "median_ms" not in ref or "median_ms" not in timing:
+            continue
+        base_ms, now_ms = ref["median_ms"], timing["median_ms"]
+        if now_ms > base_ms * (1 + tolerance) and now_ms - base_ms > min_delta_ms:
+            regressions.append((stage, base_ms, now_ms, now_ms / max(base_ms, 1e-9)))
+    return regressions
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Cold-start (import / first prediction) benchmark")
+    ap.add_argument("--stages", nargs="+", default=list(STAGES), choices=list(STAGES))
+    ap.add_argument("--repeat", type=int, default=5, help="fresh processes per stage")
+    ap.add_argument("-o", "--output", default="startup_results.json")
+    ap.add_argument("--baseline", default=None, help="baseline JSON to compare against")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown fraction")
+    ap.add_argument("--min-delta-ms", type=float, default=20.0, help="ignore slowdowns below this")
+    ap.add_argument("--save-baseline", default=None, help="also write the results here")
+    args = ap.parse_args(argv)
+
+    results = {
+        "meta": {
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "host": platform.node(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "python": platform.python_version(),
+            "runtime_pin": os.environ.get("TEA_TFLITE_RUNTIME"),
+        },
+        "results": {},
+    }
+    for stage in args.stages:
+        try:
+            results["results"][stage] = t = bench_stage(stage, args.repeat)
+        except RuntimeError as e:
+            results["results"][stage] = {"error": str(e)}
+            print(f"   {stage:<20}{'failed':>12}  {e}", file=sys.stderr)
+            continue
+        extra = "  ".join(f"{k}={v}" for k, v in t.items() if k not in ("median_ms", "min_ms", "runs"))
+        print(f"   {stage:<20}{t['median_ms']:>9.1f} ms  {extra}", file=sys.stderr)
+
+    top = top_imports()
+    results["top_imports"] = [{"module": m, "self_ms": s, "cumulative_ms": c} for m, s, c in top]
+    print("\n   slowest imports under tea_core (cumulative ms):", file=sys.stderr)
+    for m, _, c in top[:8]:
+        print(f"   {m:<28}{c:>9.1f}", file=sys.stderr)
+
+    Path(args.output).write_text(json.dumps(results, indent=2))
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(results, indent=2))
+
+    failed = False
+    heavy = results["results"].get("import tea_core", {}).get("heavy")
+    if heavy:
+        print(f"\ntea_core imports heavy module(s): {', '.join(heavy)}")
+        failed = True
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        regressions = compare(results, baseline, args.tolerance, args.min_delta_ms)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) vs {args.baseline}:")
+            for stage, base_ms, now_ms, ratio in regressions:
+                print(f"  {stage:<20}{base_ms:>9.1f} -> {now_ms:>9.1f} ms  ({ratio:.2f}x)")
+            failed = True
+        else:
+            print(f"\nNo regressions vs {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+"""
+Tea Doctor - latency / accuracy report per preprocessing fidelity profile.
+
+Runs the served pipeline (preprocess_image -> features -> TFLite ->
+refinement) over a labeled, class-per-folder dataset once per profile in
+PROFILES and reports, for each profile:
+  - per-image latency (mean / p50 / p95, preprocess + features + invoke)
+  - accuracy and macro-F1 (refined predictions)
+  - delta vs the "full" profile and prediction agreement with it ("full"
+    is always evaluated, first, as the reference)
+Images are decoded one at a time in every pass, so memory does not grow
+with the dataset; decoding is not part of the latency.
+With --tta, uncertain / triplet-confused images are re-classified with the
+adaptive test-time augmentation (core.predict_tta) and the share of images
+that needed it is reported.
+
+Dataset layout:
+  dataset/Brown_Blight/*.jpg
+  dataset/Gray_Blight/*.jpg
+  ...
+
+Usage:
+  python eval_profiles.py dataset/ [--limit 50] [--tta] [-o profiles_report.json]
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+import tea_core as core
+from batch_infer import IMAGE_EXTS
+
+
+def iter_labeled_images(root, limit=None):
+    """Yield (path, class_index) for every image under root/<class_name>/."""
+    root = Path(root)
+    for idx, cls in enumerate(core.CLASS_NAMES):
+        folder = root / cls
+        if not folder.is_dir():
+            continue
+        paths = sorted(p for p in folder.rglob("*") if p.suffix.lower() in IMAGE_EXTS)
+        for p in paths[:limit]:
+            yield p, idx
+
+
+def classification_metrics(y_true, y_pred, n_classes=len(core.CLASS_NAMES)):
+    """Accuracy, macro-F1, per-class P/R/F1 and confusion matrix."""
+    y_true, y_pred = np.asarray(y_true), np.asarray(y_pred)
+    cm = np.zeros((n_classes, n_classes), dtype=np.int64)
+    np.add.at(cm, (y_true, y_pred), 1)
+    tp = np.diag(cm).astype(np.float64)
+    support = cm.sum(axis=1)
+    predicted = cm.sum(axis=0)
+    precision = np.divide(tp, predicted, out=np.zeros_like(tp), where=predicted > 0)
+    recall = np.divide(tp, support, out=np.zeros_like(tp), where=support > 0)
+    denom = precision + recall
+    f1 = np.divide(2 * precision * recall, denom, out=np.zeros_like(tp), where=denom > 0)
+    present = support > 0
+    return {
+        "accuracy": float(tp.sum() / max(cm.sum(), 1)),
+        "macro_f1": float(f1[present].mean()) if present.any() else 0.0,
+        "per_class": {
+            cls: {"precision": float(precision[i]), "recall": float(recall[i]),
+                  "f1": float(f1[i]), "support": int(support[i])}
+            for i, cls in enumerate(core.CLASS_NAMES)
+        },
+        "confusion_matrix": cm.tolist(),
+    }
+
+
+def evaluate_profile(samples, interpreter, profile, temperature, thresholds, tta=False):
+    """
+    Return (predictions, per-image latencies in ms, TTA count) for one
+    profile. Images that cannot be decoded are predicted as -1.
+    """
+    preds, latencies, tta_runs = [], [], 0
+    for path, _ in samples:
+        try:
+            image = core.load_image_rgb(path)
+        except Exception as e:
+            print(f"skipping {path}: {e}", file=sys.stderr)
+            preds.append(-1)
+            continue
+        t0 = time.perf_counter()
+        pre = core.preprocess_image(image, profile)
+        raw = core.predict_disease(pre, interpreter, profile)[2]
+        if tta and core.needs_tta(raw):
+            raw = core.predict_tta(pre, profile)
+            tta_runs += 1
+        latencies.append((time.perf_counter() - t0) * 1e3)
+        preds.append(int(np.argmax(core.apply_refinement(raw, temperature, thresholds))))
+    return np.array(preds), np.array(latencies), tta_runs
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Latency and accuracy per fidelity profile")
+    ap.add_argument("dataset", help="class-per-folder labeled image tree")
+    ap.add_argument("--limit", type=int, default=None, help="max images per class")
+    ap.add_argument("--profiles", nargs="+", default=list(core.PROFILES))
+    ap.add_argument("--tta", action="store_true", help="adaptive test-time augmentation")
+    ap.add_argument("-o", "--output", default=None, help="write the full report as JSON")
+    args = ap.parse_args(argv)
+
+    interpreter, model_type = core.load_tflite_model()
+    if interpreter is None:
+        print(f"Model unavailable ({model_type})", file=sys.stderr)
+        return 1
+    temperature, thresholds = core.load_refinement_config()
+
+    samples = list(iter_labeled_images(args.dataset, args.limit))
+    if not samples:
+        print(f"No labeled images found under {args.dataset}", file=sys.stderr)
+        return 1
+    # Deltas and agreement are always against the trained-as "full" profile
+    profiles = ["full"] + [p for p in args.profiles if p != "full"]
+    report, reference = {}, None
+    for profile in profiles:
+        preds, lat, tta_runs = evaluate_profile(samples, interpreter, profile, temperature, thresholds,
+                                                args.tta)
+        if reference is None:
+            # Unreadable images are dropped once, on the reference pass
+            readable = preds >= 0
+            samples = [s for s, ok in zip(samples, readable) if ok]
+            preds = preds[readable]
+            labels = [label for _, label in samples]
+            if not samples:
+                print("No readable images", file=sys.stderr)
+                return 1
+        metrics = classification_metrics(labels, preds)
+        if reference is None:
+            reference = (profile, preds, metrics)
+        metrics.update({
+            "profile": core.get_profile(profile),
+            "images": len(samples),
+            "latency_ms": {"mean": float(lat.mean()), "p50": float(np.percentile(lat, 50)),
+                           "p95": float(np.percentile(lat, 95))},
+            "reference": reference[0],
+            "accuracy_delta": metrics["accuracy"] - reference[2]["accuracy"],
+            "macro_f1_delta": metrics["macro_f1"] - reference[2]["macro_f1"],
+            "agreement": float(np.mean(preds == reference[1])),
+            "tta_rate": tta_runs / len(samples) if args.tta else None,
+        })
+        report[profile] = metrics
+
+    print(f"{'profile':<12}{'mean ms':>9}{'p95 ms':>9}{'acc':>8}{'dAcc':>8}{'mF1':>8}{'dF1':>8}{'agree':>8}"
+          + (f"{'TTA':>7}" if args.tta else ""))
+    for profile, m in report.items():
+        print(f"{profile:<12}{m['latency_ms']['mean']:>9.1f}{m['latency_ms']['p95']:>9.1f}"
+              f"{m['accuracy']:>8.4f}{m['accuracy_delta']:>+8.4f}"
+              f"{m['macro_f1']:>8.4f}{m['macro_f1_delta']:>+8.4f}{m['agreement']:>8.3f}"
+              + (f"{m['tta_rate']:>7.0%}" if args.tta else ""))
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,340 @@
+"""
+Tea Doctor - evaluation of the served pipeline, in the results_final schema.
+
+The metrics in results_final (1).json come from the training notebook. This
+runs what the app actually serves over a labeled, class-per-folder tree:
+
+  load_image_rgb -> preprocess_image(profile) -> tea_core colour / texture
+  features -> TFLite (batched invoke) -> [adaptive TTA] -> apply_refinement
+
+across a pool of worker processes, and writes accuracy, macro / weighted
+F1, the per-class report and the confusion matrix (counts and row %) with
+the same keys as results_final, plus throughput and per-image latency.
+
+Every finished image is appended to a JSONL checkpoint (<output>.checkpoint.jsonl
+by default). Re-running the same command resumes after a crash: images
+already in the checkpoint are skipped, failed ones are retried. The
+checkpoint header records the model fingerprint, feature code hash,
+profile, TTA setting and refinement config; a run with different settings
+refuses it unless --restart is given.
+
+With --baseline (an earlier output of this script) accuracy, macro-F1 and
+throughput are compared, and --max-drop turns an accuracy / macro-F1 loss
+beyond it into exit code 1, so a candidate optimisation is checked for
+speed and accuracy in one run.
+
+Usage:
+  python evaluate.py dataset/ -o eval_results.json --workers 8
+  python evaluate.py dataset/ -o eval_fast.json --profile fast --baseline eval_results.json --max-drop 0.005
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import multiprocessing as mp
+from pathlib import Path
+
+import numpy as np
+
+import tea_core as core
+from eval_profiles import classification_metrics, iter_labeled_images
+from feature_store import extractor_hash
+
+
+# ============================================================================
+# WORKERS
+# ============================================================================
+
+_worker = {}
+
+
+def _init_worker(profile, tta, temperature, thresholds):
+    # One process per core scales better than nested threads: single-threaded
+    # OpenCV and interpreters, whatever the tuned profile says
+    core.configure_worker(1)
+    _worker.update(profile=profile, tta=tta, temperature=temperature,
+                   thresholds=np.asarray(thresholds, dtype=np.float32))
+
+
+def _eval_chunk(chunk):
+    """Classify [(path, label)] with one batched invoke; returns checkpoint rows."""
+    profile = _worker["profile"]
+    rows, images = [], []
+    for path, label in chunk:
+        t0 = time.perf_counter()
+        try:
+            images.append(core.preprocess_image(core.load_image_rgb(path), profile))
+        except Exception as e:
+            rows.append({"path": path, "label": label, "error": f"{type(e).__name__}: {e}"})
+            continue
+        rows.append({"path": path, "label": label, "ms": (time.perf_counter() - t0) * 1e3})
+    ok = [r for r in rows if "error" not in r]
+    if not ok:
+        return rows
+
+    t0 = time.perf_counter()
+    try:
+        raw = core.predict_images_batch(images, profile)
+    except Exception as e:
+        for r in ok:
+            r.pop("ms")
+            r["error"] = f"{type(e).__name__}: {e}"
+        return rows
+    share = (time.perf_counter() - t0) * 1e3 / len(ok)
+    for r, probs, img in zip(ok, raw, images):
+        t0 = time.perf_counter()
+        if _worker["tta"] and core.needs_tta(probs):
+            probs = core.predict_tta(img, profile)
+            r["tta"] = True
+        refined = core.apply_refinement(probs, _worker["temperature"], _worker["thresholds"])
+        r["pred"] = int(np.argmax(refined))
+        r["raw"] = [round(float(p), 6) for p in probs]
+        r["ms"] = round(r["ms"] + share + (time.perf_counter() - t0) * 1e3, 3)
+    return rows
+
+
+# ============================================================================
+# CHECKPOINT
+# ============================================================================
+
+def run_config(profile, tta, temperature, thresholds):
+    """Everything a checkpointed prediction depends on."""
+    return {
+        "model": core.get_model_registry().active,
+        "model_sha256": core.model_fingerprint(),
+        "feature_hash": extractor_hash(profile, "float32"),
+        "profile": profile,
+        "tta": bool(tta),
+        "temperature": round(float(temperature), 6),
+        "thresholds": [round(float(t), 6) for t in thresholds],
+    }
+
+
+def load_checkpoint(path, config):
+    """
+    ({path: row} of finished images, {session: (images, seconds)} of earlier
+    runs); both empty when there is no checkpoint yet.
+    """
+    path = Path(path)
+    done, sessions = {}, {}
+    if not path.exists():
+        return done, sessions
+    with open(path, encoding="utf-8") as fh:
+        for n, line in enumerate(fh):
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # last line cut short by a crash
+            if n == 0:
+                if row.get("config") != config:
+                    raise RuntimeError(f"checkpoint {path} was written with other settings "
+                                       f"({row.get('config')}); pass --restart to discard it")
+                continue
+            if "session" in row:
+                sessions[row["session"]] = (row["images"], row["seconds"])
+            elif "error" not in row:
+                done[row["path"]] = row
+    return done, sessions
+
+
+# ============================================================================
+# REPORT
+# ============================================================================
+
+def build_report(rows, errors, config, stats, dataset):
+    """results_final-style dict from checkpoint rows of the current dataset."""
+    y_true = [r["label"] for r in rows]
+    y_pred = [r["pred"] for r in rows]
+    m = classification_metrics(y_true, y_pred)
+    cm = np.array(m["confusion_matrix"])
+    support = cm.sum(axis=1)
+    f1 = np.array([m["per_class"][c]["f1"] for c in core.CLASS_NAMES])
+    pct = np.divide(cm * 100.0, support[:, None], out=np.zeros(cm.shape), where=support[:, None] > 0)
+    lat = np.array([r["ms"] for r in rows]) if rows else np.zeros(1)
+    version = core.get_model_registry().get()
+    return {
+        "metadata": {
+            "model": config["model"],
+            "model_sha256": config["model_sha256"],
+            "pipeline": "served: preprocess_image + tea_core features + TFLite"
+                        + (" + adaptive TTA" if config["tta"] else "") + " + refinement",
+            "version": core.FEATURE_VERSION,
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "dataset": str(dataset),
+            "image_size": core.IMG_SIZE,
+            "profile": config["profile"],
+            "refinement": {"temperature": config["temperature"], "thresholds": config["thresholds"]},
+            "runtime": core.tflite_runtime()[0],
+            "feature_hash": config["feature_hash"],
+        },
+        "performance": {
+            "test_accuracy": round(m["accuracy"], 5),
+            "macro_f1": round(m["macro_f1"], 5),
+            "weighted_f1": round(float((f1 * support).sum() / max(support.sum(), 1)), 5),
+            "test_samples": len(rows),
+            "classes": core.CLASS_NAMES,
+            "tta_enabled": config["tta"],
+            "tta_rate": round(sum(bool(r.get("tta")) for r in rows) / max(len(rows), 1), 4),
+            "errors": len(errors),
+        },
+        "per_class_metrics": m["per_class"],
+        "confusion_matrix": cm.tolist(),
+        "confusion_matrix_pct": np.round(pct, 2).tolist(),
+        "edge_deployment": {
+            "tflite_size_mb": round(version.path.stat().st_size / 2 ** 20, 2) if version else None,
+            "mean_latency_ms": round(float(lat.mean()), 2),
+            "std_latency_ms": round(float(lat.std()), 2),
+            "p50_latency_ms": round(float(np.percentile(lat, 50)), 2),
+            "p95_latency_ms": round(float(np.percentile(lat, 95)), 2),
+            "fps": round(1e3 / lat.mean(), 1) if lat.mean() > 0 else 0.0,
+        },
+        "throughput": stats,
+        "errors": errors[:100],
+    }
+
+
+def compare(report, baseline):
+    """(name, baseline, current, delta) for accuracy, macro-F1 and throughput."""
+    rows = []
+    for name, get in (("accuracy", lambda r: r["performance"]["test_accuracy"]),
+                      ("macro_f1", lambda r: r["performance"]["macro_f1"]),
+                      ("images_per_sec", lambda r: r["throughput"]["images_per_sec"]),
+                      ("mean_latency_ms", lambda r: r["edge_deployment"]["mean_latency_ms"])):
+        try:
+            base, now = get(baseline), get(report)
+        except (KeyError, TypeError):
+            continue
+        rows.append((name, base, now, now - base))
+    return rows
+
+
+# ============================================================================
+# DRIVER
+# ============================================================================
+
+def run_eval(dataset, output, profile=core.DEFAULT_PROFILE, workers=None, chunk_size=8, tta=False,
+             limit=None, checkpoint=None, restart=False, progress=None):
+    """Evaluate (resuming from the checkpoint) and write the report to `output`; returns it."""
+    interpreter, status = core.load_tflite_model()
+    if interpreter is None:
+        raise RuntimeError(f"model unavailable ({status})")
+    samples = [(str(p), label) for p, label in iter_labeled_images(dataset, limit)]
+    if not samples:
+        raise RuntimeError(f"no labeled images found under {dataset}")
+    temperature, thresholds = core.load_refinement_config()
+    config = run_config(profile, tta, temperature, thresholds)
+    output = Path(output)
+    checkpoint = Path(checkpoint) if checkpoint else output.with_name(output.stem + ".checkpoint.jsonl")
+    if restart:
+        checkpoint.unlink(missing_ok=True)
+    done, sessions = load_checkpoint(checkpoint, config)
+    session = time.strftime("%Y%m%dT%H%M%S")
+    resumed = sum(path in done for path, _ in samples)
+    todo = [s for s in samples if s[0] not in done]
+    chunks = [todo[i:i + chunk_size] for i in range(0, len(todo), chunk_size)]
+    workers = max(1, min(workers or os.cpu_count() or 1, len(chunks) or 1))
+
+    errors = {}
+    t0 = time.perf_counter()
+    new = not checkpoint.exists()
+    checkpoint.parent.mkdir(parents=True, exist_ok=True)
+    with open(checkpoint, "a", encoding="utf-8") as fh:
+        if new:
+            fh.write(json.dumps({"config": config}) + "\n")
+        if chunks:
+            pool = mp.get_context("spawn").Pool(workers, initializer=_init_worker,
+                                                initargs=(profile, tta, temperature, thresholds.tolist()))
+            try:
+                for rows in pool.imap_unordered(_eval_chunk, chunks):
+                    for row in rows:
+                        fh.write(json.dumps(row) + "\n")
+                        if "error" in row:
+                            errors[row["path"]] = row["error"]
+                        else:
+                            done[row["path"]] = row
+                    # Wall time so far, so throughput survives a crash too
+                    fh.write(json.dumps({"session": session, "images": len(done) - resumed,
+                                         "seconds": round(time.perf_counter() - t0, 3)}) + "\n")
+                    fh.flush()
+                    if progress:
+                        progress(len(done) - resumed + len(errors), len(todo), time.perf_counter() - t0)
+            finally:
+                pool.close()
+                pool.join()
+    elapsed = time.perf_counter() - t0
+
+    evaluated = len(done) - resumed
+    if evaluated:
+        sessions[session] = (evaluated, elapsed)
+    # Over every session of the checkpoint (a resumed run adds to it)
+    images, seconds = (sum(v) for v in zip(*sessions.values())) if sessions else (0, 0.0)
+    stats = {
+        "images_per_sec": round(images / seconds, 2) if images and seconds > 0 else 0.0,
+        "seconds": round(seconds, 2),
+        "sessions": len(sessions),
+        "images_this_run": evaluated,
+        "seconds_this_run": round(elapsed, 2),
+        "resumed": resumed,
+        "workers": workers,
+        "chunk_size": chunk_size,
+        "cpu_count": os.cpu_count(),
+    }
+    rows = [done[path] for path, _ in samples if path in done]
+    report = build_report(rows, [{"path": p, "error": e} for p, e in errors.items()], config, stats, dataset)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=1))
+    return report
+
+
+def _print_progress(done, total, elapsed):
+    rate = done / elapsed if elapsed > 0 else 0.0
+    print(f"\r{done}/{total}  {rate:.1f} img/s", end="", file=sys.stderr, flush=True)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Evaluate the served pipeline on a labeled image tree")
+    ap.add_argument("dataset", help="class-per-folder labeled image tree")
+    ap.add_argument("-o", "--output", default="eval_results.json")
+    ap.add_argument("--profile", default=core.DEFAULT_PROFILE, choices=list(core.PROFILES))
+    ap.add_argument("--tta", action="store_true", help="adaptive test-time augmentation, as in the app")
+    ap.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    ap.add_argument("--chunk-size", type=int, default=8, help="images per task / batched invoke")
+    ap.add_argument("--limit", type=int, default=None, help="max images per class")
+    ap.add_argument("--checkpoint", default=None, help="default: <output>.checkpoint.jsonl")
+    ap.add_argument("--restart", action="store_true", help="discard the checkpoint and start over")
+    ap.add_argument("--baseline", default=None, help="earlier evaluate.py output to compare against")
+    ap.add_argument("--max-drop", type=float, default=None,
+                    help="with --baseline: exit 1 if accuracy or macro-F1 drop by more than this")
+    args = ap.parse_args(argv)
+
+    try:
+        report = run_eval(args.dataset, args.output, args.profile, args.workers, args.chunk_size, args.tta,
+                          args.limit, args.checkpoint, args.restart, progress=_print_progress)
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(file=sys.stderr)
+    perf, tp = report["performance"], report["throughput"]
+    print(f"{perf['test_samples']} images ({tp['resumed']} from checkpoint, {perf['errors']} errors)  "
+          f"acc {perf['test_accuracy']:.4f}  macro-F1 {perf['macro_f1']:.4f}  "
+          f"{tp['images_per_sec']:.1f} img/s  {report['edge_deployment']['mean_latency_ms']:.1f} ms/img")
+    print(f"Wrote {args.output}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        print(f"\n{'vs ' + args.baseline:<28}{'baseline':>10}{'now':>10}{'delta':>10}")
+        failed = False
+        for name, base, now, delta in compare(report, baseline):
+            print(f"{name:<28}{base:>10.4f}{now:>10.4f}{delta:>+10.4f}")
+            if args.max_drop is not None and name in ("accuracy", "macro_f1") and -delta > args.max_drop:
+                failed = True
+        if failed:
+            print(f"\nAccuracy / macro-F1 dropped by more than {args.max_drop}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
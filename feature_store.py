@@ -0,0 +1,518 @@
+"""
+Tea Doctor - sharded on-disk feature store for retraining and re-evaluation.
+
+The 11-channel texture maps dominate training time when they are
+recomputed every epoch (ablation_results_v3_6.json: "Texture Only" 169.7
+min vs 43.6 for "Spatial Only"). This extracts the three model inputs of a
+labeled, class-per-folder dataset once, in parallel worker processes,
+into memory-mapped shards:
+
+  features/index.json                 samples, shards, extractor hash
+  features/shard-00000.rgb.npy        uint8   [n,224,224,3]
+  features/shard-00000.color.npy      float16 [n,224,224,8]
+  features/shard-00000.texture.npy    float16 [n,224,224,11]
+
+  - compact: float16 halves the size of the feature maps (all channels
+    lie in [-1, 1]; the rounding error is below 5e-4)
+  - invalidated by code: the index records a hash of the tea_core code
+    that produces the features (image loading, context, preprocessing,
+    workspace, LBP, extractors, prepare_inputs), the profile settings and
+    the OpenCV version. Changing any of them makes the store stale: the
+    loader refuses it and the next build starts over. Otherwise a build
+    only extracts new or modified images.
+  - failures recorded: images that fail to extract are listed in the index
+    by (path, size, mtime_ns) and not retried until the file changes. Their
+    rows are dropped from the shard (a chunk where every image failed
+    creates none).
+  - shuffled at build time: the images extracted by one build are
+    written in random order, so a contiguous run of their rows is a class
+    mix. An incremental build only shuffles what it adds: adding one class
+    folder produces shards of that class alone.
+
+FeatureStore reads it back. batches() cuts the rows into short contiguous
+blocks and draws each batch from `mix` random blocks (usually of several
+shards), re-drawn every epoch, so batches stay mixed after incremental
+builds and rows do not keep the same batch mates. A read-ahead hint is
+given for the next batch. With mix=1 a batch is a single block, returned
+as a zero-copy slice of the memory maps. Nothing is decoded or recomputed.
+
+  store = FeatureStore("features/")
+  for epoch in range(epochs):
+      for inputs, labels, _ in store.batches(32, seed=epoch):
+          model.train_on_batch(inputs, labels)   # inputs: {"rgb", "color", "texture"}
+
+fit_refinement.py accepts a store in place of an image folder.
+
+Usage:
+  python feature_store.py dataset/ -o features/ [--profile full] [--workers 4]
+  python feature_store.py --info features/
+"""
+
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import re
+import sys
+import time
+import multiprocessing as mp
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+import tea_core as core
+from eval_profiles import iter_labeled_images
+
+STORE_FORMAT = 1
+INDEX_NAME = "index.json"
+DTYPES = ("float16", "float32")
+
+# tea_core sections whose code determines the stored features
+FEATURE_SECTIONS = ("IMAGE LOADING", "IMAGE CONTEXT", "IMAGE PREPROCESSING", "FEATURE WORKSPACE",
+                    "UNIFORM LBP", "FEATURE EXTRACTORS")
+
+_BANNER = re.compile(r"^# =+\n# (.+)\n# =+\n", re.M)
+
+
+# ============================================================================
+# EXTRACTOR HASH
+# ============================================================================
+
+def _core_sections():
+    """{section title: source} of tea_core, split at its '# ====' banners."""
+    parts = _BANNER.split(inspect.getsource(core))
+    return {re.split(r"\s{2,}|\s\(", title)[0]: body for title, body in zip(parts[1::2], parts[2::2])}
+
+
+def extractor_hash(profile=core.DEFAULT_PROFILE, dtype="float16"):
+    """Digest of everything that determines the stored arrays."""
+    sections = _core_sections()
+    missing = [s for s in FEATURE_SECTIONS if s not in sections]
+    if missing:
+        raise RuntimeError(f"tea_core sections not found for the feature hash: {missing}")
+    h = hashlib.sha256()
+    for name in FEATURE_SECTIONS:
+        h.update(sections[name].encode())
+    h.update(inspect.getsource(core.prepare_inputs).encode())
+    h.update(json.dumps({
+        "format": STORE_FORMAT,
+        "feature_version": core.FEATURE_VERSION,
+        "img_size": core.IMG_SIZE,
+        "profile": core.get_profile(profile),
+        "dtype": dtype,
+        "opencv": cv2.__version__,
+    }, sort_keys=True).encode())
+    return h.hexdigest()
+
+
+# ============================================================================
+# INDEX
+# ============================================================================
+
+def _shapes(dtype):
+    s = core.IMG_SIZE
+    return {
+        "rgb": ((s, s, 3), np.uint8),
+        "color": ((s, s, core.COLOR_CHANNELS), np.dtype(dtype)),
+        "texture": ((s, s, core.TEXTURE_CHANNELS), np.dtype(dtype)),
+    }
+
+
+def _shard_file(root, shard, branch):
+    return Path(root) / f"{shard}.{branch}.npy"
+
+
+def read_index(root):
+    path = Path(root) / INDEX_NAME
+    return json.loads(path.read_text()) if path.exists() else None
+
+
+def write_index(root, index):
+    path = Path(root) / INDEX_NAME
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(index, indent=1))
+    os.replace(tmp, path)
+
+
+def is_store(path):
+    return (Path(path) / INDEX_NAME).is_file()
+
+
+def _file_sig(path):
+    st = Path(path).stat()
+    return st.st_size, st.st_mtime_ns
+
+
+def _remove_shards(root, names):
+    for name in names:
+        for branch in core.MODEL_INPUTS:
+            _shard_file(root, name, branch).unlink(missing_ok=True)
+
+
+# ============================================================================
+# BUILD  (parallel extraction into memory-mapped shards)
+# ============================================================================
+
+_worker = {}
+
+
+def _init_worker(root, profile):
+    cv2.setNumThreads(1)  # one process per core scales better than nested threads
+    _worker.update(root=root, profile=profile)
+
+
+def _extract_task(task):
+    """Extract one image into its (shard, row); returns (row, error or None)."""
+    shard, row, path = task
+    try:
+        profile = _worker["profile"]
+        pre = core.preprocess_image(core.load_image_rgb(path), profile)
+        inputs = core.prepare_inputs(pre, profile)
+        # Mapped only for the write, so the builder can rewrite or delete
+        # the shard once its chunk is done (Windows refuses mapped files)
+        for branch, value in zip(core.MODEL_INPUTS, inputs):
+            np.load(_shard_file(_worker["root"], shard, branch), mmap_mode="r+")[row] = value
+    except Exception as e:
+        return row, f"{type(e).__name__}: {e}"
+    return row, None
+
+
+def _compact_shard(root, name, samples, dtype):
+    """Rewrite shard `name` with only the rows of `samples`; returns them renumbered."""
+    samples = sorted(samples, key=lambda s: s["row"])
+    rows = [s["row"] for s in samples]
+    for branch, (shape, dt) in _shapes(dtype).items():
+        path = _shard_file(root, name, branch)
+        tmp = path.with_suffix(".tmp")
+        src = np.load(path, mmap_mode="r")
+        dst = np.lib.format.open_memmap(tmp, mode="w+", dtype=dt, shape=(len(rows),) + shape)
+        dst[:] = src[rows]
+        dst.flush()
+        del src, dst
+        os.replace(tmp, path)
+    return [{**s, "row": i} for i, s in enumerate(samples)]
+
+
+def build_store(dataset, root, profile=core.DEFAULT_PROFILE, workers=None, shard_size=256,
+                dtype="float16", limit=None, seed=0, rebuild=False, progress=None):
+    """
+    Extract every image of `dataset` not already in the store at `root`.
+    A store built by other extractor code, profile or dtype is replaced.
+    Images that failed before and are unchanged are skipped.
+    Returns a stats dict (images, extracted, reused, errors, known_failures,
+    seconds, ...).
+    """
+    if dtype not in DTYPES:
+        raise ValueError(f"dtype must be one of {DTYPES}, got {dtype!r}")
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    key = extractor_hash(profile, dtype)
+    index = read_index(root)
+    if index is not None and (rebuild or index["extractor_hash"] != key):
+        _remove_shards(root, [s["name"] for s in index["shards"]])
+        index = None
+    if index is None:
+        index = {"format": STORE_FORMAT, "extractor_hash": key, "profile": profile, "dtype": dtype,
+                 "feature_version": core.FEATURE_VERSION, "img_size": core.IMG_SIZE,
+                 "class_names": core.CLASS_NAMES, "shards": [], "samples": [], "failed": []}
+
+    known = {s["path"]: s for s in index["samples"]}
+    failed = {(f["path"], f["size"], f["mtime_ns"]): f for f in index.get("failed", [])}
+    keep, todo, still_failing = [], [], []
+    for path, label in iter_labeled_images(dataset, limit):
+        size, mtime_ns = _file_sig(path)
+        entry = known.get(str(path))
+        if entry and (entry["label"], entry["size"], entry["mtime_ns"]) == (label, size, mtime_ns):
+            keep.append(entry)
+        elif (str(path), size, mtime_ns) in failed:
+            still_failing.append(failed[(str(path), size, mtime_ns)])  # retried once the file changes
+        else:
+            todo.append({"path": str(path), "label": label, "size": size, "mtime_ns": mtime_ns})
+
+    # Shards no current sample points into are deleted; rows of removed or
+    # changed images inside shards still in use stay as dead space
+    used = {s["shard"] for s in keep}
+    _remove_shards(root, [s["name"] for s in index["shards"] if s["name"] not in used])
+    index["shards"] = [s for s in index["shards"] if s["name"] in used]
+    index["samples"] = list(keep)
+    index["failed"] = list(still_failing)
+    write_index(root, index)
+
+    np.random.default_rng(seed).shuffle(todo)
+    next_id = max((int(s["name"].split("-")[1]) for s in index["shards"]), default=-1) + 1
+    workers = workers or os.cpu_count() or 1
+    errors = []
+    done = 0
+    t0 = time.perf_counter()
+    pool = mp.get_context("spawn").Pool(workers, initializer=_init_worker, initargs=(str(root), profile))
+    try:
+        for start in range(0, len(todo), shard_size):
+            chunk = todo[start:start + shard_size]
+            name = f"shard-{next_id:05d}"
+            next_id += 1
+            for branch, (shape, dt) in _shapes(dtype).items():
+                np.lib.format.open_memmap(_shard_file(root, name, branch), mode="w+", dtype=dt,
+                                          shape=(len(chunk),) + shape).flush()
+            tasks = [(name, row, s["path"]) for row, s in enumerate(chunk)]
+            ok, bad = [], []
+            for row, err in pool.imap_unordered(_extract_task, tasks):
+                if err is None:
+                    ok.append({**chunk[row], "shard": name, "row": row})
+                else:
+                    bad.append({**chunk[row], "error": err})
+                done += 1
+                if progress:
+                    progress(done, len(todo))
+            # The shard is complete (workers write through the shared mapping);
+            # failed rows are dropped from it, or it is not kept at all
+            if not ok:
+                _remove_shards(root, [name])
+            elif bad:
+                ok = _compact_shard(root, name, ok, dtype)
+            if ok:
+                index["shards"].append({"name": name, "rows": len(ok)})
+                index["samples"].extend(sorted(ok, key=lambda s: s["row"]))
+            index["failed"].extend(bad)
+            errors.extend({"path": f["path"], "error": f["error"]} for f in bad)
+            # Recording it now lets an interrupted build resume from here
+            write_index(root, index)
+    finally:
+        pool.close()
+        pool.join()
+
+    elapsed = time.perf_counter() - t0
+    extracted = len(todo) - len(errors)
+    return {
+        "images": len(index["samples"]),
+        "extracted": extracted,
+        "reused": len(keep),
+        "errors": errors,
+        "known_failures": len(still_failing),
+        "shards": len(index["shards"]),
+        "seconds": round(elapsed, 3),
+        "images_per_sec": round(extracted / elapsed, 2) if extracted and elapsed > 0 else 0.0,
+        "workers": workers,
+        "profile": profile,
+        "dtype": dtype,
+    }
+
+
+# ============================================================================
+# LOADER  (zero-copy, shuffled, streaming)
+# ============================================================================
+
+class FeatureStore:
+    """
+    Read side of a store directory. Shards are memory-mapped read-only on
+    first use; sample() and single-block batches() return views into them,
+    so features are paged in from disk (or the page cache) instead of being
+    recomputed.
+    """
+
+    def __init__(self, root, check=True):
+        self.root = Path(root)
+        self.index = read_index(self.root)
+        if self.index is None:
+            raise FileNotFoundError(f"no feature store at {self.root} (missing {INDEX_NAME})")
+        if self.index.get("format") != STORE_FORMAT:
+            raise RuntimeError(f"feature store {self.root} has format {self.index.get('format')}, "
+                               f"expected {STORE_FORMAT}; rebuild it with feature_store.py")
+        if check and self.index["extractor_hash"] != extractor_hash(self.profile, self.dtype):
+            raise RuntimeError(f"feature store {self.root} was built by other feature code or settings; "
+                               f"rebuild it with feature_store.py")
+        self.samples = self.index["samples"]
+        self.labels = np.array([s["label"] for s in self.samples], dtype=np.int64)
+        self._shards = {}
+        self._fds = {}
+
+    @property
+    def profile(self):
+        return self.index["profile"]
+
+    @property
+    def dtype(self):
+        return self.index["dtype"]
+
+    def __len__(self):
+        return len(self.samples)
+
+    def paths(self):
+        return [Path(s["path"]) for s in self.samples]
+
+    def shard(self, name):
+        """{branch: read-only memmap [n,...]} of one shard."""
+        arrays = self._shards.get(name)
+        if arrays is None:
+            arrays = self._shards[name] = {b: np.load(_shard_file(self.root, name, b), mmap_mode="r")
+                                           for b in core.MODEL_INPUTS}
+        return arrays
+
+    def sample(self, i):
+        """({branch: [224,224,C] view}, label) of sample i."""
+        s = self.samples[i]
+        arrays = self.shard(s["shard"])
+        return {b: arrays[b][s["row"]] for b in core.MODEL_INPUTS}, int(self.labels[i])
+
+    def _blocks(self, positions, batch_size, rng):
+        """Split positions into (shard, row0, row1, positions) blocks of <= batch_size consecutive rows."""
+        positions = np.asarray(positions, dtype=np.int64)
+        shards = np.array([self.samples[p]["shard"] for p in positions])
+        rows = np.array([self.samples[p]["row"] for p in positions], dtype=np.int64)
+        order = np.lexsort((rows, shards))
+        positions, shards, rows = positions[order], shards[order], rows[order]
+        breaks = np.flatnonzero((shards[1:] != shards[:-1]) | (rows[1:] != rows[:-1] + 1)) + 1
+        blocks = []
+        for run in np.split(np.arange(len(positions)), breaks):
+            if not len(run):
+                continue
+            # A random phase per epoch changes which rows share a batch
+            first = int(rng.integers(1, batch_size + 1)) if rng is not None else batch_size
+            cuts = list(range(min(first, len(run)), len(run), batch_size))
+            for part in np.split(run, cuts):
+                blocks.append((shards[part[0]], int(rows[part[0]]), int(rows[part[-1]]) + 1, positions[part]))
+        return blocks
+
+    def _readahead(self, shard, r0, r1):
+        """Ask the OS to start reading rows [r0, r1) of a shard (Linux posix_fadvise)."""
+        if not hasattr(os, "posix_fadvise"):
+            return
+        for branch, arr in self.shard(shard).items():
+            key = (shard, branch)
+            if key not in self._fds:
+                self._fds[key] = os.open(arr.filename, os.O_RDONLY)
+            row_bytes = arr[0].nbytes
+            os.posix_fadvise(self._fds[key], arr.offset + r0 * row_bytes, (r1 - r0) * row_bytes,
+                             os.POSIX_FADV_WILLNEED)
+
+    def _slice(self, blocks, dtype):
+        """{branch: array} of the rows of `blocks`: a view for one block, else a copy."""
+        parts = [{b: self.shard(shard)[b][r0:r1] for b in core.MODEL_INPUTS}
+                 for shard, r0, r1, _ in blocks]
+        if len(parts) == 1:
+            inputs = parts[0]
+        else:
+            inputs = {b: np.concatenate([p[b] for p in parts]) for b in core.MODEL_INPUTS}
+        if dtype is not None:
+            inputs = {b: (v.astype(dtype) if b != "rgb" else v) for b, v in inputs.items()}
+        return inputs
+
+    def batches(self, batch_size=32, shuffle=True, seed=0, indices=None, dtype=None, mix=4):
+        """
+        Yield ({branch: [n,...] array}, labels [n], positions [n]) batches.
+
+        With shuffle, rows are cut into contiguous blocks of about
+        batch_size / mix rows (block boundaries re-drawn from `seed`; pass
+        the epoch number) and each batch gathers up to `mix` blocks in
+        random order, copied into one array. mix=1 yields single-block
+        batches as views into the memory maps (zero-copy, but batch mates
+        only change at block boundaries, and a shard written by an
+        incremental build may hold a single class). Without shuffle, rows
+        come in store order as views. `dtype` asks for converted feature
+        maps. `indices` restricts the batches to those sample positions
+        (e.g. a split).
+        """
+        rng = np.random.default_rng(seed) if shuffle else None
+        positions = np.arange(len(self)) if indices is None else indices
+        mix = max(1, mix) if shuffle else 1
+        blocks = self._blocks(positions, max(1, -(-batch_size // mix)), rng)
+        if rng is not None:
+            blocks = [blocks[i] for i in rng.permutation(len(blocks))]
+        groups, current, rows = [], [], 0
+        for block in blocks:
+            n = len(block[3])
+            if current and (rows + n > batch_size or len(current) == mix):
+                groups.append(current)
+                current, rows = [], 0
+            current.append(block)
+            rows += n
+        if current:
+            groups.append(current)
+        for k, group in enumerate(groups):
+            if k + 1 < len(groups):
+                for block in groups[k + 1]:
+                    self._readahead(*block[:3])
+            pos = np.concatenate([block[3] for block in group])
+            yield self._slice(group, dtype), self.labels[pos], pos
+
+    def close(self):
+        for fd in self._fds.values():
+            os.close(fd)
+        self._fds.clear()
+        self._shards.clear()
+
+    def summary(self):
+        counts = np.bincount(self.labels, minlength=len(core.CLASS_NAMES)) if len(self) else []
+        size = sum(_shard_file(self.root, s["name"], b).stat().st_size
+                   for s in self.index["shards"] for b in core.MODEL_INPUTS)
+        return {
+            "root": str(self.root),
+            "images": len(self),
+            "failed": len(self.index.get("failed", [])),
+            "shards": len(self.index["shards"]),
+            "profile": self.profile,
+            "dtype": self.dtype,
+            "feature_version": self.index["feature_version"],
+            "current": self.index["extractor_hash"] == extractor_hash(self.profile, self.dtype),
+            "size_mb": round(size / 2 ** 20, 1),
+            "per_class": {c: int(n) for c, n in zip(core.CLASS_NAMES, counts)},
+        }
+
+
+def read_throughput(store, batch_size=32, seconds=2.0):
+    """Images / s of shuffled epochs that touch every stored value."""
+    if not len(store):
+        return 0.0
+    n, epoch, t0 = 0, 0, time.perf_counter()
+    while time.perf_counter() - t0 < seconds:
+        for inputs, labels, _ in store.batches(batch_size, seed=epoch):
+            for v in inputs.values():
+                v.sum(dtype=np.float32)
+            n += len(labels)
+        epoch += 1
+    return n / (time.perf_counter() - t0)
+
+
+def _print_progress(done, total):
+    print(f"\r  extracted {done}/{total}", end="" if done < total else "\n", file=sys.stderr, flush=True)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Extract model inputs once into a sharded feature store")
+    ap.add_argument("dataset", nargs="?", help="class-per-folder labeled image tree")
+    ap.add_argument("-o", "--output", default="features", help="store directory")
+    ap.add_argument("--profile", default=core.DEFAULT_PROFILE, choices=list(core.PROFILES))
+    ap.add_argument("--workers", type=int, default=None, help="extraction processes (default: all cores)")
+    ap.add_argument("--shard-size", type=int, default=256, help="images per shard")
+    ap.add_argument("--dtype", default="float16", choices=DTYPES, help="storage type of colour / texture maps")
+    ap.add_argument("--limit", type=int, default=None, help="max images per class")
+    ap.add_argument("--seed", type=int, default=0, help="write-order shuffle seed")
+    ap.add_argument("--rebuild", action="store_true", help="discard the existing store first")
+    ap.add_argument("--info", default=None, metavar="STORE", help="describe a store and exit")
+    args = ap.parse_args(argv)
+
+    if args.info:
+        store = FeatureStore(args.info, check=False)
+        print(json.dumps(store.summary(), indent=2))
+        return 0
+    if not args.dataset:
+        ap.error("dataset is required unless --info is given")
+
+    stats = build_store(args.dataset, args.output, args.profile, args.workers, args.shard_size,
+                        args.dtype, args.limit, args.seed, args.rebuild, progress=_print_progress)
+    for e in stats["errors"]:
+        print(f"  skipped {e['path']}: {e['error']}", file=sys.stderr)
+    if stats["known_failures"]:
+        print(f"  skipped {stats['known_failures']} unchanged images that failed before "
+              f"(listed under \"failed\" in {INDEX_NAME})", file=sys.stderr)
+    stats["errors"] = len(stats["errors"])
+    store = FeatureStore(args.output)
+    stats["loader_images_per_sec"] = round(read_throughput(store), 1)
+    store.close()
+    print(json.dumps(stats))
+    return 0 if stats["images"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,335 @@
+"""
+Tea Doctor - offline fitter for the post-hoc refinement config.
+
+Searches the temperature and the seven per-class thresholds used by
+apply_refinement over a labeled, class-per-folder dataset and writes a
+config in the refined_tflite_config.json format. The dataset can also be a
+feature store built by feature_store.py; its stored model inputs are used
+as they are, so no image is decoded or re-extracted.
+
+  1. Raw model probabilities for every image are computed once and cached
+     in an .npz (keyed by model digest, feature version, profile and file
+     list), so re-fitting with other grids or metrics takes seconds.
+     Images that cannot be decoded are skipped (and listed); the cache
+     records which samples survived.
+  2. For every temperature in the grid at once, thresholds are fitted by
+     coordinate ascent: each pass tries every candidate threshold for one
+     class against all images in one vectorised step (confusion matrices via
+     a single bincount). The temperature with the best score wins, ties
+     broken by the negative log-likelihood of the calibrated probabilities.
+
+Usage:
+  python fit_refinement.py dataset/ -o refined_tflite_config.json
+  python fit_refinement.py dataset/ --metric accuracy --val-fraction 0.2
+  python fit_refinement.py features/               # a feature_store.py store
+"""
+
+import argparse
+import hashlib
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+import feature_store
+import tea_core as core
+from eval_profiles import iter_labeled_images
+
+N_CLASSES = len(core.CLASS_NAMES)
+DEFAULT_TEMPERATURES = np.round(np.arange(0.5, 3.001, 0.1), 2)
+DEFAULT_THRESHOLDS = np.round(np.arange(0.05, 0.951, 0.01), 2)
+# Upper bound on elements materialised per vectorised step
+MAX_GRID_ELEMENTS = 2 ** 24
+
+
+# ============================================================================
+# RAW PROBABILITIES (cached)
+# ============================================================================
+
+def _dataset_key(samples, profile, store=None):
+    h = hashlib.sha256()
+    if store is not None:
+        h.update(store.index["extractor_hash"].encode())
+        for s in store.samples:
+            h.update(f"{s['path']}|{s['label']}|{s['size']}|{s['mtime_ns']}\n".encode())
+    else:
+        for path, label in samples:
+            st = path.stat()
+            h.update(f"{path}|{label}|{st.st_size}|{st.st_mtime_ns}\n".encode())
+    h.update(f"{core.model_fingerprint()}|{core.FEATURE_VERSION}|{profile}".encode())
+    return h.hexdigest()
+
+
+def compute_raw_probs(samples, profile, batch_size=16, progress=None, store=None):
+    """
+    Unrefined model probabilities for (path, label) samples, or for a
+    FeatureStore. Returns (probs [K,7], kept [K] indices into samples):
+    images that fail to decode or preprocess are left out.
+    """
+    out = np.empty((len(samples), N_CLASSES), dtype=np.float32)
+    if store is not None:
+        done = 0
+        for inputs, _, pos in store.batches(batch_size, shuffle=False):
+            out[pos] = core.predict_inputs_batch(inputs["rgb"], inputs["color"], inputs["texture"])
+            done += len(pos)
+            if progress:
+                progress(done, len(samples))
+        return out, np.arange(len(samples))
+    kept = []
+    for start in range(0, len(samples), batch_size):
+        images = []
+        for i in range(start, min(start + batch_size, len(samples))):
+            path = samples[i][0]
+            try:
+                images.append(core.preprocess_image(core.load_image_rgb(path), profile))
+            except Exception:
+                continue  # unreadable: reported by the caller
+            kept.append(i)
+        if images:
+            out[len(kept) - len(images):len(kept)] = core.predict_images_batch(images, profile)
+        if progress:
+            progress(min(start + batch_size, len(samples)), len(samples))
+    return out[:len(kept)], np.array(kept, dtype=np.int64)
+
+
+def load_or_compute_probs(samples, profile, cache_path, batch_size=16, progress=None, store=None):
+    """
+    (probs, kept, hit): raw probabilities of the surviving samples, from
+    `cache_path` when it matches, else computed and cached. The key covers
+    every listed file, skipped ones included, so a repaired or replaced
+    image invalidates the cached survivor list.
+    """
+    key = _dataset_key(samples, profile, store)
+    cache_path = Path(cache_path)
+    if cache_path.exists():
+        with np.load(cache_path, allow_pickle=False) as npz:
+            if str(npz["key"]) == key and "kept" in npz.files:
+                return npz["probs"], npz["kept"], True
+    probs, kept = compute_raw_probs(samples, profile, batch_size, progress, store)
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    np.savez(cache_path, probs=probs, kept=kept, labels=np.array([samples[i][1] for i in kept]),
+             key=np.array(key))
+    return probs, kept, False
+
+
+# ============================================================================
+# VECTORISED GRID SEARCH
+# ============================================================================
+
+def confusion_matrices(preds, labels):
+    """[..., N] predicted indices -> [..., 7, 7] confusion matrices (true x pred)."""
+    lead = preds.shape[:-1]
+    n_mats = int(np.prod(lead)) if lead else 1
+    offsets = (np.arange(n_mats) * N_CLASSES * N_CLASSES).reshape(lead + (1,))
+    idx = offsets + labels * N_CLASSES + preds
+    counts = np.bincount(idx.ravel(), minlength=n_mats * N_CLASSES * N_CLASSES)
+    return counts.reshape(lead + (N_CLASSES, N_CLASSES))
+
+
+def score(cm, metric="macro_f1"):
+    """Accuracy or macro-F1 (over classes present) from [..., 7, 7] confusion matrices."""
+    tp = np.diagonal(cm, axis1=-2, axis2=-1).astype(np.float64)
+    if metric == "accuracy":
+        return tp.sum(-1) / np.maximum(cm.sum((-2, -1)), 1)
+    support = cm.sum(-1)
+    denom = support + cm.sum(-2)
+    f1 = np.divide(2 * tp, denom, out=np.zeros_like(tp), where=denom > 0)
+    present = support > 0
+    return (f1 * present).sum(-1) / np.maximum(present.sum(-1), 1)
+
+
+def refined_predictions(calibrated, thresholds):
+    """argmax of apply_refinement (re-normalisation does not change it)."""
+    return np.argmax(calibrated / (thresholds[..., None, :] + 1e-8), axis=-1)
+
+
+def nll(calibrated, labels):
+    """Mean negative log-likelihood of the true class, per leading index."""
+    picked = calibrated[..., np.arange(len(labels)), labels]
+    return -np.log(np.clip(picked, 1e-8, 1.0)).mean(-1)
+
+
+def fit_thresholds(calibrated, labels, candidates, init, metric="macro_f1", max_rounds=5):
+    """
+    Coordinate ascent on per-class thresholds, independently for each
+    leading index of `calibrated` ([T,N,7]). Returns (thresholds [T,7], score [T]).
+    """
+    n_t, n = calibrated.shape[:2]
+    thresholds = np.broadcast_to(np.asarray(init, np.float64), (n_t, N_CLASSES)).copy()
+    best = score(confusion_matrices(refined_predictions(calibrated, thresholds), labels), metric)
+    arange_t = np.arange(n_t)
+    step = max(1, MAX_GRID_ELEMENTS // max(n_t * n, 1))
+
+    for _ in range(max_rounds):
+        improved = False
+        for k in range(N_CLASSES):
+            # Best competing class with class k excluded, per (T, image)
+            others = calibrated / (thresholds[:, None, :] + 1e-8)
+            others[..., k] = -np.inf
+            other_idx = np.argmax(others, axis=-1)
+            other_val = np.take_along_axis(others, other_idx[..., None], axis=-1)[..., 0]
+            col = calibrated[..., k]
+
+            cand_scores = np.empty((n_t, len(candidates)))
+            for g0 in range(0, len(candidates), step):
+                g = candidates[g0:g0 + step]
+                # [T, G, N]: class k wins where its gated score beats the rest
+                wins = col[:, None, :] / (g[None, :, None] + 1e-8) > other_val[:, None, :]
+                preds = np.where(wins, k, other_idx[:, None, :])
+                cand_scores[:, g0:g0 + len(g)] = score(confusion_matrices(preds, labels), metric)
+
+            pick = np.argmax(cand_scores, axis=1)
+            gain = cand_scores[arange_t, pick] > best + 1e-12
+            if gain.any():
+                improved = True
+                thresholds[gain, k] = candidates[pick[gain]]
+                best = np.where(gain, cand_scores[arange_t, pick], best)
+        if not improved:
+            break
+    return thresholds, best
+
+
+def fit_refinement(raw_probs, labels, temperatures=DEFAULT_TEMPERATURES, candidates=DEFAULT_THRESHOLDS,
+                   init=None, metric="macro_f1", max_rounds=5):
+    """Joint search; returns dict(temperature, thresholds, score, nll, grid)."""
+    raw_probs = np.asarray(raw_probs, np.float64)
+    labels = np.asarray(labels, np.int64)
+    temperatures = np.asarray(temperatures, np.float64)
+    candidates = np.asarray(candidates, np.float64)
+    init = np.full(N_CLASSES, 0.5) if init is None else np.asarray(init, np.float64)
+
+    calibrated = core.calibrate_probs(raw_probs, temperatures[:, None, None])  # [T,N,7]
+    thresholds, scores = fit_thresholds(calibrated, labels, candidates, init, metric, max_rounds)
+    nlls = nll(calibrated, labels)
+    # Best score; among equal scores the best-calibrated temperature
+    best = np.lexsort((nlls, -np.round(scores, 12)))[0]
+    return {
+        "temperature": float(temperatures[best]),
+        "thresholds": thresholds[best],
+        "score": float(scores[best]),
+        "nll": float(nlls[best]),
+        "grid": {"temperatures": temperatures.tolist(), "score": scores.tolist(), "nll": nlls.tolist()},
+    }
+
+
+def evaluate(raw_probs, labels, temperature, thresholds):
+    """Accuracy / macro-F1 of refined predictions (temperature None = raw argmax)."""
+    if temperature is None:
+        preds = np.argmax(raw_probs, axis=-1)
+    else:
+        preds = np.argmax(core.apply_refinement(raw_probs, temperature, thresholds), axis=-1)
+    cm = confusion_matrices(preds, labels)
+    return {"accuracy": float(score(cm, "accuracy")), "macro_f1": float(score(cm, "macro_f1"))}
+
+
+def stratified_split(labels, val_fraction, seed=0):
+    """(fit_idx, val_idx) with `val_fraction` of every class held out."""
+    rng = np.random.default_rng(seed)
+    fit_idx, val_idx = [], []
+    for k in np.unique(labels):
+        idx = rng.permutation(np.flatnonzero(labels == k))
+        n_val = int(round(len(idx) * val_fraction))
+        val_idx.extend(idx[:n_val])
+        fit_idx.extend(idx[n_val:])
+    return np.sort(fit_idx), np.sort(val_idx)
+
+
+def _print_progress(done, total):
+    print(f"\r  model probabilities {done}/{total}", end="" if done < total else "\n", file=sys.stderr)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Fit temperature + per-class thresholds for refinement")
+    ap.add_argument("dataset", help="class-per-folder labeled image tree, or a feature_store.py store")
+    ap.add_argument("-o", "--output", default="refined_tflite_config.fitted.json")
+    ap.add_argument("--profile", default=core.DEFAULT_PROFILE, choices=list(core.PROFILES))
+    ap.add_argument("--limit", type=int, default=None, help="max images per class (image folders only)")
+    ap.add_argument("--metric", default="macro_f1", choices=["macro_f1", "accuracy"])
+    ap.add_argument("--temperatures", type=float, nargs="+", default=None,
+                    help="temperature grid (default 0.5..3.0 step 0.1)")
+    ap.add_argument("--threshold-step", type=float, default=0.01, help="threshold grid step in [0.05, 0.95]")
+    ap.add_argument("--rounds", type=int, default=5, help="max coordinate-ascent passes")
+    ap.add_argument("--val-fraction", type=float, default=0.0, help="stratified hold-out for reporting")
+    ap.add_argument("--probs-cache", default=None,
+                    help="npz of cached raw probabilities (default .tea_cache/fit_probs_<profile>.npz)")
+    ap.add_argument("--batch-size", type=int, default=16)
+    args = ap.parse_args(argv)
+
+    interpreter, model_type = core.load_tflite_model()
+    if interpreter is None:
+        print(f"Model unavailable ({model_type})", file=sys.stderr)
+        return 1
+    store, profile = None, args.profile
+    if feature_store.is_store(args.dataset):
+        store = feature_store.FeatureStore(args.dataset)
+        samples = list(zip(store.paths(), store.labels.tolist()))
+        profile = store.profile  # the features were extracted with it
+    else:
+        samples = list(iter_labeled_images(args.dataset, args.limit))
+    if not samples:
+        print(f"No labeled images found under {args.dataset}", file=sys.stderr)
+        return 1
+
+    cache_path = args.probs_cache or core.SCRIPT_DIR / ".tea_cache" / f"fit_probs_{profile}.npz"
+    probs, kept, hit = load_or_compute_probs(samples, profile, cache_path, args.batch_size,
+                                             _print_progress, store)
+    skipped = sorted(set(range(len(samples))) - set(kept.tolist()))
+    if skipped:
+        print(f"{len(skipped)} unreadable images skipped:", file=sys.stderr)
+        for i in skipped:
+            print(f"  {samples[i][0]}", file=sys.stderr)
+    samples = [samples[i] for i in kept]
+    if not samples:
+        print(f"No readable images under {args.dataset}", file=sys.stderr)
+        return 1
+    labels = np.array([label for _, label in samples])
+    print(f"{len(samples)} images, raw probabilities {'from cache' if hit else 'computed'} ({cache_path})")
+
+    fit_idx, val_idx = stratified_split(labels, args.val_fraction) if args.val_fraction > 0 else \
+        (np.arange(len(labels)), np.array([], dtype=np.int64))
+    temperatures = np.array(args.temperatures) if args.temperatures else DEFAULT_TEMPERATURES
+    candidates = np.round(np.arange(0.05, 0.95 + 1e-9, args.threshold_step), 4)
+    cur_t, cur_th = core.load_refinement_config()
+
+    t0 = time.perf_counter()
+    result = fit_refinement(probs[fit_idx], labels[fit_idx], temperatures, candidates,
+                            init=cur_th, metric=args.metric, max_rounds=args.rounds)
+    elapsed = time.perf_counter() - t0
+    print(f"Searched {len(temperatures)} temperatures x {len(candidates)} thresholds/class "
+          f"in {elapsed:.2f} s -> T={result['temperature']:.2f}, {args.metric}={result['score']:.4f}")
+
+    report = {}
+    for split, idx in (("fit", fit_idx), ("val", val_idx)):
+        if len(idx) == 0:
+            continue
+        p, y = probs[idx], labels[idx]
+        report[split] = {
+            "raw": evaluate(p, y, None, None),
+            "current": evaluate(p, y, cur_t, cur_th),
+            "fitted": evaluate(p, y, result["temperature"], result["thresholds"]),
+        }
+    print(f"{'split':<6}{'config':<9}{'acc':>8}{'mF1':>8}")
+    for split, rows in report.items():
+        for name, m in rows.items():
+            print(f"{split:<6}{name:<9}{m['accuracy']:>8.4f}{m['macro_f1']:>8.4f}")
+
+    core.save_refinement_config(
+        args.output, result["temperature"], result["thresholds"],
+        fit={
+            "metric": args.metric,
+            "score": round(result["score"], 6),
+            "nll": round(result["nll"], 6),
+            "images": int(len(fit_idx)),
+            "profile": profile,
+            "model_sha256": core.model_fingerprint(),
+            "feature_version": core.FEATURE_VERSION,
+            "report": report,
+        },
+    )
+    print(f"Wrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""
+Thread-safe pool of TFLite interpreters.
+
+A single Interpreter must not be driven (set_tensor / invoke / get_tensor)
+from several threads at once, and Streamlit serves every browser session
+on its own thread. The pool hands each caller an interpreter exclusively:
+
+    with pool.checkout() as interp:
+        ...  # set_tensor / invoke / get_tensor
+
+Interpreters are created by a factory (which sets num_threads and input
+shapes), allocated and warmed up with one dummy invoke before they are
+first handed out. Callers wait at most `timeout` seconds for a free one.
+"""
+
+import contextlib
+import queue
+import threading
+import time
+
+import numpy as np
+
+import tracing
+
+
+class PoolTimeout(TimeoutError):
+    """No interpreter became free within the checkout timeout."""
+
+
+def warm_up(interpreter):
+    """Run one invoke on zero inputs so the first real request is not slow."""
+    for det in interpreter.get_input_details():
+        interpreter.set_tensor(det["index"], np.zeros(det["shape"], dtype=det["dtype"]))
+    interpreter.invoke()
+
+
+class InterpreterPool:
+    """
+    Up to `size` interpreters with checkout/return semantics.
+    `prealloc` of them are built (and warmed) up front; the rest on demand.
+    """
+
+    def __init__(self, factory, size=4, timeout=30.0, prealloc=None, warm=True):
+        self._factory = factory
+        self.size = size
+        self.timeout = timeout
+        self._warm = warm
+        # LIFO: the most recently used interpreter has the warmest caches
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._stats = {"checkouts": 0, "timeouts": 0, "in_use": 0, "peak_in_use": 0,
+                       "wait_s_total": 0.0, "wait_s_max": 0.0}
+        for _ in range(size if prealloc is None else min(prealloc, size)):
+            with self._lock:
+                self._created += 1
+            self._idle.put(self._build())
+
+    def _build(self):
+        try:
+            interp = self._factory()
+            if self._warm:
+                warm_up(interp)
+            return interp
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def acquire(self, timeout=None):
+        """Take an interpreter; raises PoolTimeout after `timeout` seconds."""
+        timeout = self.timeout if timeout is None else timeout
+        t0 = time.perf_counter()
+        try:
+            interp = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                grow = self._created < self.size
+                if grow:
+                    self._created += 1
+            if grow:
+                interp = self._build()
+            else:
+                try:
+                    interp = self._idle.get(timeout=timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self._stats["timeouts"] += 1
+                    raise PoolTimeout(f"no free interpreter within {timeout:.1f} s") from None
+
+        waited = time.perf_counter() - t0
+        with self._lock:
+            s = self._stats
+            s["checkouts"] += 1
+            s["in_use"] += 1
+            s["peak_in_use"] = max(s["peak_in_use"], s["in_use"])
+            s["wait_s_total"] += waited
+            s["wait_s_max"] = max(s["wait_s_max"], waited)
+        return interp
+
+    def release(self, interp):
+        with self._lock:
+            self._stats["in_use"] -= 1
+        self._idle.put(interp)
+
+    @contextlib.contextmanager
+    def checkout(self, timeout=None):
+        with tracing.span("pool_wait"):
+            interp = self.acquire(timeout)
+        try:
+            yield interp
+        finally:
+            self.release(interp)
+
+    def metrics(self):
+        """Snapshot of pool occupancy and wait-time counters."""
+        with self._lock:
+            s = dict(self._stats)
+            created = self._created
+        return {
+            "size": self.size,
+            "created": created,
+            "in_use": s["in_use"],
+            "peak_in_use": s["peak_in_use"],
+            "checkouts": s["checkouts"],
+            "timeouts": s["timeouts"],
+            "wait_ms_mean": s["wait_s_total"] / s["checkouts"] * 1e3 if s["checkouts"] else 0.0,
+            "wait_ms_max": s["wait_s_max"] * 1e3,
+        }
@@ -0,0 +1,102 @@
+"""
+Load generator for serve.py - latency percentiles vs. throughput.
+
+For each concurrency level, keeps that many keep-alive connections busy
+POSTing images to /predict for a fixed duration, then reports achieved
+requests/sec and p50 / p90 / p99 latency. Standard library only.
+
+Usage:
+  python loadgen.py leaf1.jpg leaf2.jpg --concurrency 1 2 4 8 16 --duration 20
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+async def _post(reader, writer, host, path, body):
+    writer.write(
+        (f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/octet-stream\r\n"
+         f"Content-Length: {len(body)}\r\nConnection: keep-alive\r\n\r\n").encode("latin-1") + body
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        key, _, value = line.decode("latin-1").partition(":")
+        if key.strip().lower() == "content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def _client(host, port, path, bodies, stop_at, latencies, failures, offset):
+    reader, writer = await asyncio.open_connection(host, port)
+    i = offset
+    try:
+        while time.perf_counter() < stop_at:
+            t0 = time.perf_counter()
+            status = await _post(reader, writer, host, path, bodies[i % len(bodies)])
+            if status == 200:
+                latencies.append(time.perf_counter() - t0)
+            else:
+                failures.append(status)
+            i += 1
+    finally:
+        writer.close()
+
+
+async def run_level(host, port, path, bodies, concurrency, duration):
+    latencies, failures = [], []
+    t0 = time.perf_counter()
+    stop_at = t0 + duration
+    await asyncio.gather(*(
+        _client(host, port, path, bodies, stop_at, latencies, failures, k) for k in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - t0
+    lat = np.array(latencies) * 1e3 if latencies else np.zeros(1)
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "failures": len(failures),
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(float(np.percentile(lat, 50)), 1),
+        "p90_ms": round(float(np.percentile(lat, 90)), 1),
+        "p99_ms": round(float(np.percentile(lat, 99)), 1),
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Latency vs. throughput for serve.py")
+    ap.add_argument("images", nargs="+", help="image files to send (round-robin)")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--path", default="/predict", help="e.g. /predict?profile=fast")
+    ap.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+    ap.add_argument("--duration", type=float, default=10.0, help="seconds per level")
+    ap.add_argument("-o", "--output", default=None, help="write results as JSON")
+    args = ap.parse_args(argv)
+
+    bodies = [Path(p).read_bytes() for p in args.images]
+    results = []
+    print(f"{'conc':>5}{'req/s':>9}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'fail':>6}")
+    for level in args.concurrency:
+        r = asyncio.run(run_level(args.host, args.port, args.path, bodies, level, args.duration))
+        results.append(r)
+        print(f"{r['concurrency']:>5}{r['throughput_rps']:>9.2f}{r['p50_ms']:>9.1f}"
+              f"{r['p90_ms']:>9.1f}{r['p99_ms']:>9.1f}{r['failures']:>6}")
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
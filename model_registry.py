@@ -0,0 +1,273 @@
+"""
+Registry of on-disk model versions with hot reload and LRU unloading.
+
+Every `*.tflite` in the search directories is a version, named by its file
+stem (the first directory wins on a clash). Its refinement config is
+`<stem>.refined.json` next to it, else the directory's
+`refined_tflite_config.json`, else the registry's fallback configs.
+
+  - memory-mapped loading: interpreters are built from the file path, which
+    TFLite maps read-only instead of reading it into the heap, so every
+    worker process on a host shares one copy of the weights in the page
+    cache
+  - hot reload: the files are re-stat'ed at most every `check_interval_s`.
+    A changed model is loaded and warmed alongside the old one, then
+    swapped in. Requests that already hold an interpreter of the old
+    generation finish on it. A file that fails to load (e.g. still being
+    copied) leaves the old generation serving. Install new files with an
+    atomic rename (os.replace): rewriting a mapped file in place changes
+    the weights under the interpreters that still use it.
+  - bounded memory: at most `max_loaded` versions keep interpreter pools;
+    the least recently used idle one (no interpreter checked out, not
+    active) is unloaded first
+
+The registry does not know about TFLite itself: `pool_factory(version,
+batch_size)` builds the InterpreterPool for a version and
+`load_refinement(path)` reads a refinement config.
+"""
+
+import logging
+import threading
+import time
+from pathlib import Path
+
+from prediction_cache import file_digest
+
+log = logging.getLogger("tea_doctor.models")
+
+REFINE_SUFFIX = ".refined.json"
+REFINE_DEFAULT_NAME = "refined_tflite_config.json"
+
+
+def _signature(path):
+    """(inode, size, mtime) - changes on rewrite and on atomic replace; None if missing."""
+    if path is None:
+        return None
+    try:
+        st = Path(path).stat()
+    except OSError:
+        return None
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+class ModelVersion:
+    """One generation of a model file, its refinement config and its interpreter pools."""
+
+    def __init__(self, name, path, refine_path, pool_factory, load_refinement, on_load=None):
+        self.name = name
+        self.path = Path(path)
+        self.refine_path = refine_path
+        self.signature = _signature(self.path)
+        self.fingerprint = file_digest(self.path)
+        self.loaded_at = time.time()
+        self.last_used = time.monotonic()
+        self._pool_factory = pool_factory
+        self._load_refinement = load_refinement
+        self._on_load = on_load
+        self._pools = {}
+        # Re-entrant: the pool factory may look the registry up again
+        self._lock = threading.RLock()
+        self.reload_refinement()
+
+    def reload_refinement(self):
+        self.refine_signature = _signature(self.refine_path)
+        self.refinement = self._load_refinement(self.refine_path)
+
+    def pool(self, batch_size=1):
+        """InterpreterPool for `batch_size`, built on first use."""
+        self.last_used = time.monotonic()
+        with self._lock:
+            pool = self._pools.get(batch_size)
+            created = pool is None
+            if created:
+                pool = self._pools[batch_size] = self._pool_factory(self, batch_size)
+        if created and self._on_load is not None:
+            self._on_load(self)
+        return pool
+
+    @property
+    def loaded(self):
+        return bool(self._pools)
+
+    def in_use(self):
+        with self._lock:
+            pools = list(self._pools.values())
+        return sum(p.metrics()["in_use"] for p in pools)
+
+    def unload(self):
+        """Drop the pools; interpreters still checked out are freed when returned."""
+        with self._lock:
+            self._pools.clear()
+
+
+class ModelRegistry:
+    """
+    Model versions discovered in `search_dirs`; `get()` returns the active
+    one (or a named one), reloading and evicting as needed.
+    """
+
+    def __init__(self, search_dirs, pool_factory, load_refinement, default=None,
+                 fallback_refine=(), max_loaded=2, check_interval_s=2.0):
+        self.search_dirs = [Path(d) for d in search_dirs]
+        self.fallback_refine = [Path(p) for p in fallback_refine]
+        self.max_loaded = max_loaded
+        self.check_interval_s = check_interval_s
+        self._pool_factory = pool_factory
+        self._load_refinement = load_refinement
+        self._lock = threading.Lock()
+        self._reload_lock = threading.RLock()
+        self._files = {}      # name -> (model path, refinement path or None)
+        self._versions = {}   # name -> current ModelVersion
+        self._failed = {}     # name -> signature that failed to load
+        self._checked = 0.0
+        self.stats = {"loads": 0, "reloads": 0, "failed_reloads": 0, "evictions": 0}
+        self.scan()
+        self.active = default if default is not None else next(iter(self._files), None)
+
+    # -- discovery -----------------------------------------------------------
+
+    def _refine_path(self, model_path):
+        for p in [model_path.with_name(model_path.stem + REFINE_SUFFIX),
+                  model_path.with_name(REFINE_DEFAULT_NAME), *self.fallback_refine]:
+            if p.exists():
+                return p
+        return None
+
+    def scan(self):
+        """Re-read the search directories; returns the version names."""
+        files = {}
+        for d in self.search_dirs:
+            if not d.is_dir():
+                continue
+            for p in sorted(d.glob("*.tflite")):
+                if p.stem not in files:
+                    files[p.stem] = (p, self._refine_path(p))
+        with self._lock:
+            self._files = files
+        return list(files)
+
+    def versions(self):
+        return list(self._files)
+
+    # -- access --------------------------------------------------------------
+
+    def get(self, name=None):
+        """ModelVersion `name` (default: the active one), or None if there is no such file."""
+        if time.monotonic() - self._checked > self.check_interval_s:
+            self.refresh()
+        name = name or self.active
+        with self._lock:
+            version = self._versions.get(name)
+            entry = self._files.get(name)
+        if version is None:
+            if entry is None:
+                return None
+            version = self._load(name, *entry)
+        version.last_used = time.monotonic()
+        return version
+
+    def activate(self, name):
+        """Make `name` the version get() returns by default."""
+        if name not in self._files:
+            raise KeyError(f"unknown model version {name!r}; have {self.versions()}")
+        self.active = name
+        return self.get(name)
+
+    def _new_version(self, name, path, refine_path):
+        return ModelVersion(name, path, refine_path, self._pool_factory, self._load_refinement,
+                            on_load=lambda v: self._evict(keep=v))
+
+    def _load(self, name, path, refine_path):
+        with self._reload_lock:
+            with self._lock:
+                version = self._versions.get(name)
+            if version is None:
+                version = self._new_version(name, path, refine_path)
+                with self._lock:
+                    self._versions[name] = version
+                    self.stats["loads"] += 1
+        return version
+
+    # -- hot reload ----------------------------------------------------------
+
+    def refresh(self):
+        """Pick up new, changed and removed files now."""
+        self._checked = time.monotonic()
+        self.scan()
+        with self._lock:
+            current = list(self._versions.items())
+            files = dict(self._files)
+        for name, version in current:
+            entry = files.get(name)
+            if entry is None:
+                # File gone: keep serving the loaded generation until it is evicted
+                continue
+            path, refine_path = entry
+            sig = _signature(path)
+            if sig != version.signature or path != version.path:
+                self._swap(name, version, path, refine_path, sig)
+            elif refine_path != version.refine_path or _signature(refine_path) != version.refine_signature:
+                version.refine_path = refine_path
+                version.reload_refinement()
+                log.info("model %s: refinement config reloaded from %s", name, refine_path)
+
+    def _swap(self, name, old, path, refine_path, sig):
+        if sig is None or self._failed.get(name) == sig:
+            return
+        if not self._reload_lock.acquire(blocking=False):
+            return  # another thread is already loading a new generation
+        try:
+            new = self._new_version(name, path, refine_path)
+            if old.loaded:
+                new.pool(1)  # build and warm before taking traffic
+        except Exception as e:
+            self._failed[name] = sig
+            self.stats["failed_reloads"] += 1
+            log.error("model %s: reload from %s failed, keeping the loaded version: %s", name, path, e)
+            return
+        finally:
+            self._reload_lock.release()
+        with self._lock:
+            self._versions[name] = new
+            self.stats["reloads"] += 1
+        self._failed.pop(name, None)
+        old.unload()
+        log.info("model %s: reloaded from %s (%s)", name, path, new.fingerprint[:12])
+
+    # -- memory bound ----------------------------------------------------------
+
+    def _evict(self, keep=None):
+        with self._lock:
+            loaded = [v for v in self._versions.values() if v.loaded]
+        if len(loaded) <= self.max_loaded:
+            return
+        for version in sorted(loaded, key=lambda v: v.last_used):
+            if len(loaded) <= self.max_loaded:
+                break
+            if version is keep or version.name == self.active or version.in_use():
+                continue
+            version.unload()
+            loaded.remove(version)
+            with self._lock:
+                self.stats["evictions"] += 1
+            log.info("model %s: unloaded (least recently used)", version.name)
+
+    def summary(self):
+        """Per-version state and reload / eviction counters."""
+        with self._lock:
+            files = dict(self._files)
+            versions = dict(self._versions)
+            stats = dict(self.stats)
+        rows = []
+        for name, (path, refine_path) in files.items():
+            v = versions.get(name)
+            rows.append({
+                "name": name,
+                "path": str(path),
+                "refinement": str(refine_path) if refine_path else None,
+                "active": name == self.active,
+                "loaded": bool(v and v.loaded),
+                "in_use": v.in_use() if v else 0,
+                "fingerprint": v.fingerprint[:12] if v else None,
+            })
+        return {"active": self.active, "versions": rows, **stats}
@@ -0,0 +1,162 @@
+"""
+Two-tier, content-addressed prediction cache.
+
+Keys are SHA-256 digests of (uploaded image bytes, model file digest,
+feature-extractor version, fidelity profile), so a re-upload of the same
+photo or a Streamlit rerun never re-denoises or re-invokes the model, and
+any change to the model or the extractors naturally misses.
+
+  tier 1 : bounded in-memory LRU (entries)
+  tier 2 : SQLite file with size-based eviction (least recently used first)
+
+Entries are dicts of NumPy arrays (e.g. raw_probs, thumbnail, heatmap).
+"""
+
+import hashlib
+import io
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+
+def file_digest(path, chunk=1 << 20):
+    """SHA-256 hex digest of a file's contents."""
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(chunk), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _pack(entry):
+    buf = io.BytesIO()
+    np.savez(buf, **entry)
+    return buf.getvalue()
+
+
+def _unpack(blob):
+    with np.load(io.BytesIO(blob), allow_pickle=False) as npz:
+        return {k: npz[k] for k in npz.files}
+
+
+class PredictionCache:
+    """In-memory LRU in front of a size-bounded SQLite store."""
+
+    def __init__(self, db_path, max_bytes=512 * 2 ** 20, mem_items=32):
+        self.db_path = Path(db_path)
+        self.max_bytes = max_bytes
+        self.mem_items = mem_items
+        self._mem = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"mem_hits": 0, "disk_hits": 0, "misses": 0, "puts": 0, "evictions": 0}
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY, data BLOB NOT NULL,"
+            " size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_access ON entries(last_access)")
+        self._db.commit()
+
+    @staticmethod
+    def make_key(image_bytes, model_digest, feature_version, profile):
+        """Content address for one upload under one model / extractor / profile."""
+        h = hashlib.sha256()
+        h.update(hashlib.sha256(image_bytes).digest())
+        h.update(str(model_digest).encode())
+        h.update(str(feature_version).encode())
+        h.update(json.dumps(profile, sort_keys=True).encode())
+        return h.hexdigest()
+
+    # -- tier 1 ----------------------------------------------------------
+    def _remember(self, key, entry):
+        self._mem[key] = entry
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.mem_items:
+            self._mem.popitem(last=False)
+
+    def _load(self, key):
+        """(entry, tier) with tier in {"mem", "disk", None}; caller holds the lock."""
+        entry = self._mem.get(key)
+        if entry is not None:
+            self._mem.move_to_end(key)
+            return entry, "mem"
+        row = self._db.execute("SELECT data FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None, None
+        self._db.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+        self._db.commit()
+        entry = _unpack(row[0])
+        self._remember(key, entry)
+        return entry, "disk"
+
+    # -- public API ------------------------------------------------------
+    def get(self, key):
+        """Return a copy of the cached entry dict, or None."""
+        with self._lock:
+            entry, tier = self._load(key)
+            self.stats[f"{tier}_hits" if tier else "misses"] += 1
+            return dict(entry) if entry is not None else None
+
+    def put(self, key, entry):
+        """Store (or replace) an entry in both tiers."""
+        entry = {k: np.asarray(v) for k, v in entry.items() if v is not None}
+        blob = _pack(entry)
+        with self._lock:
+            self._remember(key, entry)
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, data, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, sqlite3.Binary(blob), len(blob), time.time()),
+            )
+            self.stats["puts"] += 1
+            self._evict()
+            self._db.commit()
+
+    def update(self, key, **fields):
+        """Add fields (e.g. a heatmap computed later) to an existing entry."""
+        with self._lock:
+            entry, _ = self._load(key)
+        entry = dict(entry or {})
+        entry.update(fields)
+        self.put(key, entry)
+
+    def _evict(self):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._db.execute(
+                "SELECT key, size FROM entries ORDER BY last_access ASC").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._mem.pop(key, None)
+            total -= size
+            self.stats["evictions"] += 1
+
+    def disk_usage(self):
+        """(entries, bytes) currently held on disk."""
+        with self._lock:
+            return tuple(self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone())
+
+    def summary(self):
+        """Counters plus hit rate, sizes and tier occupancy."""
+        with self._lock:
+            s = dict(self.stats)
+            s["mem_entries"] = len(self._mem)
+        lookups = s["mem_hits"] + s["disk_hits"] + s["misses"]
+        s["hit_rate"] = (s["mem_hits"] + s["disk_hits"]) / lookups if lookups else 0.0
+        s["disk_entries"], s["disk_bytes"] = self.disk_usage()
+        return s
+
+    def clear(self):
+        with self._lock:
+            self._mem.clear()
+            self._db.execute("DELETE FROM entries")
+            self._db.commit()
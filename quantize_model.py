@@ -0,0 +1,216 @@
+"""
+Tea Doctor - build float16 / int8 TFLite variants and compare them.
+
+Converts the trained tri-branch model (Keras .keras/.h5 file or SavedModel
+directory) into quantized TFLite variants and reports, for each variant and
+the float32 reference (fusion_model_baseline.tflite):
+  - file size
+  - CPU latency of one invoke (batch 1, mean / p50 over real inputs)
+  - accuracy / macro-F1 on a labeled class-per-folder set (optional),
+    top-1 agreement with the float model and mean |delta p|
+
+Variants (file names from MODEL_VARIANTS in the app):
+  float16 : float16 weights, float compute on CPU (about half the size)
+  int8    : full integer quantization (int8 weights, activations and I/O),
+            calibrated on a representative set of preprocessed leaf images
+  dynamic : int8 weights, float activations (no calibration data needed)
+
+The app serves a variant with TEA_MODEL_VARIANT=int8 (or float16); input and
+output quantization is handled by run_inference_batch. Requires TensorFlow.
+
+Usage:
+  python quantize_model.py --source fusion_model.keras --calib dataset/ --eval dataset/
+  python quantize_model.py --source saved_model/ --calib photos/ --variants int8 --calib-count 300
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+import tea_core as core
+from batch_infer import IMAGE_EXTS
+from eval_profiles import classification_metrics, iter_labeled_images
+from interpreter_pool import warm_up
+
+VARIANT_FILES = {"float16": core.MODEL_VARIANTS["float16"], "int8": core.MODEL_VARIANTS["int8"],
+                 "dynamic": "fusion_model_baseline_dynamic.tflite"}
+
+
+def _branch(name):
+    name = name.lower()
+    for branch in ("texture", "rgb", "color"):
+        if branch in name:
+            return branch
+    raise ValueError(f"cannot map model input {name!r} to rgb / color / texture")
+
+
+def image_inputs(path, profile=core.DEFAULT_PROFILE):
+    """Model inputs for one image file as {branch: [1,...] float32}."""
+    rgb, color, texture = core.prepare_inputs(core.preprocess_image(core.load_image_rgb(path), profile), profile)
+    return {"rgb": rgb[None].astype(np.float32), "color": color[None], "texture": texture[None]}
+
+
+# ============================================================================
+# CONVERSION
+# ============================================================================
+
+def make_converter(tf, source):
+    """(converter, input_names, is_keras) for a .keras/.h5 file or SavedModel dir."""
+    source = Path(source)
+    if source.is_dir():
+        loaded = tf.saved_model.load(str(source))
+        signature = loaded.signatures["serving_default"]
+        names = list(signature.structured_input_signature[1])
+        return tf.lite.TFLiteConverter.from_saved_model(str(source)), names, False
+    model = tf.keras.models.load_model(str(source), compile=False)
+    names = [t.name for t in model.inputs]
+    return tf.lite.TFLiteConverter.from_keras_model(model), names, True
+
+
+def representative_dataset(paths, input_names, as_dict, profile):
+    """Calibration generator in the converter's input order (or keyed by name)."""
+    def gen():
+        for p in paths:
+            try:
+                inputs = image_inputs(p, profile)
+            except Exception as e:
+                print(f"  skip {p}: {e}", file=sys.stderr)
+                continue
+            ordered = [inputs[_branch(n)] for n in input_names]
+            yield dict(zip(input_names, ordered)) if as_dict else ordered
+    return gen
+
+
+def convert(tf, source, variant, calib_paths, profile):
+    """Serialized TFLite flatbuffer for one variant."""
+    converter, names, is_keras = make_converter(tf, source)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if variant == "float16":
+        converter.target_spec.supported_types = [tf.float16]
+    elif variant == "int8":
+        converter.representative_dataset = representative_dataset(calib_paths, names, not is_keras, profile)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
+    elif variant != "dynamic":
+        raise ValueError(f"unknown variant {variant!r}")
+    return converter.convert()
+
+
+# ============================================================================
+# COMPARISON
+# ============================================================================
+
+def load_interpreter(path, num_threads):
+    interp = core._create_interpreter(path, num_threads=num_threads)
+    interp.allocate_tensors()
+    warm_up(interp)
+    return interp
+
+
+def measure_latency(interp, inputs, repeats=3):
+    """Mean / p50 ms of one batch-1 invoke over the given input dicts."""
+    times = []
+    for _ in range(repeats):
+        for x in inputs:
+            t0 = time.perf_counter()
+            core.run_inference(interp, x["rgb"][0], x["color"][0], x["texture"][0])
+            times.append((time.perf_counter() - t0) * 1e3)
+    return {"mean_ms": round(float(np.mean(times)), 2), "p50_ms": round(float(np.median(times)), 2)}
+
+
+def compare(models, eval_samples, latency_inputs, num_threads):
+    """Report per model name; the first entry of `models` is the float reference."""
+    interps = {name: load_interpreter(path, num_threads) for name, path in models.items()}
+    ref_name = next(iter(models))
+    probs = {name: [] for name in models}
+    labels = []
+    for path, label in eval_samples:
+        x = image_inputs(path)
+        labels.append(label)
+        for name, interp in interps.items():
+            probs[name].append(core.run_inference(interp, x["rgb"][0], x["color"][0], x["texture"][0]))
+
+    report = {}
+    for name, path in models.items():
+        entry = {"path": str(path), "size_mb": round(Path(path).stat().st_size / 2 ** 20, 3)}
+        entry["latency"] = measure_latency(interps[name], latency_inputs)
+        if labels:
+            p, ref = np.array(probs[name]), np.array(probs[ref_name])
+            m = classification_metrics(labels, p.argmax(1))
+            entry.update({
+                "accuracy": m["accuracy"],
+                "macro_f1": m["macro_f1"],
+                "agreement": float(np.mean(p.argmax(1) == ref.argmax(1))),
+                "mean_abs_dprob": float(np.abs(p - ref).mean()),
+            })
+        report[name] = entry
+    return report
+
+
+def _list_images(root, count, seed=0):
+    paths = sorted(p for p in Path(root).rglob("*") if p.suffix.lower() in IMAGE_EXTS)
+    random.Random(seed).shuffle(paths)
+    return paths[:count]
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Build and compare quantized TFLite variants")
+    ap.add_argument("--source", required=True, help="trained model: .keras / .h5 file or SavedModel dir")
+    ap.add_argument("--calib", required=True, help="folder of leaf images for int8 calibration")
+    ap.add_argument("--calib-count", type=int, default=200, help="representative images used")
+    ap.add_argument("--eval", default=None, help="class-per-folder labeled set for accuracy")
+    ap.add_argument("--eval-limit", type=int, default=None, help="max eval images per class")
+    ap.add_argument("--variants", nargs="+", default=["float16", "int8"], choices=list(VARIANT_FILES))
+    ap.add_argument("--reference", default=None, help="float32 .tflite (default: the app's model)")
+    ap.add_argument("--out-dir", default=str(core.SCRIPT_DIR))
+    ap.add_argument("--profile", default=core.DEFAULT_PROFILE, choices=list(core.PROFILES),
+                    help="preprocessing used for calibration (keep 'full', as trained)")
+    ap.add_argument("--threads", type=int, default=None, help="interpreter threads for latency")
+    ap.add_argument("-o", "--output", default="quantization_report.json")
+    args = ap.parse_args(argv)
+
+    try:
+        import tensorflow as tf
+    except ImportError:
+        print("TensorFlow is required for conversion: pip install tensorflow", file=sys.stderr)
+        return 1
+
+    reference = Path(args.reference) if args.reference else core._find_model_path("float32")
+    calib_paths = _list_images(args.calib, args.calib_count)
+    if "int8" in args.variants and not calib_paths:
+        print(f"No calibration images under {args.calib}", file=sys.stderr)
+        return 1
+
+    out_dir = Path(args.out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    models = {"float32": reference} if reference is not None else {}
+    for variant in args.variants:
+        t0 = time.perf_counter()
+        print(f"Converting {variant} ...", file=sys.stderr)
+        path = out_dir / VARIANT_FILES[variant]
+        path.write_bytes(convert(tf, args.source, variant, calib_paths, args.profile))
+        print(f"  {path} ({path.stat().st_size / 2 ** 20:.2f} MB, {time.perf_counter() - t0:.0f} s)",
+              file=sys.stderr)
+        models[variant] = path
+
+    eval_samples = list(iter_labeled_images(args.eval, args.eval_limit)) if args.eval else []
+    latency_inputs = [image_inputs(p) for p in calib_paths[:10]]
+    report = compare(models, eval_samples, latency_inputs, args.threads)
+
+    print(f"{'variant':<10}{'MB':>8}{'mean ms':>9}{'p50 ms':>9}{'acc':>8}{'mF1':>8}{'agree':>8}{'|dp|':>8}")
+    for name, r in report.items():
+        acc = (f"{r['accuracy']:>8.4f}{r['macro_f1']:>8.4f}{r['agreement']:>8.3f}{r['mean_abs_dprob']:>8.4f}"
+               if "accuracy" in r else "")
+        print(f"{name:<10}{r['size_mb']:>8.2f}{r['latency']['mean_ms']:>9.1f}{r['latency']['p50_ms']:>9.1f}{acc}")
+    Path(args.output).write_text(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,334 @@
+"""
+Tea Doctor - offline HTTP inference service with dynamic micro-batching.
+
+Standard-library asyncio server exposing the predict_disease +
+apply_refinement path to other programs (e.g. the mobile backend):
+
+  POST /predict[?refine=0&profile=fast]   body = raw image bytes (jpg/png/webp)
+  GET  /health
+  GET  /metrics[?format=prometheus]
+
+Decode + preprocessing + feature extraction run in a process pool.
+Extracted inputs from concurrent requests are collected into micro-batches
+(up to --max-batch items, waiting at most --max-wait-ms for stragglers)
+and classified with one batched interpreter invoke; up to one batch per
+pooled interpreter is in flight at a time. Every request is traced
+(extract / infer / refine wall time); /metrics?format=prometheus exposes the
+per-stage histograms and --trace-log appends each trace to a rotating JSONL file.
+
+Usage:
+  python serve.py --port 8765 --workers 4 --max-batch 8 --max-wait-ms 10
+  curl --data-binary @leaf.jpg http://127.0.0.1:8765/predict
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+import tea_core as core
+import tracing
+
+MAX_BODY_BYTES = 64 * 2 ** 20
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class PlainText(str):
+    """Route result sent as text/plain instead of JSON."""
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# ============================================================================
+# FEATURE EXTRACTION (runs in worker processes)
+# ============================================================================
+
+def _init_worker():
+    import cv2
+    cv2.setNumThreads(1)
+
+
+def extract_inputs(image_bytes, profile):
+    """Decode + preprocess + features for one upload -> (rgb, color, texture)."""
+    image = core.load_image_rgb(io.BytesIO(image_bytes))
+    return core.prepare_inputs(core.preprocess_image(image, profile), profile)
+
+
+def classify_batch(rgb, color, texture):
+    """
+    Raw [N,7] probabilities and the refinement config of the model version
+    that produced them. Runs on an executor thread: the registry lookups
+    behind both may hot-reload a model (load, warm, hash), which must not
+    block the event loop.
+    """
+    return core.predict_inputs_batch(rgb, color, texture), core.load_refinement_config()
+
+
+# ============================================================================
+# MICRO-BATCHER
+# ============================================================================
+
+class MicroBatcher:
+    """
+    Collects single requests into batches for classify_batch. Up to
+    `max_in_flight` batches (default: the interpreter pool size) are
+    classified concurrently on their own threads; when all are busy,
+    requests keep queueing and form the next, larger batch.
+    """
+
+    def __init__(self, max_batch=8, max_wait_ms=10.0, max_in_flight=core.POOL_SIZE):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1e3
+        self.max_in_flight = max_in_flight
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="infer")
+        self._tasks = set()
+        self.in_flight = 0
+        self.stats = {"batches": 0, "items": 0, "max_batch_seen": 0, "max_in_flight_seen": 0}
+
+    async def submit(self, inputs):
+        """Queue one (rgb, color, texture) tuple; resolves to (raw [7] probabilities, refinement)."""
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((inputs, fut))
+        return await fut
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                await self._slots.acquire()
+                batch = [await self._queue.get()]
+                deadline = loop.time() + self.max_wait
+                while len(batch) < self.max_batch:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+                task = asyncio.create_task(self._classify(batch))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+        finally:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _classify(self, batch):
+        self.in_flight += 1
+        self.stats["max_in_flight_seen"] = max(self.stats["max_in_flight_seen"], self.in_flight)
+        try:
+            rgb, color, texture = (np.stack(parts) for parts in zip(*(inp for inp, _ in batch)))
+            # Interpreter work happens off the event loop
+            probs, refinement = await asyncio.get_running_loop().run_in_executor(
+                self._executor, classify_batch, rgb, color, texture)
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+        self.stats["batches"] += 1
+        self.stats["items"] += len(batch)
+        self.stats["max_batch_seen"] = max(self.stats["max_batch_seen"], len(batch))
+        for (_, fut), row in zip(batch, probs):
+            if not fut.done():
+                fut.set_result((row, refinement))
+
+
+# ============================================================================
+# HTTP SERVER
+# ============================================================================
+
+class InferenceServer:
+    def __init__(self, workers=None, max_batch=8, max_wait_ms=10.0, profile=core.DEFAULT_PROFILE,
+                 trace_log=None):
+        self.profile = profile
+        # Requests interleave on the event loop, so spans are recorded on
+        # unbound traces (CPU time and tracemalloc peaks would be meaningless)
+        self.tracer = tracing.Tracer(trace_log, memory=False)
+        self.pool = ProcessPoolExecutor(max_workers=workers or os.cpu_count(),
+                                        mp_context=mp.get_context("spawn"), initializer=_init_worker)
+        self.batcher = MicroBatcher(max_batch, max_wait_ms)
+        self.requests = 0
+        self.errors = 0
+        self.started = time.time()
+
+    async def predict(self, body, query):
+        if not body:
+            raise HttpError(400, "empty body; POST the raw image bytes")
+        profile = query.get("profile", [self.profile])[0]
+        if profile not in core.PROFILES:
+            raise HttpError(400, f"unknown profile {profile!r}")
+        refine = query.get("refine", ["1"])[0] not in ("0", "false", "no")
+
+        t0 = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        trace = self.tracer.start(profile=profile, bytes=len(body))
+        try:
+            with trace.span("extract"):
+                try:
+                    inputs = await loop.run_in_executor(self.pool, extract_inputs, body, profile)
+                except Exception as e:
+                    raise HttpError(400, f"could not decode image: {type(e).__name__}: {e}")
+            with trace.span("infer"):
+                raw, refinement = await self.batcher.submit(inputs)
+            with trace.span("refine"):
+                # The config of the model version that served this batch
+                probs = core.apply_refinement(raw, *refinement) if refine else raw
+        except Exception as e:
+            trace.error = type(e).__name__
+            raise
+        finally:
+            self.tracer.finish(trace)
+        idx = int(np.argmax(probs))
+        return {
+            "class": core.CLASS_NAMES[idx],
+            "confidence": round(float(probs[idx] * 100), 2),
+            "probabilities": {c: round(float(p), 6) for c, p in zip(core.CLASS_NAMES, probs)},
+            "refined": refine,
+            "profile": profile,
+            "latency_ms": round((time.perf_counter() - t0) * 1e3, 2),
+        }
+
+    def metrics(self):
+        b = self.batcher.stats
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "uptime_s": round(time.time() - self.started, 1),
+            "batches": b["batches"],
+            "mean_batch_size": round(b["items"] / b["batches"], 2) if b["batches"] else 0.0,
+            "max_batch_seen": b["max_batch_seen"],
+            "batches_in_flight": self.batcher.in_flight,
+            "max_in_flight_seen": b["max_in_flight_seen"],
+            "models": core.get_model_registry().summary(),
+        }
+
+    async def route(self, method, target, body):
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+        if url.path == "/predict":
+            if method != "POST":
+                raise HttpError(405, "use POST")
+            return await self.predict(body, query)
+        if url.path == "/health":
+            return {"status": "ok"}
+        if url.path == "/metrics":
+            if query.get("format", [""])[0] == "prometheus":
+                return PlainText(self.tracer.render_prometheus())
+            return self.metrics()
+        raise HttpError(404, f"no route for {url.path}")
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                except ValueError:
+                    await self._respond(writer, 400, {"error": "malformed request line"}, False)
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                keep_alive = headers.get("connection", "").lower() != "close"
+
+                length = int(headers.get("content-length", 0) or 0)
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, 413, {"error": "image too large"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                self.requests += 1
+                try:
+                    status, payload = 200, await self.route(method.upper(), target, body)
+                except HttpError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except Exception as e:
+                    status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+                if status != 200:
+                    self.errors += 1
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer, status, payload, keep_alive):
+        if isinstance(payload, PlainText):
+            body, ctype = payload.encode(), "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            body, ctype = json.dumps(payload).encode(), "application/json"
+        head = (
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            f"Content-Type: {ctype}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+
+async def serve(host="127.0.0.1", port=8765, **kwargs):
+    interpreter, model_type = core.load_tflite_model()
+    if interpreter is None:
+        raise SystemExit(f"Model unavailable ({model_type}); see TFLITE_PATH in tea_core.py")
+    server = InferenceServer(**kwargs)
+    batcher_task = asyncio.create_task(server.batcher.run())
+    srv = await asyncio.start_server(server.handle, host, port)
+    print(f"Tea Doctor inference service on http://{host}:{port}  "
+          f"(max batch {server.batcher.max_batch}, max wait {server.batcher.max_wait * 1e3:.0f} ms, "
+          f"{server.batcher.max_in_flight} batches in flight)")
+    try:
+        async with srv:
+            await srv.serve_forever()
+    finally:
+        batcher_task.cancel()
+        server.pool.shutdown(cancel_futures=True)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Tea Doctor HTTP inference service")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--workers", type=int, default=None, help="feature-extraction processes")
+    ap.add_argument("--max-batch", type=int, default=8)
+    ap.add_argument("--max-wait-ms", type=float, default=10.0)
+    ap.add_argument("--profile", default=core.DEFAULT_PROFILE, choices=list(core.PROFILES))
+    ap.add_argument("--trace-log", default=None, help="append per-request traces to this JSONL file")
+    args = ap.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, workers=args.workers, max_batch=args.max_batch,
+                          max_wait_ms=args.max_wait_ms, profile=args.profile, trace_log=args.trace_log))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
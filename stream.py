@@ -0,0 +1,335 @@
+"""
+Tea Doctor - real-time video / camera stream mode.
+
+Classifies a live camera (device index) or a video file frame by frame so a
+walking scout can sweep a row of bushes:
+
+  - latest-frame capture: a reader thread keeps only the newest frame, so
+    when classification is slower than the camera, stale frames are
+    dropped instead of queueing up (frames older than the latency budget
+    are skipped too, and so are frames that find every pooled interpreter
+    busy)
+  - quality gate: assess_image_quality rejects blurry / dark frames before
+    the expensive denoise + model stages
+  - temporal smoothing: class probabilities are combined with a
+    time-constant EMA (independent of the achieved frame rate) and the
+    diagnosis is flagged stable once the same class has led for a few
+    accepted frames
+  - achieved FPS, dropped / blurry counts and end-to-end latency
+    (capture -> smoothed result) are reported
+
+The model is passed in as callables, so the same loop serves this CLI and
+the Streamlit "Live scan" page.
+
+Usage:
+  python stream.py 0                       # first local camera
+  python stream.py row3.mp4 --budget-ms 400 -o row3.jsonl
+  python stream.py row3.mp4 --offline --every 5   # every 5th frame, no dropping
+"""
+
+import argparse
+import json
+import math
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+import tea_core as core
+
+
+# ============================================================================
+# FRAME SOURCES
+# ============================================================================
+
+class FrameSource:
+    """
+    Frames from a camera index or video file as RGB arrays.
+
+    realtime=True : a reader thread paces files at their native FPS (cameras
+                    pace themselves) and keeps only the newest frame.
+    realtime=False: every `every`-th frame in order, as fast as consumed.
+    """
+
+    def __init__(self, source, realtime=True, every=1):
+        self.source = source
+        self.realtime = realtime
+        self.every = max(1, every)
+        self.is_camera = isinstance(source, int)
+        self.cap = cv2.VideoCapture(source)
+        if not self.cap.isOpened():
+            raise IOError(f"cannot open video source {source!r}")
+        fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.fps = fps if fps and fps > 0 and not math.isnan(fps) else 30.0
+        self.read = 0
+        self.dropped = 0
+        self._latest = None
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._ended = False
+        self._thread = None
+
+    def start(self):
+        if self.realtime:
+            self._thread = threading.Thread(target=self._reader, daemon=True)
+            self._thread.start()
+        return self
+
+    def _reader(self):
+        t0 = time.perf_counter()
+        while not self._stop.is_set():
+            ok, frame = self.cap.read()
+            if not ok:
+                break
+            if not self.is_camera:
+                # Replay the file on its own timeline
+                delay = t0 + self.read / self.fps - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            item = (cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), time.perf_counter(), self.read)
+            with self._cond:
+                if self._latest is not None:
+                    self.dropped += 1  # never picked up
+                self._latest = item
+                self.read += 1
+                self._cond.notify()
+        with self._cond:
+            self._ended = True
+            self._cond.notify_all()
+
+    def next(self, timeout=5.0):
+        """(rgb, t_capture, index) or None at the end of the stream."""
+        if not self.realtime:
+            for _ in range(self.every - 1):
+                if not self.cap.grab():
+                    return None
+                self.read += 1
+            ok, frame = self.cap.read()
+            if not ok:
+                return None
+            self.read += 1
+            return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), time.perf_counter(), self.read - 1
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._latest is not None or self._ended, timeout):
+                return None
+            item, self._latest = self._latest, None
+            return item
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+        self.cap.release()
+
+
+# ============================================================================
+# SMOOTHING + METRICS
+# ============================================================================
+
+class ProbabilityEMA:
+    """
+    Exponential moving average with a time constant: a frame observed dt
+    seconds after the previous one gets weight 1 - exp(-dt / tau_s).
+    """
+
+    def __init__(self, tau_s=1.0):
+        self.tau_s = tau_s
+        self.value = None
+        self._t = None
+
+    def update(self, probs, t):
+        probs = np.asarray(probs, dtype=np.float64)
+        if self.value is None or self.tau_s <= 0:
+            self.value = probs.copy()
+        else:
+            alpha = 1.0 - math.exp(-max(t - self._t, 0.0) / self.tau_s)
+            self.value = alpha * probs + (1.0 - alpha) * self.value
+        self._t = t
+        return self.value
+
+    def reset(self):
+        self.value, self._t = None, None
+
+
+class StreamClassifier:
+    """
+    Per-frame gate -> classify -> smooth.
+
+    quality(rgb) -> (score, issues, acceptable)
+    classify(rgb, deadline) -> raw [7] probabilities, or None to skip the
+                               frame (no model free by `deadline`, the
+                               perf_counter() time its latency budget ends)
+    refine(probs) -> displayed probabilities (identity when None)
+    """
+
+    def __init__(self, quality, classify, class_names, refine=None, tau_s=1.0, budget_ms=500.0,
+                 work_side=640, stable_frames=5, min_confidence=0.6):
+        self.quality = quality
+        self.classify = classify
+        self.class_names = list(class_names)
+        self.refine = refine or (lambda p: p)
+        self.ema = ProbabilityEMA(tau_s)
+        self.budget_s = budget_ms / 1e3
+        self.work_side = work_side
+        self.stable_frames = stable_frames
+        self.min_confidence = min_confidence
+        self._leader, self._streak = None, 0
+        self.counts = {"frames": 0, "stale": 0, "blurry": 0, "busy": 0, "classified": 0}
+        self.latencies_ms = []
+        self.process_ms = []
+        self.started = time.perf_counter()
+
+    def _working_copy(self, rgb):
+        h, w = rgb.shape[:2]
+        if self.work_side and max(h, w) > self.work_side:
+            scale = self.work_side / max(h, w)
+            rgb = cv2.resize(rgb, (round(w * scale), round(h * scale)), interpolation=cv2.INTER_AREA)
+        return rgb
+
+    def process(self, rgb, t_capture, index=None):
+        """Result dict for one frame, or None when it was dropped or gated out."""
+        self.counts["frames"] += 1
+        t0 = time.perf_counter()
+        if t0 - t_capture > self.budget_s:
+            self.counts["stale"] += 1
+            return None
+        frame = self._working_copy(rgb)
+        score, issues, acceptable = self.quality(frame)
+        if not acceptable:
+            self.counts["blurry"] += 1
+            return None
+
+        raw = self.classify(frame, t_capture + self.budget_s)
+        if raw is None:
+            self.counts["busy"] += 1
+            return None
+        smoothed = self.refine(self.ema.update(raw, t_capture))
+        idx = int(np.argmax(smoothed))
+        if idx == self._leader:
+            self._streak += 1
+        else:
+            self._leader, self._streak = idx, 1
+        done = time.perf_counter()
+        self.counts["classified"] += 1
+        self.latencies_ms.append((done - t_capture) * 1e3)
+        self.process_ms.append((done - t0) * 1e3)
+        return {
+            "frame": index,
+            "class": self.class_names[idx],
+            "confidence": float(smoothed[idx]),
+            "stable": bool(self._streak >= self.stable_frames and smoothed[idx] >= self.min_confidence),
+            "frame_class": self.class_names[int(np.argmax(raw))],
+            "quality": float(score),
+            "latency_ms": round(self.latencies_ms[-1], 1),
+            "probabilities": {c: round(float(p), 4) for c, p in zip(self.class_names, smoothed)},
+        }
+
+    def metrics(self, source=None):
+        elapsed = time.perf_counter() - self.started
+        lat = np.array(self.latencies_ms) if self.latencies_ms else np.zeros(1)
+        m = {
+            **self.counts,
+            "seconds": round(elapsed, 2),
+            "fps": round(self.counts["classified"] / elapsed, 2) if elapsed > 0 else 0.0,
+            "latency_ms_mean": round(float(lat.mean()), 1),
+            "latency_ms_p50": round(float(np.percentile(lat, 50)), 1),
+            "latency_ms_p95": round(float(np.percentile(lat, 95)), 1),
+            "process_ms_mean": round(float(np.mean(self.process_ms)), 1) if self.process_ms else 0.0,
+        }
+        if source is not None:
+            m.update({"source_fps": round(source.fps, 2), "read": source.read, "dropped": source.dropped})
+        return m
+
+
+def run_stream(source, classifier, on_result=None, max_seconds=None, should_stop=None):
+    """Drive `classifier` from a started FrameSource until it ends; returns metrics."""
+    t_end = time.perf_counter() + max_seconds if max_seconds else None
+    try:
+        while True:
+            if (t_end and time.perf_counter() > t_end) or (should_stop and should_stop()):
+                break
+            item = source.next()
+            if item is None:
+                break
+            rgb, t_capture, index = item
+            result = classifier.process(rgb, t_capture, index)
+            if on_result is not None:
+                on_result(rgb, result, classifier)
+    finally:
+        source.stop()
+    return classifier.metrics(source)
+
+
+def app_classifier(profile="ultra-fast", use_refinement=True, **kwargs):
+    """StreamClassifier wired to the app's quality gate, pooled interpreter and refinement."""
+    if core.get_interpreter_pool() is None:
+        raise RuntimeError("TFLite model is not available")
+
+    def classify(rgb, deadline):
+        pre = core.preprocess_image(core.ImageContext(rgb), profile)
+        try:
+            timeout = max(deadline - time.perf_counter(), 0.0)
+            with core.get_interpreter_pool().checkout(timeout=timeout) as interp:
+                return core.predict_disease(pre, interp, profile)[2]
+        except core.PoolTimeout:
+            return None  # no interpreter free within the frame's budget: skip it, keep scanning
+
+    def refine(probs):
+        # Looked up per frame: follows a hot-reloaded model / config
+        return core.apply_refinement(probs, *core.load_refinement_config())
+
+    refine = refine if use_refinement else None
+    def quality(rgb):
+        return core.assess_image_quality(core.ImageContext(core.make_thumbnail(rgb, core.GATE_SIDE)))
+
+    return StreamClassifier(quality, classify,
+                            core.CLASS_NAMES, refine=refine, **kwargs)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Classify a camera or video stream")
+    ap.add_argument("source", help="camera index (e.g. 0) or video file")
+    ap.add_argument("--profile", default="ultra-fast", help="preprocessing profile (see PROFILES)")
+    ap.add_argument("--budget-ms", type=float, default=500.0, help="skip frames older than this")
+    ap.add_argument("--tau", type=float, default=1.0, help="EMA time constant in seconds")
+    ap.add_argument("--work-side", type=int, default=640, help="downscale frames to this longest side")
+    ap.add_argument("--offline", action="store_true", help="process a file in order without dropping")
+    ap.add_argument("--every", type=int, default=1, help="with --offline: use every N-th frame")
+    ap.add_argument("--max-seconds", type=float, default=None)
+    ap.add_argument("--no-refinement", action="store_true")
+    ap.add_argument("-o", "--output", default=None, help="write per-frame results as JSONL")
+    args = ap.parse_args(argv)
+
+    core.configure_runtime()  # tuned threads from autotune.py, if any
+    source = int(args.source) if args.source.isdigit() else args.source
+    classifier = app_classifier(args.profile, not args.no_refinement, tau_s=args.tau,
+                                budget_ms=args.budget_ms, work_side=args.work_side)
+    out = open(args.output, "w", encoding="utf-8") if args.output else None
+
+    def on_result(_, result, clf):
+        if result is None:
+            return
+        if out is not None:
+            out.write(json.dumps(result) + "\n")
+        m = clf.metrics()
+        mark = "*" if result["stable"] else " "
+        print(f"\r{mark} {result['class']:<20}{result['confidence']:>6.1%}  "
+              f"{m['fps']:>5.1f} fps  {result['latency_ms']:>6.0f} ms", end="", file=sys.stderr)
+
+    try:
+        metrics = run_stream(FrameSource(source, realtime=not args.offline, every=args.every).start(),
+                             classifier, on_result, args.max_seconds)
+    except KeyboardInterrupt:
+        metrics = classifier.metrics()
+    finally:
+        if out is not None:
+            out.close()
+    print(file=sys.stderr)
+    print(json.dumps(metrics))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,482 @@
+"""
+Tea Doctor - tiled field survey of very large drone images / orthomosaics.
+
+Reads the image window by window instead of decoding it whole, so memory
+stays bounded however large the mosaic is:
+
+  - GeoTIFF / COG via rasterio when installed (windowed reads, CRS + transform)
+  - other TIFFs via tifffile: uncompressed images are memory-mapped, tiled
+    or stripped compressed images are decoded one segment (tile / strip) at
+    a time through a small LRU cache
+  - .npy arrays are memory-mapped
+
+The image is cut into a grid of `window` x `window` pixel tiles (partial
+tiles at the right / bottom edge are ignored). Tiles whose green-canopy
+share (plant_mask with the "green" HSV range of check_if_leaf; the lesion
+ranges would also accept bare soil and paths) is below --min-vegetation
+are skipped; the rest are preprocessed and classified in batches. Outputs
+in the --out directory:
+
+  tiles.geojson     one polygon per classified tile (map coordinates when
+                    the image is georeferenced, else pixel coordinates)
+  disease_map.png   one pixel per tile coloured by class (transparent where
+                    skipped) plus a .pgw world file so GIS tools place it
+  summary.json      per-class tile counts / area shares, timing, CRS
+
+Tiled (or uncompressed) TIFFs are recommended: memory then depends only on
+--cache-mb and --batch. Stripped compressed TIFFs need one full-width band
+of strips in memory.
+
+Usage:
+  python survey.py estate_ortho.tif --out survey_estate
+  python survey.py block7.tif --window 448 --min-vegetation 0.4 --batch 32 --profile fast
+"""
+
+import argparse
+import json
+import math
+import sys
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import cv2
+import numpy as np
+from PIL import Image
+
+import tea_core as core
+
+# RGB colour per class in the disease map
+CLASS_COLORS = {
+    "Brown_Blight": (139, 69, 19),
+    "Gray_Blight": (128, 128, 128),
+    "Healthy_leaf": (34, 160, 60),
+    "Helopeltis": (230, 120, 20),
+    "Red_Rust": (200, 30, 30),
+    "Red_spider": (220, 60, 160),
+    "Sunlight_Scorching": (240, 210, 40),
+}
+
+# GeoTIFF tags
+_TAG_PIXEL_SCALE = 33550
+_TAG_TIEPOINT = 33922
+_TAG_TRANSFORMATION = 34264
+
+
+# ============================================================================
+# GEOREFERENCING  (affine transform as (a, b, c, d, e, f):
+#                  x = a*col + b*row + c,  y = d*col + e*row + f)
+# ============================================================================
+
+def pixel_to_map(transform, col, row):
+    a, b, c, d, e, f = transform
+    return a * col + b * row + c, d * col + e * row + f
+
+
+def read_world_file(path):
+    """Transform from a .tfw / .wld sidecar (pixel-centre convention), or None."""
+    path = Path(path)
+    for suffix in (path.suffix[:2] + path.suffix[-1] + "w", path.suffix + "w", ".wld"):
+        wf = path.with_suffix(suffix)
+        if wf.exists():
+            a, d, b, e, cx, fy = (float(v) for v in wf.read_text().split()[:6])
+            return a, b, cx - a / 2 - b / 2, d, e, fy - d / 2 - e / 2
+    return None
+
+
+def write_world_file(path, transform):
+    a, b, c, d, e, f = transform
+    cx, fy = pixel_to_map(transform, 0.5, 0.5)
+    Path(path).write_text("\n".join(f"{v:.10f}" for v in (a, d, b, e, cx, fy)) + "\n")
+
+
+def _geotiff_georef(tif):
+    """(transform, crs) from GeoTIFF tags of the first page; either may be None."""
+    tags = tif.pages[0].tags
+    transform = None
+    if _TAG_TRANSFORMATION in tags:
+        m = tags[_TAG_TRANSFORMATION].value
+        transform = (m[0], m[1], m[3], m[4], m[5], m[7])
+    elif _TAG_PIXEL_SCALE in tags and _TAG_TIEPOINT in tags:
+        sx, sy = tags[_TAG_PIXEL_SCALE].value[:2]
+        i, j, _, x, y = tags[_TAG_TIEPOINT].value[:5]
+        transform = (sx, 0.0, x - i * sx, 0.0, -sy, y + j * sy)
+    crs = None
+    geo = tif.geotiff_metadata or {}
+    for key in ("ProjectedCSTypeGeoKey", "GeographicTypeGeoKey"):
+        code = geo.get(key)
+        if code is not None and 1024 <= int(code) < 32767:
+            crs = f"EPSG:{int(code)}"
+            break
+    return transform, crs
+
+
+# ============================================================================
+# WINDOWED RASTER READERS
+# All readers return uint8 RGB [h, w, 3] plus a validity mask (or None).
+# ============================================================================
+
+def _to_uint8(a):
+    if a.dtype == np.uint8:
+        return a
+    if a.dtype == np.uint16:
+        return (a >> 8).astype(np.uint8)
+    raise ValueError(f"unsupported sample type {a.dtype} (expected 8 or 16 bit)")
+
+
+def _split_bands(a):
+    """(rgb, valid) from an [h, w, bands] window; band 4 is taken as alpha."""
+    if a.ndim == 2:
+        a = a[..., None]
+    if a.shape[2] == 1:
+        rgb = np.repeat(a, 3, axis=2)
+    else:
+        rgb = a[..., :3]
+    valid = a[..., 3] > 0 if a.shape[2] >= 4 else None
+    return _to_uint8(np.ascontiguousarray(rgb)), valid
+
+
+class ArrayReader:
+    """Memory-mapped array (uncompressed TIFF or .npy)."""
+
+    def __init__(self, array, transform=None, crs=None):
+        self.array = array
+        self.height, self.width = array.shape[:2]
+        self.transform, self.crs = transform, crs
+        self.kind = "memmap"
+
+    def block_width(self, window):
+        return max(window, 4096 // window * window)
+
+    def read(self, x, y, w, h):
+        return _split_bands(np.asarray(self.array[y:y + h, x:x + w]))
+
+    def close(self):
+        self.array = None
+
+
+class TiffSegmentReader:
+    """
+    Compressed tiled / stripped TIFF read one decoded segment at a time. Up
+    to `cache_bytes` of decoded segments are kept (LRU), so neighbouring
+    windows reuse the tiles they share; never fewer than one band of
+    `window`-high strips.
+    """
+
+    def __init__(self, tif, cache_bytes=64 * 2 ** 20, transform=None, crs=None, window=core.IMG_SIZE):
+        page = tif.pages[0]
+        if page.planarconfig != 1:
+            raise ValueError("planar (band-separate) TIFFs are not supported; use rasterio")
+        self.tif, self.page = tif, page
+        self.height, self.width = page.shape[:2]
+        self.chunk_h, self.chunk_w = page.chunks[:2]
+        self.grid_cols = page.chunked[1]
+        self.transform, self.crs = transform, crs
+        self.kind = "tiled" if page.is_tiled else "stripped"
+        seg_bytes = self.chunk_h * self.chunk_w * (page.samplesperpixel or 1) * page.dtype.itemsize
+        self.capacity = max(4, cache_bytes // max(seg_bytes, 1))
+        if not page.is_tiled:
+            # Strips span the full width: keep at least the ones a row of windows covers
+            self.capacity = max(self.capacity, math.ceil(window / self.chunk_h) + 1)
+        self._cache = OrderedDict()
+        self.decoded = 0
+
+    def block_width(self, window):
+        """Widest column block whose tiles (one band of windows) fit the cache."""
+        if not self.page.is_tiled:
+            return self.width
+        rows = math.ceil(window / self.chunk_h) + 1
+        cols = max(1, self.capacity // rows - 1)
+        return max(window, cols * self.chunk_w // window * window)
+
+    def _segment(self, index):
+        seg = self._cache.get(index)
+        if seg is not None:
+            self._cache.move_to_end(index)
+            return seg
+        fh = self.tif.filehandle
+        fh.seek(self.page.dataoffsets[index])
+        data = fh.read(self.page.databytecounts[index])
+        seg, _, _ = self.page.decode(data, index, jpegtables=self.page.jpegtables)
+        seg = seg[0]  # [h, w, samples]
+        self.decoded += 1
+        self._cache[index] = seg
+        if len(self._cache) > self.capacity:
+            self._cache.popitem(last=False)
+        return seg
+
+    def read(self, x, y, w, h):
+        out = None
+        for r in range(y // self.chunk_h, (y + h - 1) // self.chunk_h + 1):
+            for c in range(x // self.chunk_w, (x + w - 1) // self.chunk_w + 1):
+                seg = self._segment(r * self.grid_cols + c)
+                if out is None:
+                    out = np.zeros((h, w, seg.shape[2]), dtype=seg.dtype)
+                sy, sx = r * self.chunk_h, c * self.chunk_w
+                y0, y1 = max(y, sy), min(y + h, sy + seg.shape[0])
+                x0, x1 = max(x, sx), min(x + w, sx + seg.shape[1])
+                out[y0 - y:y1 - y, x0 - x:x1 - x] = seg[y0 - sy:y1 - sy, x0 - sx:x1 - sx]
+        return _split_bands(out)
+
+    def close(self):
+        self._cache.clear()
+        self.tif.close()
+
+
+class RasterioReader:
+    """Any GDAL raster (GeoTIFF, COG, JPEG2000, ...) through rasterio windows."""
+
+    def __init__(self, ds):
+        self.ds = ds
+        self.height, self.width = ds.height, ds.width
+        self.transform = tuple(ds.transform)[:6]
+        self.crs = ds.crs.to_string() if ds.crs else None
+        self.kind = "rasterio"
+
+    def block_width(self, window):
+        bw = self.ds.block_shapes[0][1]
+        return max(window, max(bw, 4096) // window * window)
+
+    def read(self, x, y, w, h):
+        from rasterio.windows import Window
+        win = Window(x, y, w, h)
+        bands = [1, 2, 3] if self.ds.count >= 3 else [1]
+        rgb, _ = _split_bands(np.moveaxis(self.ds.read(bands, window=win), 0, -1))
+        return rgb, self.ds.read_masks(1, window=win) > 0
+
+    def close(self):
+        self.ds.close()
+
+
+def open_raster(path, cache_bytes=64 * 2 ** 20, window=core.IMG_SIZE):
+    """
+    Windowed reader for `path` (see module docstring for the supported
+    formats), sized for reads of `window` x `window` pixels.
+    """
+    path = Path(path)
+    if path.suffix.lower() == ".npy":
+        return ArrayReader(np.load(path, mmap_mode="r"), read_world_file(path))
+    try:
+        import rasterio
+        return RasterioReader(rasterio.open(path))
+    except ImportError:
+        pass
+    try:
+        import tifffile
+    except ImportError:
+        raise RuntimeError("survey mode needs tifffile (pip install tifffile) or rasterio") from None
+    try:
+        tif = tifffile.TiffFile(path)
+    except tifffile.TiffFileError:
+        raise ValueError(f"{path.name}: not a TIFF; convert large mosaics to a tiled GeoTIFF "
+                         "(e.g. gdal_translate -of COG)") from None
+    transform, crs = _geotiff_georef(tif)
+    transform = transform or read_world_file(path)
+    if tif.pages[0].is_memmappable:
+        array = tif.pages[0].asarray(out="memmap")
+        tif.close()
+        return ArrayReader(array, transform, crs)
+    return TiffSegmentReader(tif, cache_bytes, transform, crs, window)
+
+
+# ============================================================================
+# SURVEY
+# ============================================================================
+
+def vegetation_fraction(rgb, valid=None, parts=("green",)):
+    """(share of plant-coloured pixels, share of valid pixels) of one window."""
+    plant = core.plant_mask(cv2.cvtColor(rgb, cv2.COLOR_RGB2HSV), parts) > 0
+    if valid is None:
+        valid = rgb.any(axis=2)  # pure black = no data
+    return float(np.count_nonzero(plant & valid)) / plant.size, float(np.count_nonzero(valid)) / plant.size
+
+
+def iter_windows(reader, window):
+    """(row, col, x, y) of every whole window, column block by column block."""
+    rows, cols = reader.height // window, reader.width // window
+    block = reader.block_width(window) // window
+    for c0 in range(0, cols, block):
+        for r in range(rows):
+            for c in range(c0, min(c0 + block, cols)):
+                yield r, c, c * window, r * window
+
+
+def run_survey(reader, window, profile=core.DEFAULT_PROFILE, batch=16, min_vegetation=0.3,
+               min_valid=0.5, refinement=None, on_tile=None, progress=None):
+    """
+    Classify every vegetated window. on_tile(row, col, x, y, vegetation,
+    class_idx, confidence) is called per classified tile. Returns the
+    [rows, cols] class grid (-1 = skipped) and counters.
+    """
+    rows, cols = reader.height // window, reader.width // window
+    grid = np.full((rows, cols), -1, dtype=np.int8)
+    counts = {"tiles": rows * cols, "no_data": 0, "no_vegetation": 0, "classified": 0}
+    pending = []
+
+    def flush():
+        probs = core.predict_images_batch([p[-1] for p in pending], profile)
+        if refinement is not None:
+            probs = core.apply_refinement(probs, *refinement)
+        for (r, c, x, y, veg, _), p in zip(pending, probs):
+            idx = int(np.argmax(p))
+            grid[r, c] = idx
+            if on_tile is not None:
+                on_tile(r, c, x, y, veg, idx, float(p[idx]))
+        counts["classified"] += len(pending)
+        pending.clear()
+
+    done = 0
+    for r, c, x, y in iter_windows(reader, window):
+        rgb, valid = reader.read(x, y, window, window)
+        veg, valid_share = vegetation_fraction(rgb, valid)
+        done += 1
+        if valid_share < min_valid:
+            counts["no_data"] += 1
+        elif veg < min_vegetation:
+            counts["no_vegetation"] += 1
+        else:
+            pending.append((r, c, x, y, veg, core.preprocess_image(rgb, profile)))
+            if len(pending) >= batch:
+                flush()
+        if progress is not None and done % 256 == 0:
+            progress(done, counts["tiles"])
+    if pending:
+        flush()
+    return grid, counts
+
+
+# ============================================================================
+# OUTPUTS
+# ============================================================================
+
+class GeoJsonWriter:
+    """Streams one polygon Feature per tile so memory does not grow with the mosaic."""
+
+    def __init__(self, path, window, transform=None, crs=None):
+        self.fh = open(path, "w", encoding="utf-8")
+        self.window, self.transform = window, transform
+        self._first = True
+        head = {"type": "FeatureCollection"}
+        if crs and transform:
+            head["crs"] = {"type": "name", "properties": {"name": crs}}
+        self.fh.write(json.dumps(head)[:-1] + ', "features": [\n')
+
+    def add(self, row, col, x, y, vegetation, idx, confidence):
+        w = self.window
+        corners = [(x, y), (x + w, y), (x + w, y + w), (x, y + w), (x, y)]
+        if self.transform:
+            corners = [pixel_to_map(self.transform, px, py) for px, py in corners]
+        feature = {
+            "type": "Feature",
+            "geometry": {"type": "Polygon", "coordinates": [[[round(a, 6), round(b, 6)] for a, b in corners]]},
+            "properties": {"row": row, "col": col, "x": x, "y": y, "class": core.CLASS_NAMES[idx],
+                           "confidence": round(confidence, 4), "vegetation": round(vegetation, 3)},
+        }
+        self.fh.write(("" if self._first else ",\n") + json.dumps(feature))
+        self._first = False
+
+    def close(self):
+        self.fh.write("\n]}\n")
+        self.fh.close()
+
+
+def write_disease_map(path, grid, window, transform=None):
+    """RGBA PNG with one pixel per tile (+ .pgw world file when georeferenced)."""
+    img = np.zeros(grid.shape + (4,), dtype=np.uint8)
+    for idx, name in enumerate(core.CLASS_NAMES):
+        sel = grid == idx
+        img[sel, :3] = CLASS_COLORS[name]
+        img[sel, 3] = 255
+    Image.fromarray(img, "RGBA").save(path)
+    if transform:
+        a, b, c, d, e, f = transform
+        write_world_file(Path(path).with_suffix(".pgw"),
+                         (a * window, b * window, c, d * window, e * window, f))
+
+
+def summarize(grid, counts, reader, window, seconds):
+    classified = max(counts["classified"], 1)
+    per_class = {name: int(np.count_nonzero(grid == i)) for i, name in enumerate(core.CLASS_NAMES)}
+    summary = {
+        "width": reader.width,
+        "height": reader.height,
+        "reader": reader.kind,
+        "window": window,
+        "grid": list(grid.shape),
+        **counts,
+        "classes": per_class,
+        "class_share": {k: round(v / classified, 4) for k, v in per_class.items()},
+        "crs": reader.crs,
+        "transform": list(reader.transform) if reader.transform else None,
+        "seconds": round(seconds, 2),
+        "tiles_per_s": round(counts["tiles"] / seconds, 1) if seconds > 0 else None,
+    }
+    if reader.transform:
+        a, b, _, d, e, _ = reader.transform
+        tile_area = abs(a * e - b * d) * window * window
+        summary["tile_area_map_units"] = tile_area
+        summary["class_area_map_units"] = {k: v * tile_area for k, v in per_class.items()}
+    try:
+        import resource
+        scale = 1 if sys.platform == "darwin" else 1024
+        summary["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2 ** 20, 1)
+    except ImportError:
+        pass
+    return summary
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Tiled disease survey of a large drone image")
+    ap.add_argument("image", help="GeoTIFF / TIFF orthomosaic (or .npy)")
+    ap.add_argument("--out", default=None, help="output directory (default: <image>_survey)")
+    ap.add_argument("--window", type=int, default=core.IMG_SIZE, help="tile size in source pixels")
+    ap.add_argument("--min-vegetation", type=float, default=0.3, help="plant-colour share to classify a tile")
+    ap.add_argument("--batch", type=int, default=16, help="tiles per model invoke")
+    ap.add_argument("--profile", default=core.DEFAULT_PROFILE, choices=list(core.PROFILES))
+    ap.add_argument("--cache-mb", type=float, default=64, help="decoded TIFF segment cache")
+    ap.add_argument("--no-refinement", action="store_true")
+    args = ap.parse_args(argv)
+
+    core.configure_runtime()  # tuned threads from autotune.py, if any
+    if core.get_interpreter_pool() is None:
+        print("TFLite model is not available", file=sys.stderr)
+        return 1
+    refinement = None if args.no_refinement else core.load_refinement_config()
+    try:
+        reader = open_raster(args.image, int(args.cache_mb * 2 ** 20), args.window)
+    except (RuntimeError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    out_dir = Path(args.out or Path(args.image).with_suffix("").as_posix() + "_survey")
+    out_dir.mkdir(parents=True, exist_ok=True)
+    print(f"{reader.width}x{reader.height} px ({reader.kind}), {reader.width // args.window}x"
+          f"{reader.height // args.window} tiles of {args.window} px, "
+          f"{'georeferenced ' + str(reader.crs or '') if reader.transform else 'no georeference'}",
+          file=sys.stderr)
+
+    def progress(done, total):
+        print(f"\r  {done}/{total} tiles ({done / total:.0%})", end="", file=sys.stderr)
+
+    t0 = time.perf_counter()
+    geojson = GeoJsonWriter(out_dir / "tiles.geojson", args.window, reader.transform, reader.crs)
+    try:
+        grid, counts = run_survey(reader, args.window, args.profile, args.batch, args.min_vegetation,
+                                  refinement=refinement, on_tile=geojson.add, progress=progress)
+    finally:
+        geojson.close()
+        reader.close()
+    print(file=sys.stderr)
+
+    write_disease_map(out_dir / "disease_map.png", grid, args.window, reader.transform)
+    summary = summarize(grid, counts, reader, args.window, time.perf_counter() - t0)
+    (out_dir / "summary.json").write_text(json.dumps(summary, indent=2))
+    for name, n in summary["classes"].items():
+        if n:
+            print(f"  {name:<20}{n:>8} tiles  {summary['class_share'][name]:>6.1%}")
+    print(f"  {counts['classified']} classified, {counts['no_vegetation']} without vegetation, "
+          f"{counts['no_data']} no-data, {summary['seconds']} s -> {out_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
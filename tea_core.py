@@ -0,0 +1,1576 @@
+"""
+Tea Doctor - inference core (TFLite v3.6).
+
+Everything the app and the command-line tools share, importable without
+Streamlit: artefact paths and constants, image gates and leaf proposals,
+preprocessing profiles, colour / texture features, post-hoc refinement,
+model loading, batched / TTA prediction and the attention heatmap.
+
+Heavy packages stay out of the import path: the TFLite runtime is imported
+on first model load (lightest available package first, see
+TFLITE_RUNTIMES) and nothing here pulls in streamlit or matplotlib.
+`python bench_startup.py` guards the cold-start time.
+"""
+
+import cv2
+import numpy as np
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from PIL import Image
+from pathlib import Path
+
+from interpreter_pool import InterpreterPool, PoolTimeout
+from model_registry import ModelRegistry
+from prediction_cache import PredictionCache
+import tracing
+
+log = logging.getLogger("tea_doctor")
+
+
+# ============================================================================
+# PATHS  -  point at the real v3.6 artefacts
+# ============================================================================
+
+MODEL_DIR = Path(os.environ.get("TEA_MODEL_DIR", r"C:\Users\Admin\Downloads\New tea"))
+TFLITE_PATH = MODEL_DIR / "fusion_model_baseline.tflite"
+REFINE_CFG_PATH = MODEL_DIR / "refined_tflite_config.json"
+RESULTS_PATH = MODEL_DIR / "results_final (1).json"
+
+# Fallback: look for model in the same directory as this script
+SCRIPT_DIR = Path(__file__).resolve().parent
+TFLITE_PATH_LOCAL = SCRIPT_DIR / "fusion_model_baseline.tflite"
+REFINE_CFG_LOCAL = SCRIPT_DIR / "refined_tflite_config.json"
+
+# Quantized variants written by quantize_model.py next to the float model.
+# Pick one with the TEA_MODEL_VARIANT environment variable (default float32).
+MODEL_VARIANTS = {
+    "float32": TFLITE_PATH.name,
+    "float16": "fusion_model_baseline_fp16.tflite",
+    "int8": "fusion_model_baseline_int8.tflite",
+}
+MODEL_VARIANT = os.environ.get("TEA_MODEL_VARIANT", "float32")
+if MODEL_VARIANT not in MODEL_VARIANTS:
+    raise ValueError(f"TEA_MODEL_VARIANT must be one of {sorted(MODEL_VARIANTS)}, got {MODEL_VARIANT!r}")
+
+# Model registry: every *.tflite in these directories is a version named by
+# its file stem (first directory wins). TEA_MODEL_VERSION picks the active
+# one; by default the TEA_MODEL_VARIANT file. Files are re-checked for hot
+# reload every REGISTRY_CHECK_S; beyond REGISTRY_MAX_LOADED versions with
+# interpreters, the least recently used idle one is unloaded.
+MODEL_SEARCH_DIRS = [MODEL_DIR, SCRIPT_DIR / "models", SCRIPT_DIR]
+MODEL_VERSION = os.environ.get("TEA_MODEL_VERSION") or Path(MODEL_VARIANTS[MODEL_VARIANT]).stem
+REGISTRY_MAX_LOADED = 2
+REGISTRY_CHECK_S = 2.0
+
+# Prediction cache (in-memory LRU + SQLite on disk)
+CACHE_DB_PATH = SCRIPT_DIR / ".tea_cache" / "predictions.sqlite"
+CACHE_MAX_BYTES = 512 * 2 ** 20
+CACHE_MEM_ITEMS = 32
+
+# Interpreter pool shared by all sessions (one interpreter per concurrent request)
+POOL_SIZE = 4
+POOL_TIMEOUT_S = 30.0
+POOL_NUM_THREADS = max(1, (os.cpu_count() or 1) // POOL_SIZE)
+
+# Interpreter threads / XNNPACK / OpenCV threads measured by autotune.py on
+# this host. The app tunes on first start for TEA_AUTOTUNE ("latency" or
+# "throughput"; "off" keeps the defaults above).
+RUNTIME_PROFILE_PATH = SCRIPT_DIR / ".tea_cache" / "runtime_profile.json"
+AUTOTUNE_OBJECTIVE = os.environ.get("TEA_AUTOTUNE", "latency")
+
+# Per-request stage tracing (sidebar toggle): rotating JSONL log + Prometheus text file
+TRACE_LOG_PATH = SCRIPT_DIR / ".tea_cache" / "trace.jsonl"
+TRACE_LOG_MAX_BYTES = 10 * 2 ** 20
+TRACE_LOG_BACKUPS = 3
+TRACE_PROM_PATH = SCRIPT_DIR / ".tea_cache" / "metrics.prom"
+
+# ============================================================================
+# CONSTANTS
+# ============================================================================
+
+CLASS_NAMES = [
+    "Brown_Blight", "Gray_Blight", "Healthy_leaf",
+    "Helopeltis", "Red_Rust", "Red_spider", "Sunlight_Scorching",
+]
+IMG_SIZE = 224
+COLOR_CHANNELS = 8
+TEXTURE_CHANNELS = 11
+# Bump whenever preprocessing or the feature extractors change output,
+# so cached predictions made with the old code are not reused.
+FEATURE_VERSION = "3.6.1"
+THUMB_SIDE = 768  # cached / displayed preprocessed image
+GATE_SIDE = 512   # quality / leaf gates run on a copy this size, before any costly stage
+LBP_RADIUS = 1
+LBP_POINTS = 8
+
+# Preprocessing / feature fidelity profiles.
+#   max_side   : longest side the denoise + CLAHE stage works at (None = native)
+#   denoise    : "nlmeans" (fastNlMeansDenoisingColored) or "bilateral"
+#   search     : NL-means search window (ignored for bilateral)
+#   gabor_ksize: Gabor kernel size for texture channels 2-3 (trained with 21)
+# "full" is exactly what the model was trained and evaluated with.
+PROFILES = {
+    "full": {"max_side": None, "denoise": "nlmeans", "search": 21, "gabor_ksize": 21},
+    "fast": {"max_side": 896, "denoise": "nlmeans", "search": 11, "gabor_ksize": 15},
+    "ultra-fast": {"max_side": 448, "denoise": "bilateral", "search": None, "gabor_ksize": 11},
+}
+DEFAULT_PROFILE = "full"
+
+# Adaptive test-time augmentation (as in results_final: 5 crops x 2 flips, T=1.5).
+# Only run when the single view is unsure: top-1 below min_confidence, or
+# the top-2 classes are both in the confused triplet and closer than triplet_margin.
+CONFUSED_TRIPLET = ("Brown_Blight", "Gray_Blight", "Red_Rust")
+TTA = {
+    "crops": 5,             # centre + 4 corners
+    "crop_frac": 0.875,     # crop side as a fraction of the image side
+    "flips": True,          # add the horizontal mirror of every crop
+    "temperature": 1.5,     # views are averaged as softmax(log(p) / T)
+    "min_confidence": 0.6,
+    "triplet_margin": 0.5,
+}
+
+# Multi-leaf photos: leaf proposals from plant-colour connected components
+LEAF_PROPOSALS = {
+    "work_side": 512,       # proposals are found on a copy with this longest side
+    "min_area_frac": 0.02,  # smallest leaf, as a fraction of the image area
+    "min_solidity": 0.5,    # area / convex hull area; rejects stems and clutter
+    "erode_frac": 0.012,    # erosion kernel (fraction of the work side) splitting touching leaves
+    "pad_frac": 0.1,        # margin added around each leaf box
+    "max_leaves": 8,
+}
+
+# Attention maps. "attention" occludes patches of the 224 input and measures
+# the drop in the explained class's probability: a coarse grid first, then
+# only the cells that mattered most are split 2x2, one batched invoke per
+# level, until `levels` or the latency budget is reached. "proxy" is the
+# model-free edge / texture map (also the fallback without a model).
+HEATMAP = {
+    "mode": os.environ.get("TEA_HEATMAP_MODE", "attention"),
+    "budget_ms": float(os.environ.get("TEA_HEATMAP_BUDGET_MS", "1500")),
+    "grid": 4,              # coarse grid: grid x grid patches (56 px at 224)
+    "levels": 3,            # coarse + 2 refinements (56 -> 28 -> 14 px)
+    "refine_frac": 0.25,    # share of a level's cells refined, by probability drop
+    "min_drop": 0.02,       # cells that cost less than this are never refined
+    "proxy_side": 512,      # the proxy works on a copy with this longest side
+}
+
+# ============================================================================
+# SHARED RESOURCES
+# ============================================================================
+
+def shared_resource(fn):
+    """
+    Process-wide memo for expensive loaders (model, pools, caches) - the
+    Streamlit-free equivalent of st.cache_resource. Concurrent first calls
+    build the resource once; fn.cache_clear() drops every cached value.
+    """
+    cached = functools.lru_cache(maxsize=None)(fn)
+    lock = threading.Lock()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with lock:
+            return cached(*args, **kwargs)
+
+    wrapper.cache_clear = cached.cache_clear
+    return wrapper
+
+
+# ============================================================================
+# IMAGE LOADING
+# ============================================================================
+
+def load_image_rgb(source):
+    """Decode a path / file-like object into an RGB uint8 array."""
+    image = np.array(Image.open(source))
+    if len(image.shape) == 2:
+        image = cv2.cvtColor(image, cv2.COLOR_GRAY2RGB)
+    elif image.shape[2] == 4:
+        image = cv2.cvtColor(image, cv2.COLOR_RGBA2RGB)
+    return image
+
+
+# ============================================================================
+# IMAGE CONTEXT  (colour spaces / grayscale / CLAHE computed once per image)
+# ============================================================================
+
+_thread_state = threading.local()
+
+
+def get_clahe():
+    """CLAHE(clip=2.0, 8x8) shared by every caller on this thread."""
+    clahe = getattr(_thread_state, "clahe", None)
+    if clahe is None:
+        clahe = _thread_state.clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+    return clahe
+
+
+class ImageContext:
+    """
+    Lazily evaluated, memoised intermediates of one RGB uint8 image.
+    Each colour space / derived map is computed on first access only, and
+    resized(size) returns a memoised context for that resolution.
+    """
+
+    def __init__(self, rgb):
+        self.rgb = rgb
+        self._memo = {}
+        self._resized = {}
+
+    @classmethod
+    def from_float(cls, img_float):
+        """Wrap a float32 [0,1] image, keeping the float copy as-is."""
+        ctx = cls(np.clip(img_float * 255, 0, 255).astype(np.uint8))
+        ctx._memo["float"] = img_float
+        return ctx
+
+    def _lazy(self, key, fn):
+        if key not in self._memo:
+            self._memo[key] = fn()
+        return self._memo[key]
+
+    @property
+    def float(self):
+        return self._lazy("float", lambda: np.divide(self.rgb, 255.0, dtype=np.float32))
+
+    @property
+    def hsv(self):
+        return self._lazy("hsv", lambda: cv2.cvtColor(self.rgb, cv2.COLOR_RGB2HSV))
+
+    @property
+    def lab(self):
+        return self._lazy("lab", lambda: cv2.cvtColor(self.rgb, cv2.COLOR_RGB2LAB))
+
+    @property
+    def gray(self):
+        return self._lazy("gray", lambda: cv2.cvtColor(self.rgb, cv2.COLOR_RGB2GRAY))
+
+    @property
+    def gray_float(self):
+        return self._lazy("gray_float", lambda: np.divide(self.gray, 255.0, dtype=np.float32))
+
+    @property
+    def clahe_gray(self):
+        return self._lazy("clahe_gray", lambda: get_clahe().apply(self.gray))
+
+    @property
+    def clahe_l(self):
+        return self._lazy("clahe_l", lambda: get_clahe().apply(np.ascontiguousarray(self.lab[:, :, 0])))
+
+    def resized(self, size):
+        """Context for the image resized to size x size (bilinear)."""
+        if self.rgb.shape[:2] == (size, size):
+            return self
+        if size not in self._resized:
+            self._resized[size] = ImageContext(cv2.resize(self.rgb, (size, size)))
+        return self._resized[size]
+
+
+def as_context(img):
+    """Accept either an RGB uint8 array or an existing ImageContext."""
+    # Checked against ndarray, not ImageContext: Streamlit re-executes this
+    # script on every rerun, so contexts may come from an earlier class object
+    # (e.g. through the ModelBinding cached on a pooled interpreter).
+    return ImageContext(img) if isinstance(img, np.ndarray) else img
+
+
+def _float_context(img_float):
+    return ImageContext.from_float(img_float) if isinstance(img_float, np.ndarray) else img_float
+
+
+# ============================================================================
+# IMAGE QUALITY & LEAF CHECK
+# ============================================================================
+
+def assess_image_quality(img):
+    """Return (score 0-100, issues list, acceptable bool)."""
+    gray = as_context(img).gray
+    mean, std = cv2.meanStdDev(gray)
+    brightness, contrast = float(mean[0, 0]), float(std[0, 0])
+    lap_var = float(cv2.meanStdDev(cv2.Laplacian(gray, cv2.CV_64F))[1][0, 0] ** 2)
+
+    issues = []
+    if brightness < 15:
+        issues.append("Very dark")
+    elif brightness > 240:
+        issues.append("Very bright")
+    if lap_var < 10:
+        issues.append("Extremely blurry")
+    if contrast < 5:
+        issues.append("No contrast")
+
+    score = 100
+    if lap_var < 10:
+        score -= 30
+    if brightness < 15 or brightness > 240:
+        score -= 20
+    if contrast < 5:
+        score -= 20
+    score = max(0, score)
+    acceptable = score >= 35 and lap_var >= 8 and brightness > 10 and contrast > 3
+    return score, issues, acceptable
+
+
+# HSV range of the white / paper background removed before leaf analysis
+WHITE_BG_HSV = ((0, 0, 200), (180, 60, 255))
+
+# HSV ranges of plant colours (healthy green, yellowing, red-brown lesions)
+PLANT_HSV_RANGES = {
+    "green": [((20, 25, 20), (95, 255, 255))],
+    "yellow": [((10, 25, 30), (45, 255, 255))],
+    "red": [((0, 20, 30), (15, 255, 255)), ((160, 20, 30), (180, 255, 255))],
+}
+
+
+def plant_mask(hsv, parts=("green", "yellow", "red")):
+    """uint8 mask of the given PLANT_HSV_RANGES colours in an HSV image."""
+    mask = None
+    for part in parts:
+        for lo, hi in PLANT_HSV_RANGES[part]:
+            m = cv2.inRange(hsv, lo, hi)
+            mask = m if mask is None else mask | m
+    return mask
+
+
+def check_if_leaf(img):
+    """Background-aware tea leaf detection (permissive)."""
+    try:
+        ctx = as_context(img)
+        hsv = ctx.hsv
+        h, w = hsv.shape[:2]
+        total = h * w
+
+        # Remove white background
+        white_mask = cv2.inRange(hsv, *WHITE_BG_HSV)
+        fg_mask = cv2.bitwise_not(white_mask)
+        fg_px = max(cv2.countNonZero(fg_mask), 1)
+        if fg_px < total * 0.03:
+            return False
+
+        plant = plant_mask(hsv)
+        plant_ratio = cv2.countNonZero(cv2.bitwise_and(plant, fg_mask)) / fg_px * 100
+
+        # Edges
+        gray = ctx.gray
+        edges = cv2.Canny(cv2.GaussianBlur(gray, (5, 5), 0), 30, 120)
+        edge_ratio = cv2.countNonZero(cv2.bitwise_and(edges, fg_mask)) / fg_px * 100
+        lap_var = float(cv2.meanStdDev(cv2.Laplacian(gray, cv2.CV_64F), mask=fg_mask)[1][0, 0] ** 2)
+
+        # Skin heuristic
+        skin = cv2.inRange(hsv, (0, 10, 60), (25, 200, 255))
+        skin_ratio = cv2.countNonZero(cv2.bitwise_and(skin, fg_mask)) / fg_px * 100
+
+        color_ok = plant_ratio >= 12
+        struct_ok = edge_ratio >= 2.0 and lap_var >= 10.0
+        face_like = skin_ratio >= 25 and edge_ratio < 2 and lap_var < 10
+        return (color_ok or struct_ok) and not face_like
+    except Exception:
+        return True  # let the model decide
+
+
+def _square_box(x, y, w, h, width, height, pad_frac):
+    """Pad a box and grow it to a square (the model sees square inputs), clipped to the image."""
+    side = min(round(max(w, h) * (1 + 2 * pad_frac)), width, height)
+    x0 = min(max(0, x + w // 2 - side // 2), width - side)
+    y0 = min(max(0, y + h // 2 - side // 2), height - side)
+    return x0, y0, side, side
+
+
+def propose_leaves(img, cfg=LEAF_PROPOSALS):
+    """
+    Boxes (x, y, w, h) of individual leaves, largest first. Plant-coloured,
+    non-background pixels are closed (lesions / veins), eroded so leaves
+    that only touch at their edges separate, and split into connected
+    components; small or ragged (low-solidity) components are dropped.
+    """
+    ctx = as_context(img)
+    height, width = ctx.rgb.shape[:2]
+    scale = min(1.0, cfg["work_side"] / max(height, width))
+    small = ctx if scale == 1.0 else ImageContext(cv2.resize(
+        ctx.rgb, (max(1, round(width * scale)), max(1, round(height * scale))), interpolation=cv2.INTER_AREA))
+    hsv = small.hsv
+    mask = cv2.bitwise_and(plant_mask(hsv), cv2.bitwise_not(cv2.inRange(hsv, *WHITE_BG_HSV)))
+
+    k = max(3, int(max(hsv.shape[:2]) * cfg["erode_frac"]) | 1)
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (k, k))
+    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+    cores = cv2.erode(mask, kernel, iterations=2)
+    n, labels, stats, _ = cv2.connectedComponentsWithStats(cores, connectivity=8)
+
+    min_area = cfg["min_area_frac"] * mask.size
+    found = []
+    for i in np.argsort(-stats[1:, cv2.CC_STAT_AREA]) + 1:
+        area = stats[i, cv2.CC_STAT_AREA]
+        if area < min_area or len(found) >= cfg["max_leaves"]:
+            break
+        x, y, w, h = stats[i, :4]
+        comp = (labels[y:y + h, x:x + w] == i).astype(np.uint8)
+        contours, _ = cv2.findContours(comp, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        contour = max(contours, key=cv2.contourArea)
+        hull_area = cv2.contourArea(cv2.convexHull(contour))
+        if hull_area and cv2.contourArea(contour) / hull_area < cfg["min_solidity"]:
+            continue
+        # Undo the erosion (2 x k/2 per side) and map back to full resolution
+        x, y, w, h = x - k, y - k, w + 2 * k, h + 2 * k
+        box = [round(v / scale) for v in (x, y, w, h)]
+        found.append(_square_box(*box, width, height, cfg["pad_frac"]))
+    return found
+
+
+# ============================================================================
+# IMAGE PREPROCESSING (light denoise + CLAHE)
+# ============================================================================
+
+def get_profile(profile=DEFAULT_PROFILE):
+    """Look up a fidelity profile by name (dicts are passed through)."""
+    if isinstance(profile, dict):
+        return profile
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown profile {profile!r}; choose from {sorted(PROFILES)}")
+    return PROFILES[profile]
+
+
+def preprocess_image(img, profile=DEFAULT_PROFILE):
+    cfg = get_profile(profile)
+    img = as_context(img).rgb
+
+    # Working resolution: the model only sees 224x224, so denoising a
+    # 48 MP photo at native size buys nothing on the reduced profiles.
+    max_side = cfg["max_side"]
+    if max_side and max(img.shape[:2]) > max_side:
+        scale = max_side / max(img.shape[:2])
+        img = cv2.resize(img, (max(1, round(img.shape[1] * scale)), max(1, round(img.shape[0] * scale))),
+                         interpolation=cv2.INTER_AREA)
+
+    with tracing.span("denoise"):
+        if cfg["denoise"] == "bilateral":
+            denoised = cv2.bilateralFilter(img, d=5, sigmaColor=30, sigmaSpace=5)
+        else:
+            denoised = cv2.fastNlMeansDenoisingColored(
+                img, None, h=7, hColor=7, templateWindowSize=7, searchWindowSize=cfg["search"])
+    with tracing.span("clahe"):
+        denoised = ImageContext(denoised)
+        _, a_ch, b_ch = cv2.split(denoised.lab)
+        lab = cv2.merge([denoised.clahe_l, a_ch, b_ch])
+        return cv2.cvtColor(lab, cv2.COLOR_LAB2RGB)
+
+
+# ============================================================================
+# FEATURE WORKSPACE  (per-thread scratch buffers, reused across images)
+# ============================================================================
+
+# Image sizes with a live workspace per thread (224 for the model, plus the
+# odd heatmap / benchmark size)
+WORKSPACE_SHAPES = 4
+
+
+class FeatureWorkspace:
+    """
+    Scratch buffers of the feature extractors for one [H,W] size.
+    Buffers are allocated on first use and reused by every later image of
+    that size on the same thread; the extractors write through OpenCV dst=
+    and NumPy out= so a steady-state image allocates no temporaries.
+    Results always land in caller-owned arrays, never in these buffers.
+    """
+
+    def __init__(self, shape):
+        self.shape = tuple(shape)
+        self._buffers = {}
+        self._lbp = {}
+
+    def buffer(self, name, dtype=np.float32):
+        """[H,W] scratch array `name` (contents undefined on return)."""
+        key = (name, np.dtype(dtype))
+        buf = self._buffers.get(key)
+        if buf is None:
+            buf = self._buffers[key] = np.empty(self.shape, dtype)
+        return buf
+
+    def lbp_geometry(self, P, R):
+        """Zero-padded float64 canvas and per-sample interpolation weights for uniform_lbp."""
+        key = (P, R)
+        if key not in self._lbp:
+            rows, cols = self.shape
+            pad = int(np.ceil(R))
+            r_idx = np.arange(rows, dtype=np.float64)[:, None]
+            c_idx = np.arange(cols, dtype=np.float64)[None, :]
+            samples = []
+            for i in range(P):
+                rp = round(-R * np.sin(2 * np.pi * i / P), 5)
+                cp = round(R * np.cos(2 * np.pi * i / P), 5)
+                if rp == int(rp) and cp == int(cp):
+                    samples.append((int(rp), int(rp), int(cp), int(cp), None))
+                    continue
+                # Per-pixel coordinates, floor/ceil and weights exactly as skimage
+                r, c = r_idx + rp, c_idx + cp
+                dr, dc = r - np.floor(r), c - np.floor(c)
+                samples.append((int(np.floor(rp)), int(np.ceil(rp)), int(np.floor(cp)), int(np.ceil(cp)),
+                                (1 - dr, dr, 1 - dc, dc)))
+            self._lbp[key] = (pad, np.zeros((rows + 2 * pad, cols + 2 * pad)), samples)
+        return self._lbp[key]
+
+    def nbytes(self):
+        return (sum(b.nbytes for b in self._buffers.values())
+                + sum(g[1].nbytes for g in self._lbp.values()))
+
+
+def get_workspace(shape):
+    """FeatureWorkspace for an [H,W] size on this thread (the WORKSPACE_SHAPES most recent sizes are kept)."""
+    cache = getattr(_thread_state, "workspaces", None)
+    if cache is None:
+        cache = _thread_state.workspaces = {}
+    shape = tuple(shape[:2])
+    ws = cache.pop(shape, None)
+    if ws is None:
+        ws = FeatureWorkspace(shape)
+    cache[shape] = ws
+    while len(cache) > WORKSPACE_SHAPES:
+        del cache[next(iter(cache))]
+    return ws
+
+
+# ============================================================================
+# UNIFORM LBP  -  vectorised, bit-identical to skimage local_binary_pattern
+# ============================================================================
+
+def _uniform_lbp_lut(P):
+    """Map every P-bit neighbour code to its skimage 'uniform' label."""
+    codes = np.arange(1 << P)
+    bits = (codes[:, None] >> np.arange(P)) & 1
+    # skimage counts 0/1 transitions over the open chain 0..P-1 (not circular)
+    changes = (bits[:, :-1] != bits[:, 1:]).sum(axis=1)
+    return np.where(changes <= 2, bits.sum(axis=1), P + 1).astype(np.uint8)
+
+
+_LBP_LUT = {}
+_LBP_LUT_SCALED = {}
+
+
+def _lbp_lut(P):
+    if P not in _LBP_LUT:
+        _LBP_LUT[P] = _uniform_lbp_lut(P)
+    return _LBP_LUT[P]
+
+
+def _lbp_codes(image, P, R, ws):
+    """Raw P-bit neighbour codes of a 2-D image, in a buffer of workspace `ws`."""
+    if P > 16:
+        raise ValueError("uniform_lbp supports at most 16 sampling points")
+    rows, cols = ws.shape
+    pad, padded, samples = ws.lbp_geometry(P, R)
+    img = padded[pad:pad + rows, pad:pad + cols]
+    img[...] = image  # the border stays zero
+
+    def shifted(dr, dc):
+        # img[r + dr, c + dc] with zeros outside, as an [H,W] view
+        return padded[pad + dr:pad + dr + rows, pad + dc:pad + dc + cols]
+
+    code_dtype = np.uint16 if P > 8 else np.uint8
+    code = ws.buffer("lbp_code", code_dtype)
+    bits = ws.buffer("lbp_bits", code_dtype)
+    mask = ws.buffer("lbp_mask", bool)
+    top, bottom, tmp = (ws.buffer(f"lbp_{n}", np.float64) for n in ("top", "bottom", "tmp"))
+    code.fill(0)
+    for i, (minr, maxr, minc, maxc, weights) in enumerate(samples):
+        if weights is None:
+            np.subtract(shifted(minr, minc), img, out=top)
+        else:
+            # texture = (1 - dr) * top + dr * bottom, same operation order as skimage
+            w_r0, dr, w_c0, dc = weights
+            np.multiply(w_c0, shifted(minr, minc), out=top)
+            np.multiply(dc, shifted(minr, maxc), out=tmp)
+            np.add(top, tmp, out=top)
+            np.multiply(w_c0, shifted(maxr, minc), out=bottom)
+            np.multiply(dc, shifted(maxr, maxc), out=tmp)
+            np.add(bottom, tmp, out=bottom)
+            np.multiply(w_r0, top, out=top)
+            np.multiply(dr, bottom, out=bottom)
+            np.add(top, bottom, out=top)
+            np.subtract(top, img, out=top)
+        np.greater_equal(top, 0, out=mask)
+        np.left_shift(mask, i, out=bits, dtype=code_dtype)
+        np.bitwise_or(code, bits, out=code)
+    return code
+
+
+def uniform_lbp(image, P=LBP_POINTS, R=LBP_RADIUS):
+    """
+    Uniform local binary pattern of a 2-D image.
+    Same sampling, bilinear interpolation (zero outside the image) and
+    float64 arithmetic as skimage.feature.local_binary_pattern(...,
+    method="uniform"), so the output is bit-identical. Returns float64 [H,W].
+    """
+    code = _lbp_codes(image, P, R, get_workspace(np.shape(image)))
+    return _lbp_lut(P)[code].astype(np.float64)
+
+
+def _uniform_lbp_scaled(image, out, ws, P=LBP_POINTS, R=LBP_RADIUS):
+    """uniform_lbp(image) / (P + 2) as float32, written into `out`."""
+    code = _lbp_codes(image, P, R, ws)
+    if P not in _LBP_LUT_SCALED:
+        # Same float32 division as scaling the label image, done once per label
+        _LBP_LUT_SCALED[P] = _lbp_lut(P).astype(np.float32) / (P + 2)
+    lut = _LBP_LUT_SCALED[P]
+    if lut.size == 256:
+        return cv2.LUT(code, lut, dst=out)
+    return np.take(lut, code, out=out, mode="clip")
+
+
+# ============================================================================
+# FEATURE EXTRACTORS  -  exact mirror of tea_train_v3_6 notebook
+# ============================================================================
+#
+# Each channel is computed into a contiguous plane of the thread's
+# FeatureWorkspace through OpenCV dst= / NumPy out=, and the planes are
+# interleaved into the caller's output with one cv2.merge. The arithmetic
+# (operands, order, float32 vs float64) is unchanged, so the outputs are
+# bit-identical to computing every step into a new array
+# (bench_features.py checks this).
+
+def _scale_u8(src, out, divisor=255.0):
+    """out = src.astype(float32) / divisor, without the intermediate copy."""
+    return np.divide(src, divisor, out=out, dtype=np.float32)
+
+
+def _ratio(num, den, lo, hi, out):
+    """clip(num / (den + 1e-8), lo, hi) into `out`."""
+    np.add(den, 1e-8, out=out)
+    np.divide(num, out, out=out)
+    return np.clip(out, lo, hi, out=out)
+
+
+def _normalise_max(x, out):
+    """x / (x.max() + 1e-8) into `out`."""
+    return np.divide(x, x.max() + 1e-8, out=out)
+
+
+def _merge_channels(planes, out):
+    """Interleave [H,W] planes into out [H,W,C]."""
+    if out.flags.c_contiguous and out.dtype == np.float32:
+        merged = cv2.merge(planes, dst=out)
+        if merged is out:
+            return out
+    for i, plane in enumerate(planes):
+        out[..., i] = plane
+    return out
+
+
+def extract_color_features(img_float, out=None):
+    """
+    8-channel colour feature map (v3.6).
+    Input : float32 [H,W,3] in [0,1], RGB (or an ImageContext).
+    Output: float32 [H,W,8], written into `out` when given.
+    Channels: H, S, CLAHE-L*, a*, b*, ExG, a*/b*, R/G
+    """
+    ctx = _float_context(img_float)
+    img_float = ctx.float
+    hsv, lab = ctx.hsv, ctx.lab
+    if out is None:
+        out = np.empty(hsv.shape[:2] + (COLOR_CHANNELS,), dtype=np.float32)
+    ws = get_workspace(hsv.shape)
+    H, S, L_clahe, a_star, b_star, ExG, ab_ratio, rg_ratio = planes = [
+        ws.buffer(f"color_{i}") for i in range(COLOR_CHANNELS)]
+    mask = ws.buffer("color_mask", bool)
+
+    _scale_u8(hsv[:, :, 0], H, 180.0)
+    _scale_u8(hsv[:, :, 1], S)
+    _scale_u8(ctx.clahe_l, L_clahe)
+    _scale_u8(lab[:, :, 1], a_star)
+    _scale_u8(lab[:, :, 2], b_star)
+
+    # ExG = clip(2G - R - B, -1, 1)
+    R, G, B = img_float[:, :, 0], img_float[:, :, 1], img_float[:, :, 2]
+    np.multiply(G, 2, out=ExG)
+    np.subtract(ExG, R, out=ExG)
+    np.subtract(ExG, B, out=ExG)
+    np.clip(ExG, -1, 1, out=ExG)
+
+    # where(|b*| > 0.01, clip(a* / b*, -2, 2) / 4 + 0.5, 0.5)
+    np.greater(np.abs(b_star, out=ab_ratio), 0.01, out=mask)
+    _ratio(a_star, b_star, -2, 2, ab_ratio)
+    np.divide(ab_ratio, 4, out=ab_ratio)
+    np.add(ab_ratio, 0.5, out=ab_ratio)
+    np.copyto(ab_ratio, 0.5, where=np.logical_not(mask, out=mask))
+
+    # where(G > 0.01, clip(R / G, 0, 4) / 4, 0.5)
+    np.greater(G, 0.01, out=mask)
+    _ratio(R, G, 0, 4, rg_ratio)
+    np.divide(rg_ratio, 4, out=rg_ratio)
+    np.copyto(rg_ratio, 0.5, where=np.logical_not(mask, out=mask))
+
+    return _merge_channels(planes, out)
+
+
+@functools.lru_cache(maxsize=None)
+def gabor_kernels(ksize=21):
+    """
+    The 0 and 45 degree Gabor kernels, built once per kernel size. Stored
+    as float32, the precision filter2D applies them in for a CV_32F result.
+    """
+    return tuple(
+        cv2.getGaborKernel((ksize, ksize), sigma=4.0, theta=theta, lambd=10.0, gamma=0.5,
+                           psi=0).astype(np.float32)
+        for theta in [0, np.pi / 4]
+    )
+
+
+MORPH_KERNEL = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
+
+
+# -- individual texture channels: fn(ctx, cfg, ws, out) -> float32 [H,W] ----
+# written into the contiguous plane `out`, or an array the context already holds
+
+def _tex_gray(ctx, cfg, ws, out):
+    return ctx.gray_float
+
+
+def _tex_canny(ctx, cfg, ws, out):
+    edges = cv2.Canny(ctx.gray, 50, 150, edges=ws.buffer("u8", np.uint8))
+    return _scale_u8(edges, out)
+
+
+def _gabor_response(ctx, kern, ws, out):
+    resp = cv2.filter2D(ctx.gray, cv2.CV_32F, kern, dst=out)
+    np.abs(resp, out=resp)
+    _normalise_max(resp, resp)
+    return np.clip(resp, 0, 1, out=resp)
+
+
+def _tex_gabor_0(ctx, cfg, ws, out):
+    return _gabor_response(ctx, gabor_kernels(cfg["gabor_ksize"])[0], ws, out)
+
+
+def _tex_gabor_45(ctx, cfg, ws, out):
+    return _gabor_response(ctx, gabor_kernels(cfg["gabor_ksize"])[1], ws, out)
+
+
+def _tex_local_std(ctx, cfg, ws, out):
+    gray_f = ctx.gray_float
+    mu = cv2.blur(gray_f, (7, 7), dst=ws.buffer("f0"))
+    sq = cv2.blur(np.square(gray_f, out=ws.buffer("f1")), (7, 7), dst=out)
+    # sqrt(clip(sq - mu ** 2, 0, None))
+    np.subtract(sq, np.square(mu, out=mu), out=sq)
+    local_std = np.sqrt(np.clip(sq, 0, None, out=sq), out=sq)
+    return _normalise_max(local_std, local_std)
+
+
+def _tex_morph_grad(ctx, cfg, ws, out):
+    grad = cv2.morphologyEx(ctx.gray, cv2.MORPH_GRADIENT, MORPH_KERNEL, dst=ws.buffer("u8", np.uint8))
+    return _scale_u8(grad, out)
+
+
+def _tex_clahe_gray(ctx, cfg, ws, out):
+    return _scale_u8(ctx.clahe_gray, out)
+
+
+def _tex_lesion(ctx, cfg, ws, out):
+    # Brown-ish mask, blurred into a density map
+    brown_mask = cv2.inRange(ctx.hsv, (8, 60, 40), (30, 255, 200), dst=ws.buffer("u8", np.uint8))
+    return cv2.blur(_scale_u8(brown_mask, ws.buffer("f0")), (15, 15), dst=out)
+
+
+def _tex_lbp_gray(ctx, cfg, ws, out):
+    return _uniform_lbp_scaled(ctx.gray, out, ws)
+
+
+def _tex_lbp_a(ctx, cfg, ws, out):
+    return _uniform_lbp_scaled(ctx.lab[:, :, 1], out, ws)
+
+
+def _tex_hue_edge(ctx, cfg, ws, out):
+    # Saturation-weighted Sobel magnitude
+    sx = cv2.Sobel(ctx.gray, cv2.CV_32F, 1, 0, ksize=3, dst=out)
+    sy = cv2.Sobel(ctx.gray, cv2.CV_32F, 0, 1, ksize=3, dst=ws.buffer("f0"))
+    edge_mag = np.add(np.square(sx, out=sx), np.square(sy, out=sy), out=sx)
+    np.sqrt(edge_mag, out=edge_mag)
+    _normalise_max(edge_mag, edge_mag)
+    hue_edge = np.multiply(edge_mag, _scale_u8(ctx.hsv[:, :, 1], sy), out=edge_mag)
+    return _normalise_max(hue_edge, hue_edge)
+
+
+# Channel order of the 11-channel texture input (must match training)
+TEXTURE_CHANNEL_FUNCS = [
+    ("gray", _tex_gray),
+    ("canny", _tex_canny),
+    ("gabor_0", _tex_gabor_0),
+    ("gabor_45", _tex_gabor_45),
+    ("local_std", _tex_local_std),
+    ("morph_grad", _tex_morph_grad),
+    ("clahe_gray", _tex_clahe_gray),
+    ("lesion_density", _tex_lesion),
+    ("lbp_gray", _tex_lbp_gray),
+    ("lbp_a", _tex_lbp_a),
+    ("hue_edge", _tex_hue_edge),
+]
+
+
+def extract_texture_features(img_float, profile=DEFAULT_PROFILE, out=None):
+    """
+    11-channel texture feature map (v3.6).
+    Input : float32 [H,W,3] in [0,1], RGB (or an ImageContext).
+    Output: float32 [H,W,11], written into `out` when given.
+    Channels:
+      0  Gray              5  MorphGrad          10 HueWeightedEdge
+      1  Canny             6  CLAHE gray
+      2  Gabor 0 deg       7  Lesion density
+      3  Gabor 45 deg      8  LBP gray
+      4  Local std-dev     9  LBP a*
+    """
+    ctx = _float_context(img_float)
+    cfg = get_profile(profile)
+    if out is None:
+        out = np.empty(ctx.rgb.shape[:2] + (len(TEXTURE_CHANNEL_FUNCS),), dtype=np.float32)
+    ws = get_workspace(ctx.rgb.shape)
+    planes = [fn(ctx, cfg, ws, ws.buffer(f"texture_{i}"))
+              for i, (_, fn) in enumerate(TEXTURE_CHANNEL_FUNCS)]
+    return _merge_channels(planes, out)
+
+
+# ============================================================================
+# POST-HOC REFINEMENT  (temperature scaling + per-class thresholds)
+# ============================================================================
+
+def read_refinement_config(path):
+    """refined_tflite_config.json -> (temperature, thresholds_array); defaults for None."""
+    if path is not None:
+        cfg = json.loads(Path(path).read_text())
+        temp = float(cfg.get("temperature", 1.0))
+        thresh = cfg.get("thresholds_array", [0.5] * 7)
+        return temp, np.array(thresh, dtype=np.float32)
+    return 1.0, np.ones(7, dtype=np.float32) * 0.5
+
+
+def load_refinement_config(version=None):
+    """(temperature, thresholds_array) paired with the active (or named) model version."""
+    v = get_model_registry().get(version)
+    if v is not None:
+        temp, thresh = v.refinement
+    else:
+        temp, thresh = read_refinement_config(next(
+            (p for p in [REFINE_CFG_PATH, REFINE_CFG_LOCAL] if p.exists()), None))
+    return temp, thresh.copy()
+
+
+def save_refinement_config(path, temperature, thresholds, **extra):
+    """Write (temperature, thresholds) in the refined_tflite_config.json format."""
+    thresholds = [round(float(t), 4) for t in thresholds]
+    cfg = {
+        "temperature": round(float(temperature), 4),
+        "thresholds": dict(zip(CLASS_NAMES, thresholds)),
+        "thresholds_array": thresholds,
+        "class_names": CLASS_NAMES,
+        "img_size": IMG_SIZE,
+        "color_channels": COLOR_CHANNELS,
+        "texture_channels": TEXTURE_CHANNELS,
+        "description": "Apply after TFLite inference: 1) logits = log(probs), 2) scaled = logits/T, "
+                       "3) softmax, 4) divide by thresholds, 5) renormalize",
+        **extra,
+    }
+    Path(path).write_text(json.dumps(cfg, indent=2))
+    return cfg
+
+
+def calibrate_probs(raw_probs, temperature):
+    """
+    Temperature-scaled softmax of log(probs) over the last axis.
+    `temperature` broadcasts against the leading axes, e.g. a [T,1,1]
+    grid with [N,7] probabilities gives [T,N,7].
+    """
+    logits = np.log(np.clip(raw_probs, 1e-8, 1.0))
+    scaled = logits / temperature
+    # Numerically stable softmax
+    exp_s = np.exp(scaled - scaled.max(axis=-1, keepdims=True))
+    return exp_s / (exp_s.sum(axis=-1, keepdims=True) + 1e-8)
+
+
+def apply_thresholds(calibrated, thresholds):
+    """Per-class threshold gating + re-normalisation (broadcasts like calibrate_probs)."""
+    adjusted = calibrated / (thresholds + 1e-8)
+    return adjusted / (adjusted.sum(axis=-1, keepdims=True) + 1e-8)
+
+
+def apply_refinement(raw_probs, temperature, thresholds):
+    """
+    Post-hoc refinement matching training notebook Cell 26.
+    1) logits = log(probs)   2) scale = logits / T
+    3) softmax               4) divide by thresholds
+    5) re-normalise
+    Works on a single [7] vector or a [N,7] batch (row-wise).
+    """
+    return apply_thresholds(calibrate_probs(raw_probs, temperature), thresholds)
+
+
+# ============================================================================
+# TFLITE MODEL LOADING & PREDICTION
+# ============================================================================
+
+# Batched calls are padded up to one of these sizes so that at most a
+# handful of resized interpreter pools are ever built.
+BATCH_SIZES = (1, 2, 4, 8, 16, 32)
+
+# Interpreter packages, lightest first: ai-edge-litert / tflite-runtime
+# import in a fraction of a second, full TensorFlow takes several.
+TFLITE_RUNTIMES = ("ai_edge_litert", "tflite_runtime", "tensorflow")
+
+
+def model_candidates(variant=None):
+    """Paths searched for a model variant (default: the active version), in order."""
+    name = MODEL_VARIANTS[variant] if variant else MODEL_VERSION + ".tflite"
+    return [d / name for d in MODEL_SEARCH_DIRS]
+
+
+def _find_model_path(variant=None):
+    for p in model_candidates(variant):
+        if p.exists():
+            return p
+    return None
+
+
+def _import_interpreter(name):
+    if name == "ai_edge_litert":
+        from ai_edge_litert.interpreter import Interpreter
+    elif name == "tflite_runtime":
+        from tflite_runtime.interpreter import Interpreter
+    elif name == "tensorflow":
+        import tensorflow as tf
+        Interpreter = tf.lite.Interpreter
+    else:
+        raise ImportError(f"unknown TFLite runtime {name!r}")
+    return Interpreter
+
+
+@shared_resource
+def tflite_runtime():
+    """
+    (package, Interpreter class) of the first importable runtime in
+    TFLITE_RUNTIMES, or (None, None). TEA_TFLITE_RUNTIME pins one package.
+    """
+    pinned = os.environ.get("TEA_TFLITE_RUNTIME")
+    for name in [pinned] if pinned else TFLITE_RUNTIMES:
+        try:
+            return name, _import_interpreter(name)
+        except ImportError:
+            continue
+    return None, None
+
+
+def _create_interpreter(model_path, num_threads=None, xnnpack=True):
+    """
+    Instantiate (but do not allocate) an interpreter from the selected runtime.
+    xnnpack=False builds it without the default XNNPACK delegate.
+    """
+    name, interpreter_cls = tflite_runtime()
+    if interpreter_cls is None:
+        raise ImportError("no TFLite runtime installed (" + ", ".join(TFLITE_RUNTIMES) + ")")
+    kwargs = {}
+    if not xnnpack:
+        resolver = getattr(sys.modules[interpreter_cls.__module__], "OpResolverType", None)
+        if resolver is None:
+            raise ValueError(f"{name} cannot disable the default XNNPACK delegate")
+        kwargs["experimental_op_resolver_type"] = resolver.BUILTIN_WITHOUT_DEFAULT_DELEGATES
+    return interpreter_cls(model_path=str(model_path), num_threads=num_threads, **kwargs)
+
+
+@shared_resource
+def runtime_profile():
+    """
+    Tuned settings saved by autotune.py, or None when there are none for
+    this host, runtime and model (a different CPU count, runtime or model
+    file invalidates them).
+    """
+    if not RUNTIME_PROFILE_PATH.exists():
+        return None
+    try:
+        prof = json.loads(RUNTIME_PROFILE_PATH.read_text())
+    except (OSError, ValueError):
+        return None
+    if (prof.get("cpu_count") != os.cpu_count() or prof.get("runtime") != tflite_runtime()[0]
+            or prof.get("model_fingerprint") != model_fingerprint()):
+        return None
+    return prof
+
+
+_worker_threads = {}
+
+
+def interpreter_options():
+    """
+    num_threads / xnnpack for pooled interpreters: the tuned profile, else
+    the defaults; num_threads as set by configure_worker() in a worker process.
+    """
+    prof = runtime_profile()
+    if prof is None:
+        options = {"num_threads": POOL_NUM_THREADS, "xnnpack": True}
+    else:
+        options = {"num_threads": prof["num_threads"], "xnnpack": prof["xnnpack"]}
+    options.update(_worker_threads)
+    return options
+
+
+def configure_worker(num_threads=1):
+    """
+    For one of several worker processes sharing the CPU: OpenCV and every
+    interpreter created afterwards use `num_threads` threads. The tuned
+    profile is measured for a single process owning the host, so it is
+    overridden here. Call from the pool initializer.
+    """
+    cv2.setNumThreads(num_threads)
+    _worker_threads["num_threads"] = num_threads
+
+
+def configure_runtime(objective=None):
+    """
+    Apply the tuned profile (OpenCV threads now; interpreter options for
+    interpreters created afterwards) and return it. When there is none yet
+    and `objective` is "latency" or "throughput", run a quick autotune first.
+    Call before the first load_tflite_model() / get_interpreter_pool().
+    """
+    prof = runtime_profile()
+    if prof is None and objective in ("latency", "throughput") and tflite_runtime()[1] is not None \
+            and get_model_registry().get() is not None:
+        import autotune
+        autotune.save_profile(autotune.tune(objective, quick=True))
+        runtime_profile.cache_clear()
+        prof = runtime_profile()
+    if prof is not None:
+        cv2.setNumThreads(prof["cv2_threads"])
+    return prof
+
+
+_load_errors = {}
+_base_lock = threading.Lock()
+_base = {"version": None, "result": None}
+
+
+def _load_base(version):
+    p = version.path
+    try:
+        if runtime_profile() is None and not _worker_threads:
+            interp = _create_interpreter(p)
+        else:
+            interp = _create_interpreter(p, **interpreter_options())
+        interp.allocate_tensors()
+        get_binding(interp)  # raises if an input branch is missing
+        _load_errors.pop("model", None)
+        return interp, "tflite"
+    except Exception as e:
+        _load_errors["model"] = f"Failed to load model from {p}: {e}"
+        log.error(_load_errors["model"])
+        return None, "load_error"
+
+
+def load_tflite_model():
+    """
+    Load the active model version (v3.6 tri-branch fusion) -> (interpreter, status).
+    status is "tflite", "tf_missing", "model_missing" or "load_error"
+    (details in model_load_error()).
+
+    The result is kept for the current generation of the active version
+    only: a model file that appears later, or a hot reload, is picked up
+    on the next call, and the previous interpreter (and its mapping of the
+    old file) is released.
+    """
+    if tflite_runtime()[1] is None:
+        return None, "tf_missing"
+    version = get_model_registry().get()
+    if version is None:
+        return None, "model_missing"
+    with _base_lock:
+        if _base["version"] is not version:
+            _base["version"], _base["result"] = None, None  # drop the old interpreter first
+            _base["result"] = _load_base(version)
+            _base["version"] = version
+        return _base["result"]
+
+
+def model_load_error():
+    """Message of the last failed load_tflite_model(), or None."""
+    return _load_errors.get("model")
+
+
+def build_interpreter(batch_size=1, num_threads=None, xnnpack=True, model_path=None):
+    """Fresh, allocated interpreter with its three inputs sized [batch_size, ...]."""
+    model_path = model_path or get_model_registry().get().path
+    interp = _create_interpreter(model_path, num_threads=num_threads, xnnpack=xnnpack)
+    if batch_size != 1:
+        for det in interp.get_input_details():
+            shape = list(det["shape"])
+            shape[0] = batch_size
+            interp.resize_tensor_input(det["index"], shape)
+    interp.allocate_tensors()
+    get_binding(interp)
+    return interp
+
+
+def _version_pool(version, batch_size):
+    """
+    Pool of interpreters for one model version and batch size. The batch-1
+    pool is fully pre-allocated; larger batch sizes start with one
+    interpreter and grow on demand.
+    """
+    options = interpreter_options()
+    return InterpreterPool(
+        lambda: build_interpreter(batch_size, model_path=version.path, **options),
+        size=POOL_SIZE,
+        timeout=POOL_TIMEOUT_S,
+        prealloc=POOL_SIZE if batch_size == 1 else 1,
+    )
+
+
+@shared_resource
+def get_model_registry():
+    """Model versions in MODEL_SEARCH_DIRS, shared by every session (see model_registry.py)."""
+    return ModelRegistry(MODEL_SEARCH_DIRS, _version_pool, read_refinement_config,
+                         default=MODEL_VERSION, fallback_refine=[REFINE_CFG_PATH, REFINE_CFG_LOCAL],
+                         max_loaded=REGISTRY_MAX_LOADED, check_interval_s=REGISTRY_CHECK_S)
+
+
+def get_interpreter_pool(batch_size=1):
+    """
+    Interpreter pool for one batch size of the active model version, shared
+    by every session. Look it up per request: after a hot reload it is the
+    new version's pool. Returns None if the model is unavailable.
+    """
+    version = get_model_registry().get()
+    if version is None or load_tflite_model()[0] is None:
+        return None
+    return version.pool(batch_size)
+
+
+def model_fingerprint():
+    """SHA-256 of the active model version ("none" when missing)."""
+    version = get_model_registry().get()
+    return version.fingerprint if version is not None else "none"
+
+
+@shared_resource
+def get_prediction_cache():
+    return PredictionCache(CACHE_DB_PATH, max_bytes=CACHE_MAX_BYTES, mem_items=CACHE_MEM_ITEMS)
+
+
+@shared_resource
+def get_tracer():
+    return tracing.Tracer(TRACE_LOG_PATH, max_bytes=TRACE_LOG_MAX_BYTES, backups=TRACE_LOG_BACKUPS,
+                          prom_path=TRACE_PROM_PATH)
+
+
+def prepare_inputs(img, profile=DEFAULT_PROFILE):
+    """
+    Build the three model inputs for one preprocessed RGB image (or context).
+    Returns (rgb [224,224,3] uint8, color [224,224,8], texture [224,224,11]).
+    """
+    ctx = as_context(img).resized(IMG_SIZE)
+    with tracing.span("color_features"):
+        color = extract_color_features(ctx)
+    with tracing.span("texture_features"):
+        texture = extract_texture_features(ctx, profile)
+    return ctx.rgb, color, texture
+
+
+def quantize_input(x, det):
+    """
+    Convert a float/uint8 input to the tensor's dtype. Quantized (int8 /
+    uint8 / int16) tensors get real -> q = round(x / scale) + zero_point.
+    """
+    dtype = np.dtype(det["dtype"])
+    scale, zero_point = det.get("quantization", (0.0, 0))
+    if dtype.kind in "iu" and scale:
+        info = np.iinfo(dtype)
+        q = np.round(np.asarray(x, dtype=np.float32) / scale) + zero_point
+        return np.clip(q, info.min, info.max).astype(dtype)
+    return np.asarray(x).astype(dtype)
+
+
+def dequantize_output(q, det):
+    """Quantized output tensor -> float32 (real = (q - zero_point) * scale)."""
+    scale, zero_point = det.get("quantization", (0.0, 0))
+    if np.dtype(det["dtype"]).kind in "iu" and scale:
+        return (q.astype(np.float32) - zero_point) * np.float32(scale)
+    return q.astype(np.float32, copy=False)
+
+
+# Input branches of the tri-branch model, matched by tensor name
+MODEL_INPUTS = ("rgb", "color", "texture")
+
+
+class ModelBinding:
+    """
+    Tensor indices and quantization of one allocated interpreter, resolved
+    once. Inputs are written straight into the interpreter's own buffers
+    through interpreter.tensor() views (feature extractors fill them in
+    place), and outputs are read from a view without get_tensor's copy.
+    Views are only held while writing / reading, as TFLite requires
+    around invoke().
+    """
+
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+        self.inputs = {}
+        details = interpreter.get_input_details()
+        for det in details:
+            name = det["name"].lower()
+            # "texture" first: it never contains the other two substrings
+            branch = next((b for b in ("texture", "rgb", "color") if b in name), None)
+            if branch is not None:
+                self.inputs[branch] = det
+        missing = [b for b in MODEL_INPUTS if b not in self.inputs]
+        if missing:
+            raise ValueError(f"model has no {'/'.join(missing)} input "
+                             f"(inputs: {', '.join(d['name'] for d in details)})")
+        self.output = interpreter.get_output_details()[0]
+        self.batch_size = int(self.inputs["rgb"]["shape"][0])
+        # Quantized or non-float inputs go through a float scratch + quantize_input
+        self._direct = {b: np.dtype(d["dtype"]) == np.float32 for b, d in self.inputs.items()}
+
+    def _view(self, branch):
+        return self.interpreter.tensor(self.inputs[branch]["index"])()
+
+    def write(self, branch, value, rows=slice(None)):
+        """Copy `value` into rows of one input (cast / quantized in place)."""
+        det = self.inputs[branch]
+        self._view(branch)[rows] = value if self._direct[branch] else quantize_input(value, det)
+
+    def fill(self, branch, row, extract):
+        """Let extract(out=...) write one sample of a float input in place."""
+        if self._direct[branch]:
+            extract(self._view(branch)[row])
+        else:
+            self.write(branch, extract(None), row)
+
+    def clear(self, rows):
+        for branch in MODEL_INPUTS:
+            self._view(branch)[rows] = 0
+
+    def write_image(self, row, img, profile=DEFAULT_PROFILE):
+        """Extract the features of one preprocessed image directly into batch row `row`."""
+        ctx = as_context(img).resized(IMG_SIZE)
+        with tracing.span("color_features"):
+            self.fill("color", row, lambda out: extract_color_features(ctx, out=out))
+        with tracing.span("texture_features"):
+            self.fill("texture", row, lambda out: extract_texture_features(ctx, profile, out=out))
+        self.write("rgb", ctx.rgb, row)
+
+    def invoke(self, n=None):
+        """Run the model; returns [n,7] probabilities (the only copy of the output)."""
+        with tracing.span("invoke"):
+            self.interpreter.invoke()
+        raw = self.interpreter.tensor(self.output["index"])()[:n]
+        probs = np.clip(dequantize_output(raw, self.output), 0, 1)
+        # Safety fallback for degenerate rows
+        dead = probs.sum(axis=1) < 0.01
+        if dead.any():
+            probs[dead] = 1.0 / probs.shape[1]
+        return probs
+
+    def _check(self, n):
+        if n > self.batch_size:
+            raise ValueError(f"{n} samples for an interpreter sized for batch {self.batch_size}")
+
+    def run_batch(self, rgb, color, texture):
+        """Classify stacked [n,...] inputs (n <= batch size; the rest is zero-padded)."""
+        n = len(rgb)
+        self._check(n)
+        for branch, value in zip(MODEL_INPUTS, (rgb, color, texture)):
+            self.write(branch, value, slice(0, n))
+        if n < self.batch_size:
+            self.clear(slice(n, None))
+        return self.invoke(n)
+
+    def run_images(self, imgs, profile=DEFAULT_PROFILE):
+        """Classify preprocessed images, extracting features into the input buffers."""
+        self._check(len(imgs))
+        for i, img in enumerate(imgs):
+            self.write_image(i, img, profile)
+        if len(imgs) < self.batch_size:
+            self.clear(slice(len(imgs), None))
+        return self.invoke(len(imgs))
+
+
+def get_binding(interpreter):
+    """The interpreter's ModelBinding, built on first use and kept on the interpreter."""
+    binding = getattr(interpreter, "_tea_binding", None)
+    if binding is None:
+        binding = ModelBinding(interpreter)
+        interpreter._tea_binding = binding
+    return binding
+
+
+def run_inference_batch(interpreter, rgb, color, texture):
+    """
+    Feed [N,...] inputs to an interpreter sized for batch N (or more).
+    Handles float and quantized (int8 / float16-weight) model variants.
+    Returns an [N,7] probability matrix.
+    """
+    return get_binding(interpreter).run_batch(rgb, color, texture)
+
+
+def run_inference(interpreter, rgb, color, texture):
+    """Feed one set of inputs to the interpreter and return the 7 probabilities."""
+    return run_inference_batch(interpreter, rgb[None], color[None], texture[None])[0]
+
+
+def predict_disease(img, interpreter, profile=DEFAULT_PROFILE):
+    """
+    Run the tri-branch TFLite model.
+    Returns (class_name, confidence_pct, probs_array).
+    """
+    probs = get_binding(interpreter).run_images([img], profile)[0]
+    idx = int(np.argmax(probs))
+    return CLASS_NAMES[idx], float(probs[idx] * 100), probs
+
+
+def padded_batch_size(n):
+    """Smallest cached batch size >= n (capped at the largest one)."""
+    for size in BATCH_SIZES:
+        if size >= n:
+            return size
+    return BATCH_SIZES[-1]
+
+
+def _predict_chunked(n, run):
+    """
+    Classify n samples with as few invokes as possible: chunks go to pooled
+    interpreters of a cached batch size, run(binding, start, stop) fills one.
+    """
+    out = np.empty((n, len(CLASS_NAMES)), dtype=np.float32)
+    start = 0
+    while start < n:
+        size = padded_batch_size(n - start)
+        stop = min(start + size, n)
+        pool = get_interpreter_pool(size)
+        if pool is None:
+            raise RuntimeError("TFLite model is not available")
+        with pool.checkout() as interp:
+            out[start:stop] = run(get_binding(interp), start, stop)
+        start = stop
+    return out
+
+
+def predict_inputs_batch(rgb, color, texture):
+    """Classify stacked [N,...] inputs. Returns [N,7] raw probabilities."""
+    return _predict_chunked(len(rgb), lambda b, i, j: b.run_batch(rgb[i:j], color[i:j], texture[i:j]))
+
+
+def predict_images_batch(imgs, profile=DEFAULT_PROFILE):
+    """Classify preprocessed images, extracting features straight into the interpreter inputs."""
+    return _predict_chunked(len(imgs), lambda b, i, j: b.run_images(imgs[i:j], profile))
+
+
+def predict_disease_batch(imgs, temperature=None, thresholds=None, profile=DEFAULT_PROFILE):
+    """
+    Batched counterpart of predict_disease for a list of preprocessed images.
+    Returns an [N,7] probability matrix; refined when temperature and
+    thresholds are given.
+    """
+    probs = predict_images_batch(imgs, profile)
+    if temperature is not None:
+        probs = apply_refinement(probs, temperature, thresholds)
+    return probs
+
+
+# ============================================================================
+# TEST-TIME AUGMENTATION  (adaptive, one batched invoke)
+# ============================================================================
+
+def needs_tta(probs, cfg=TTA):
+    """True when a single-view [7] prediction is uncertain or triplet-confused."""
+    order = np.argsort(probs)[::-1]
+    top1, top2 = float(probs[order[0]]), float(probs[order[1]])
+    if top1 < cfg["min_confidence"]:
+        return True
+    pair = {CLASS_NAMES[order[0]], CLASS_NAMES[order[1]]}
+    return pair <= set(CONFUSED_TRIPLET) and top1 - top2 < cfg["triplet_margin"]
+
+
+def tta_views(img, cfg=TTA):
+    """Crop (+ mirrored) views of a preprocessed image as ImageContexts."""
+    rgb = as_context(img).rgb
+    h, w = rgb.shape[:2]
+    ch, cw = max(1, round(h * cfg["crop_frac"])), max(1, round(w * cfg["crop_frac"]))
+    origins = [((h - ch) // 2, (w - cw) // 2), (0, 0), (0, w - cw), (h - ch, 0), (h - ch, w - cw)]
+    views = []
+    for y, x in origins[:cfg["crops"]]:
+        crop = rgb[y:y + ch, x:x + cw]
+        views.append(ImageContext(np.ascontiguousarray(crop)))
+        if cfg["flips"]:
+            views.append(ImageContext(np.ascontiguousarray(crop[:, ::-1])))
+    return views
+
+
+def predict_tta(img, profile=DEFAULT_PROFILE, cfg=TTA):
+    """
+    Classify every TTA view in one batched invoke and average them.
+    Returns [7] probabilities (feed to apply_refinement like raw ones).
+    """
+    probs = predict_images_batch(tta_views(img, cfg), profile)
+    return calibrate_probs(probs, cfg["temperature"]).mean(axis=0)
+
+
+# ============================================================================
+# MULTI-LEAF CLASSIFICATION  (one batched invoke for all leaf crops)
+# ============================================================================
+
+def predict_leaves(img, boxes, profile=DEFAULT_PROFILE):
+    """[K,7] raw probabilities for the leaf crops `boxes` of one image."""
+    if not len(boxes):
+        return np.empty((0, len(CLASS_NAMES)), dtype=np.float32)
+    rgb = as_context(img).rgb
+    crops = [preprocess_image(rgb[y:y + h, x:x + w], profile) for x, y, w, h in boxes]
+    return predict_images_batch(crops, profile)
+
+
+def draw_leaf_boxes(img, boxes, labels, colors):
+    """Copy of img with numbered, labelled boxes (box coordinates in img pixels)."""
+    out = img.copy()
+    thick = max(2, max(img.shape[:2]) // 250)
+    font = max(0.4, max(img.shape[:2]) / 1200)
+    for n, ((x, y, w, h), label, color) in enumerate(zip(boxes, labels, colors), 1):
+        cv2.rectangle(out, (x, y), (x + w, y + h), color, thick)
+        text = f"{n}: {label}"
+        (tw, th), base = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, font, 1)
+        ty = max(y, th + base + 2 * thick)
+        cv2.rectangle(out, (x, ty - th - base - 2 * thick), (x + tw + 2 * thick, ty), color, -1)
+        cv2.putText(out, text, (x + thick, ty - base - thick), cv2.FONT_HERSHEY_SIMPLEX, font,
+                    (255, 255, 255), 1, cv2.LINE_AA)
+    return out
+
+
+# ============================================================================
+# HEATMAP  (occlusion attention, batched coarse-to-fine; edge / texture proxy)
+# ============================================================================
+
+def _normalise_map(heatmap):
+    mn, mx = heatmap.min(), heatmap.max()
+    if mx > mn:
+        return (heatmap - mn) / (mx - mn)
+    return np.zeros_like(heatmap)
+
+
+def proxy_heatmap(img, cfg=HEATMAP):
+    """Model-free edge / texture map, computed on a copy of at most proxy_side."""
+    gray = make_thumbnail(as_context(img).gray, cfg["proxy_side"])
+    edges = cv2.Canny(gray, 50, 150).astype(np.float32) / 255.0
+    lap = np.abs(cv2.Laplacian(gray, cv2.CV_32F))
+    lap /= lap.max() + 1e-6
+    heatmap = 0.6 * edges + 0.4 * lap
+    # One pass with sigma * sqrt(3) equals the former three passes with sigma 2
+    heatmap = cv2.GaussianBlur(heatmap, (0, 0), 2.0 * np.sqrt(3))
+    return np.power(_normalise_map(heatmap), 0.8)
+
+
+def _split_cell(cell):
+    """The four quadrants of a (y0, y1, x0, x1) cell."""
+    y0, y1, x0, x1 = cell
+    ym, xm = (y0 + y1) // 2, (x0 + x1) // 2
+    return [(y0, ym, x0, xm), (y0, ym, xm, x1), (ym, y1, x0, xm), (ym, y1, xm, x1)]
+
+
+def occlusion_heatmap(img, profile=DEFAULT_PROFILE, class_idx=None, budget_ms=None,
+                      predict=None, cfg=HEATMAP):
+    """
+    Occlusion attention map of a preprocessed image for class_idx (default:
+    the predicted class): each patch is filled with the mean colour and
+    scored by the drop in that class's probability per unit of area.
+    The unoccluded image and the coarse grid go in one batch; each later
+    level splits the top cells 2x2 in one more batch, as long as the
+    estimated cost fits in what is left of the budget (the coarse level
+    always runs). predict(imgs) -> [N,7] defaults to the pooled interpreters.
+    Returns ([IMG_SIZE, IMG_SIZE] map in [0,1], stats).
+    """
+    t0 = time.perf_counter()
+    budget_s = (cfg["budget_ms"] if budget_ms is None else budget_ms) / 1e3
+    predict = predict or (lambda imgs: predict_images_batch(imgs, profile))
+    base = as_context(img).resized(IMG_SIZE).rgb
+    fill = base.mean(axis=(0, 1)).round().astype(np.uint8)
+
+    def occluded(cell):
+        y0, y1, x0, x1 = cell
+        out = base.copy()
+        out[y0:y1, x0:x1] = fill
+        return out
+
+    edges = np.linspace(0, IMG_SIZE, cfg["grid"] + 1).round().astype(int)
+    cells = [(edges[i], edges[i + 1], edges[j], edges[j + 1])
+             for i in range(cfg["grid"]) for j in range(cfg["grid"])]
+    with tracing.span("occlusion"):
+        probs = predict([base] + [occluded(c) for c in cells])
+    per_variant = (time.perf_counter() - t0) / len(probs)
+    if class_idx is None:
+        class_idx = int(np.argmax(probs[0]))
+    p0 = float(probs[0, class_idx])
+    probs = probs[1:]
+    stats = {"mode": "attention", "class": CLASS_NAMES[class_idx], "confidence": round(p0, 4),
+             "levels": 1, "batches": 1, "variants": len(cells) + 1}
+
+    total = np.zeros((IMG_SIZE, IMG_SIZE), dtype=np.float32)
+    count = np.zeros_like(total)
+    smallest = IMG_SIZE
+    for level in range(cfg["levels"]):
+        drops = np.maximum(p0 - probs[:, class_idx], 0.0)
+        for (y0, y1, x0, x1), drop in zip(cells, drops):
+            total[y0:y1, x0:x1] += drop * IMG_SIZE ** 2 / ((y1 - y0) * (x1 - x0))
+            count[y0:y1, x0:x1] += 1
+            smallest = min(smallest, y1 - y0, x1 - x0)
+        if level + 1 == cfg["levels"] or smallest < 4:
+            break
+        order = [i for i in np.argsort(drops)[::-1] if drops[i] >= cfg["min_drop"]]
+        left_s = budget_s - (time.perf_counter() - t0)
+        n = int(min(len(order), max(1, np.ceil(len(cells) * cfg["refine_frac"])),
+                    left_s / (4 * per_variant)))
+        if n <= 0:
+            break
+        cells = [child for i in order[:n] for child in _split_cell(cells[i])]
+        t1 = time.perf_counter()
+        with tracing.span("occlusion"):
+            probs = predict([occluded(c) for c in cells])
+        per_variant = (time.perf_counter() - t1) / len(cells)
+        stats["levels"] += 1
+        stats["batches"] += 1
+        stats["variants"] += len(cells)
+
+    heatmap = cv2.GaussianBlur(total / np.maximum(count, 1), (0, 0), smallest / 2)
+    stats["ms"] = round((time.perf_counter() - t0) * 1e3, 1)
+    return _normalise_map(heatmap), stats
+
+
+def generate_heatmap(img, mode=None, profile=DEFAULT_PROFILE, class_idx=None, budget_ms=None,
+                     cfg=HEATMAP):
+    """
+    (map in [0,1], stats) in `mode` "attention" (occlusion) or "proxy"
+    (edge / texture). Attention falls back to the proxy when the model is
+    unavailable or every interpreter is busy; stats["mode"] says which ran.
+    """
+    mode = mode or cfg["mode"]
+    if mode == "attention":
+        try:
+            return occlusion_heatmap(img, profile, class_idx, budget_ms, cfg=cfg)
+        except (RuntimeError, PoolTimeout) as e:
+            log.warning("attention map unavailable, using the proxy: %s", e)
+    elif mode != "proxy":
+        raise ValueError(f"unknown heatmap mode {mode!r} (use 'attention' or 'proxy')")
+    t0 = time.perf_counter()
+    heatmap = proxy_heatmap(img, cfg)
+    return heatmap, {"mode": "proxy", "ms": round((time.perf_counter() - t0) * 1e3, 1)}
+
+
+def make_thumbnail(img, max_side=THUMB_SIDE):
+    """Downscale so the longest side is at most max_side (no upscaling)."""
+    h, w = img.shape[:2]
+    if max(h, w) <= max_side:
+        return img
+    scale = max_side / max(h, w)
+    return cv2.resize(img, (max(1, round(w * scale)), max(1, round(h * scale))),
+                      interpolation=cv2.INTER_AREA)
+
+
+def overlay_heatmap(img, heatmap, alpha=0.4):
+    img = as_context(img).rgb
+    hm = cv2.resize(heatmap, (img.shape[1], img.shape[0]))
+    coloured = cv2.applyColorMap((hm * 255).astype(np.uint8), cv2.COLORMAP_JET)
+    coloured = cv2.cvtColor(coloured, cv2.COLOR_BGR2RGB)
+    return cv2.addWeighted(img, 1 - alpha, coloured, alpha, 0)
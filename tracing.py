@@ -0,0 +1,331 @@
+"""
+Lightweight per-request stage tracing.
+
+A Trace is a list of timed spans (wall time, CPU time of the calling
+thread, peak bytes allocated while the span was open). Pipeline code marks
+its stages with the module-level helper
+
+    with tracing.span("denoise"):
+        ...
+
+which is a shared no-op context unless a trace is bound to the current
+thread, so instrumented code costs one attribute lookup when tracing is off.
+
+Every trace ends with a status: "ok", "error" when it raised, or whatever
+the request set with tracing.set_status() (e.g. which gate rejected it).
+
+A Tracer binds traces (`with tracer.trace(page="home"): ...`), appends every
+finished trace as one line to a size-rotated JSONL log, and aggregates
+per-stage wall-time histograms that can be rendered in the Prometheus text
+exposition format (and optionally written to a file for a textfile
+collector).
+
+Peak bytes come from tracemalloc, which is only running while a trace with
+memory=True is open. It sees NumPy and Python allocations (not OpenCV's
+internal buffers) and is process-wide, so concurrent requests inflate each
+other's peaks.
+"""
+
+import contextlib
+import json
+import logging
+import logging.handlers
+import os
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import deque
+from pathlib import Path
+
+# Wall-time histogram bucket bounds (seconds)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_local = threading.local()
+_NULL = contextlib.nullcontext()
+
+
+def current():
+    """The trace bound to this thread, or None."""
+    return getattr(_local, "trace", None)
+
+
+def span(name):
+    """Time a stage of the bound trace; no-op when nothing is being traced."""
+    trace = getattr(_local, "trace", None)
+    return _NULL if trace is None else trace.span(name)
+
+
+def annotate(**attrs):
+    """Attach attributes (e.g. cache="hit") to the bound trace, if any."""
+    trace = getattr(_local, "trace", None)
+    if trace is not None:
+        trace.attrs.update(attrs)
+
+
+def set_status(status):
+    """Record how the bound trace's request ended (e.g. "rejected_quality"), if any."""
+    trace = getattr(_local, "trace", None)
+    if trace is not None:
+        trace.status = status
+
+
+# ============================================================================
+# TRACE
+# ============================================================================
+
+class Trace:
+    """Spans recorded for one request."""
+
+    def __init__(self, memory=False, **attrs):
+        self.id = uuid.uuid4().hex[:12]
+        self.started = time.time()
+        self.attrs = dict(attrs)
+        self.spans = []
+        self.error = None
+        self.status = None
+        self.memory = memory
+        self._t0 = time.perf_counter()
+        self._wall_ms = None
+        self._stack = []
+
+    @contextlib.contextmanager
+    def span(self, name):
+        # Appended on entry so spans are listed in start order (parents first)
+        record = {"name": name, "depth": len(self._stack), "wall_ms": None, "cpu_ms": None,
+                  "peak_bytes": None}
+        self.spans.append(record)
+        frame = {"peak": 0}
+        if self.memory:
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        self._stack.append(frame)
+        wall0, cpu0 = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            record["wall_ms"] = round((time.perf_counter() - wall0) * 1e3, 3)
+            record["cpu_ms"] = round((time.thread_time() - cpu0) * 1e3, 3)
+            self._stack.pop()
+            if self.memory:
+                # Nested spans reset the peak counter; fold their peaks back in
+                peak_abs = max(tracemalloc.get_traced_memory()[1], frame["peak"])
+                if self._stack:
+                    self._stack[-1]["peak"] = max(self._stack[-1]["peak"], peak_abs)
+                record["peak_bytes"] = max(0, peak_abs - base)
+
+    def close(self):
+        if self._wall_ms is None:
+            self._wall_ms = (time.perf_counter() - self._t0) * 1e3
+
+    @property
+    def wall_ms(self):
+        return self._wall_ms if self._wall_ms is not None else (time.perf_counter() - self._t0) * 1e3
+
+    def as_dict(self):
+        return {
+            "id": self.id,
+            "ts": round(self.started, 3),
+            **self.attrs,
+            "total_ms": round(self.wall_ms, 3),
+            "status": self.status or ("error" if self.error else "ok"),
+            "error": self.error,
+            "spans": [s for s in self.spans if s["wall_ms"] is not None],
+        }
+
+
+# ============================================================================
+# HISTOGRAMS
+# ============================================================================
+
+class StageHistograms:
+    """Cumulative per-stage wall-time histograms plus CPU / peak-memory totals."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._stages = {}
+        self.requests = 0
+        self.errors = 0
+
+    def _stage(self, name):
+        st = self._stages.get(name)
+        if st is None:
+            st = self._stages[name] = {"counts": [0] * len(self.buckets), "count": 0,
+                                       "sum": 0.0, "cpu_sum": 0.0, "peak_max": 0}
+        return st
+
+    def _observe(self, name, wall_s, cpu_s=0.0, peak=None):
+        st = self._stage(name)
+        for i, bound in enumerate(self.buckets):
+            if wall_s <= bound:
+                st["counts"][i] += 1
+        st["count"] += 1
+        st["sum"] += wall_s
+        st["cpu_sum"] += cpu_s
+        if peak is not None:
+            st["peak_max"] = max(st["peak_max"], peak)
+
+    def add(self, trace):
+        with self._lock:
+            self.requests += 1
+            self.errors += trace.error is not None
+            self._observe("total", trace.wall_ms / 1e3)
+            for s in trace.spans:
+                if s["wall_ms"] is None:
+                    continue
+                self._observe(s["name"], s["wall_ms"] / 1e3, s["cpu_ms"] / 1e3, s["peak_bytes"])
+
+    def summary(self):
+        """{stage: {"count", "mean_ms", "cpu_mean_ms", "peak_max_bytes"}}."""
+        with self._lock:
+            return {
+                name: {
+                    "count": st["count"],
+                    "mean_ms": st["sum"] / st["count"] * 1e3,
+                    "cpu_mean_ms": st["cpu_sum"] / st["count"] * 1e3,
+                    "peak_max_bytes": st["peak_max"],
+                }
+                for name, st in self._stages.items()
+            }
+
+    def render_prometheus(self, prefix="tea"):
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            stages = {name: {**st, "counts": list(st["counts"])} for name, st in self._stages.items()}
+            requests, errors = self.requests, self.errors
+
+        lines = [
+            f"# HELP {prefix}_requests_total Traced requests.",
+            f"# TYPE {prefix}_requests_total counter",
+            f"{prefix}_requests_total {requests}",
+            f"# HELP {prefix}_request_errors_total Traced requests that raised.",
+            f"# TYPE {prefix}_request_errors_total counter",
+            f"{prefix}_request_errors_total {errors}",
+            f"# HELP {prefix}_stage_duration_seconds Wall time per pipeline stage.",
+            f"# TYPE {prefix}_stage_duration_seconds histogram",
+        ]
+        for name in sorted(stages):
+            st, label = stages[name], _label(name)
+            for bound, count in zip(self.buckets, st["counts"]):
+                lines.append(f'{prefix}_stage_duration_seconds_bucket{{stage="{label}",le="{bound:g}"}} {count}')
+            lines.append(f'{prefix}_stage_duration_seconds_bucket{{stage="{label}",le="+Inf"}} {st["count"]}')
+            lines.append(f'{prefix}_stage_duration_seconds_sum{{stage="{label}"}} {st["sum"]:.6f}')
+            lines.append(f'{prefix}_stage_duration_seconds_count{{stage="{label}"}} {st["count"]}')
+
+        lines += [f"# HELP {prefix}_stage_cpu_seconds_total CPU time of the calling thread per stage.",
+                  f"# TYPE {prefix}_stage_cpu_seconds_total counter"]
+        lines += [f'{prefix}_stage_cpu_seconds_total{{stage="{_label(n)}"}} {stages[n]["cpu_sum"]:.6f}'
+                  for n in sorted(stages) if n != "total"]
+        lines += [f"# HELP {prefix}_stage_peak_bytes Largest peak allocation seen per stage (tracemalloc).",
+                  f"# TYPE {prefix}_stage_peak_bytes gauge"]
+        lines += [f'{prefix}_stage_peak_bytes{{stage="{_label(n)}"}} {stages[n]["peak_max"]}'
+                  for n in sorted(stages) if n != "total"]
+        return "\n".join(lines) + "\n"
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# ============================================================================
+# TRACER
+# ============================================================================
+
+class Tracer:
+    """
+    Binds traces to threads, logs finished ones to a rotating JSONL file
+    (`log_path`, rotated at `max_bytes` keeping `backups` old files) and keeps
+    histograms; `prom_path` (optional) is rewritten after every request.
+    """
+
+    def __init__(self, log_path=None, max_bytes=10 * 2 ** 20, backups=3, prom_path=None,
+                 memory=True, buckets=DEFAULT_BUCKETS, keep_recent=50):
+        self.memory = memory
+        self.prom_path = Path(prom_path) if prom_path else None
+        self.histograms = StageHistograms(buckets)
+        self.recent = deque(maxlen=keep_recent)
+        self._lock = threading.Lock()
+        self._mem_users = 0
+        self._log = None
+        if log_path:
+            log_path = Path(log_path)
+            log_path.parent.mkdir(parents=True, exist_ok=True)
+            self._log = logging.getLogger(f"tea_doctor.trace.{log_path.resolve()}")
+            self._log.propagate = False
+            self._log.setLevel(logging.INFO)
+            if not self._log.handlers:
+                handler = logging.handlers.RotatingFileHandler(
+                    log_path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                self._log.addHandler(handler)
+
+    # -- memory tracking is on only while memory traces are open --------
+    def _memory_on(self):
+        with self._lock:
+            self._mem_users += 1
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+
+    def _memory_off(self):
+        with self._lock:
+            self._mem_users -= 1
+            if self._mem_users == 0 and tracemalloc.is_tracing():
+                tracemalloc.stop()
+
+    def start(self, **attrs):
+        """Open an unbound trace (use trace.span directly, then finish())."""
+        if self.memory:
+            self._memory_on()
+        return Trace(memory=self.memory, **attrs)
+
+    def finish(self, trace):
+        trace.close()
+        if trace.memory:
+            self._memory_off()
+        self.histograms.add(trace)
+        record = trace.as_dict()
+        self.recent.append(record)
+        if self._log is not None:
+            self._log.info(json.dumps(record))
+        if self.prom_path is not None:
+            self.write_prometheus(self.prom_path)
+        return record
+
+    @contextlib.contextmanager
+    def trace(self, normal_exits=(), **attrs):
+        """
+        Bind a new trace to this thread so tracing.span() records into it.
+        Exceptions of the `normal_exits` types (e.g. Streamlit's st.stop() /
+        st.rerun() control flow) propagate but end the trace without an error.
+        """
+        trace = self.start(**attrs)
+        previous = getattr(_local, "trace", None)
+        _local.trace = trace
+        try:
+            yield trace
+        except normal_exits:
+            if trace.status is None:
+                trace.status = "stopped"
+            raise
+        except BaseException as e:
+            trace.error = type(e).__name__
+            raise
+        finally:
+            _local.trace = previous
+            self.finish(trace)
+
+    def last(self):
+        return self.recent[-1] if self.recent else None
+
+    def render_prometheus(self):
+        return self.histograms.render_prometheus()
+
+    def write_prometheus(self, path):
+        """Atomically replace `path` with the current exposition text."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Own temp file per write: sessions (and processes) finish concurrently
+        tmp = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+        tmp.write_text(self.render_prometheus(), encoding="utf-8")
+        os.replace(tmp, path)